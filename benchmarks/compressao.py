@@ -0,0 +1,109 @@
+"""Benchmark da compressão das respostas da API: CPU gasta x bytes economizados.
+
+Uso:
+    python benchmarks/compressao.py [--pedidos 20000] [--clientes 2000] [--repeticoes 5] [--banda-kbps 2000]
+
+Cria um banco SQLite temporário com dados sintéticos e mede, para cada
+endpoint de listagem e cada codificação/nível, o tamanho da resposta
+comprimida (como enviada pela API, em blocos), o tempo de CPU da compressão
+do corpo e o tempo estimado de transferência numa conexão móvel com a banda
+informada.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('CACHE_BACKEND', 'nenhum')
+
+from flask import Flask
+from src.models.user import db
+from src.routes.cliente import cliente_bp
+from src.routes.pedido import pedido_bp
+from src.routes.financeiro import financeiro_bp
+from src.utils import compressao
+from src.utils.compressao import configurar_compressao, codificacoes_disponiveis, comprimir
+
+# Mesmos dados sintéticos do benchmark do dashboard
+from dashboard_kpis import popular
+
+ENDPOINTS = ('/api/clientes', '/api/pedidos', '/api/financeiro')
+
+NIVEIS = {
+    'gzip': (1, 6, 9),
+    'br': (1, 4, 6),
+    'zstd': (1, 3, 9)
+}
+
+
+def mediana(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return resultado, sorted(tempos)[len(tempos) // 2]
+
+
+def baixar(cliente, endpoint, codificacao):
+    resposta = cliente.get(endpoint, headers={'Accept-Encoding': codificacao or 'identity'})
+    assert resposta.headers.get('Content-Encoding') == codificacao, resposta.headers
+    return resposta.get_data()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pedidos', type=int, default=20000)
+    parser.add_argument('--clientes', type=int, default=2000)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--banda-kbps', type=int, default=2000)
+    args = parser.parse_args()
+
+    bytes_por_segundo = args.banda_kbps * 1000 / 8
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        app = Flask(__name__)
+        app.config['SECRET_KEY'] = 'benchmark'
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(diretorio, 'bench.db')}"
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        for blueprint in (cliente_bp, pedido_bp, financeiro_bp):
+            app.register_blueprint(blueprint, url_prefix='/api')
+        configurar_compressao(app)
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            print(f'Populando {args.clientes} clientes e {args.pedidos} pedidos...')
+            popular(args.clientes, args.pedidos)
+
+        cliente = app.test_client()
+        with cliente.session_transaction() as sessao:
+            sessao['user_id'] = 1
+
+        print(f'Transferência estimada a {args.banda_kbps} kbit/s\n')
+        print(f"{'endpoint':<17}{'codificação':<13}{'bytes':>12}{'razão':>8}"
+              f"{'CPU (ms)':>10}{'rede (ms)':>11}{'economia (ms)':>15}")
+
+        for endpoint in ENDPOINTS:
+            corpo, tempo_requisicao = mediana(lambda: baixar(cliente, endpoint, None), args.repeticoes)
+            rede_base = len(corpo) / bytes_por_segundo
+            print(f"{endpoint:<17}{'identity':<13}{len(corpo):>12}{1:>8.1f}"
+                  f"{0:>10.1f}{rede_base * 1000:>11.1f}{0:>15.1f}"
+                  f"   (requisição: {tempo_requisicao * 1000:.1f} ms)")
+
+            for codificacao in codificacoes_disponiveis():
+                for nivel in NIVEIS[codificacao]:
+                    compressao.NIVEIS_DINAMICOS[codificacao] = nivel
+                    tamanho = len(baixar(cliente, endpoint, codificacao))
+                    _, cpu = mediana(lambda: comprimir(corpo, codificacao, nivel), args.repeticoes)
+                    rede = tamanho / bytes_por_segundo
+                    print(f"{'':<17}{f'{codificacao}-{nivel}':<13}{tamanho:>12}{len(corpo) / tamanho:>8.1f}"
+                          f"{cpu * 1000:>10.1f}{rede * 1000:>11.1f}{(rede_base - rede - cpu) * 1000:>15.1f}")
+            print()
+
+
+if __name__ == '__main__':
+    main()
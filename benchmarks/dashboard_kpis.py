@@ -0,0 +1,241 @@
+"""Benchmark do GET /api/dashboard: consultas e latência antes/depois do motor de KPIs.
+
+Uso:
+    python benchmarks/dashboard_kpis.py [--pedidos 100000] [--clientes 2000] [--repeticoes 5]
+
+Cria um banco SQLite temporário, popula com dados sintéticos e compara a
+implementação anterior (uma consulta por KPI) com src.services.kpis.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import event, insert
+from src.models.user import db
+from src.models.cliente import Cliente
+from src.models.pedido import Pedido
+from src.models.demanda_social import DemandaSocialMedia
+from src.models.financeiro import TransacaoFinanceira
+from src.services.kpis import (
+    periodo_mes_atual, kpis_clientes, kpis_pedidos,
+    pedidos_por_status, kpis_financeiro, kpis_demandas
+)
+from src.services.resumo_mensal import ultimos_meses, serie_pedidos, reconstruir_resumos
+
+
+def kpis_legado():
+    """KPIs calculados como o get_dashboard fazia antes (sem o top 5 de clientes)"""
+    inicio_mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    fim_mes = (inicio_mes + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+    resultado = {
+        'total_clientes': Cliente.query.count(),
+        'clientes_ativos': Cliente.query.filter_by(status='Ativo').count(),
+        'novos_clientes_mes': Cliente.query.filter(Cliente.data_cadastro >= inicio_mes).count(),
+        'total_pedidos': Pedido.query.count(),
+        'pedidos_em_andamento': Pedido.query.filter(Pedido.status.in_(['Aprovado', 'Produção'])).count(),
+        'pedidos_atrasados': Pedido.query.filter(
+            Pedido.data_entrega < datetime.utcnow(),
+            Pedido.status != 'Concluído'
+        ).count(),
+        'faturamento_mes': db.session.query(db.func.sum(Pedido.valor)).filter(
+            Pedido.data_pedido >= inicio_mes,
+            Pedido.status == 'Concluído'
+        ).scalar() or 0
+    }
+
+    pedidos_concluidos = Pedido.query.filter_by(status='Concluído').all()
+    margens = [p.margem for p in pedidos_concluidos if p.valor and p.valor > 0]
+    resultado['margem_media'] = round(sum(margens) / len(margens), 2) if margens else 0
+
+    for tipo, chave in (('Receita', 'receitas_mes'), ('Despesa', 'despesas_mes')):
+        resultado[chave] = db.session.query(db.func.sum(TransacaoFinanceira.valor)).filter(
+            TransacaoFinanceira.tipo == tipo,
+            TransacaoFinanceira.data >= inicio_mes,
+            TransacaoFinanceira.data <= fim_mes
+        ).scalar() or 0
+    resultado['saldo_mes'] = resultado['receitas_mes'] - resultado['despesas_mes']
+
+    resultado['demandas_em_criacao'] = DemandaSocialMedia.query.filter_by(status='Criação').count()
+    resultado['demandas_aguardando'] = DemandaSocialMedia.query.filter_by(status='Aguardando Aprovação').count()
+    resultado['demandas_urgentes'] = DemandaSocialMedia.query.filter_by(prioridade='Urgente').count()
+
+    resultado['pedidos_por_status'] = dict(db.session.query(
+        Pedido.status, db.func.count(Pedido.id)
+    ).group_by(Pedido.status).all())
+
+    historico = []
+    for i in range(6):
+        data_ref = datetime.now().replace(day=1) - timedelta(days=30 * i)
+        inicio = data_ref.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        fim = (inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        historico.insert(0, {
+            'mes': inicio.strftime('%Y-%m'),
+            'valor': db.session.query(db.func.sum(Pedido.valor)).filter(
+                Pedido.data_pedido >= inicio,
+                Pedido.data_pedido <= fim,
+                Pedido.status == 'Concluído'
+            ).scalar() or 0
+        })
+    resultado['faturamento_historico'] = historico
+    return resultado
+
+
+def kpis_motor():
+    """KPIs calculados pelo motor de agregação condicional e pelos resumos mensais"""
+    inicio_mes, fim_mes = periodo_mes_atual()
+    clientes = kpis_clientes(inicio_mes)
+    pedidos = kpis_pedidos(inicio_mes)
+    meses = ultimos_meses(6)
+    financeiro = kpis_financeiro(inicio_mes, fim_mes)
+    demandas = kpis_demandas()
+    return {
+        'total_clientes': clientes['total_clientes'],
+        'clientes_ativos': clientes['clientes_ativos'],
+        'novos_clientes_mes': clientes['novos_clientes_mes'],
+        'total_pedidos': pedidos['total_pedidos'],
+        'pedidos_em_andamento': pedidos['pedidos_em_andamento'],
+        'pedidos_atrasados': pedidos['pedidos_atrasados'],
+        'faturamento_mes': pedidos['faturamento_mes'],
+        'margem_media': round(pedidos['margem_media'], 2),
+        'receitas_mes': financeiro['receitas_mes'],
+        'despesas_mes': financeiro['despesas_mes'],
+        'saldo_mes': financeiro['saldo_mes'],
+        'demandas_em_criacao': demandas['demandas_em_criacao'],
+        'demandas_aguardando': demandas['demandas_aguardando'],
+        'demandas_urgentes': demandas['demandas_urgentes'],
+        'pedidos_por_status': pedidos_por_status(),
+        'faturamento_historico': [
+            {'mes': mes, 'valor': valor}
+            for mes, valor in zip(meses, serie_pedidos(meses, status='Concluído')['valor'])
+        ]
+    }
+
+
+def popular(qtd_clientes, qtd_pedidos):
+    aleatorio = random.Random(42)
+    agora = datetime.now()
+
+    db.session.execute(insert(Cliente), [
+        {
+            'nome': f'Cliente {i}',
+            'tipo': aleatorio.choice(['Varejista', 'Prefeitura', 'Pessoa Física', 'Outros']),
+            'status': aleatorio.choice(['Ativo', 'Prospect', 'Inativo']),
+            'data_cadastro': agora - timedelta(days=aleatorio.randint(0, 720))
+        }
+        for i in range(qtd_clientes)
+    ])
+
+    status_pedido = ['Orçamento', 'Aprovado', 'Produção', 'Concluído', 'Cancelado']
+    for inicio in range(0, qtd_pedidos, 10000):
+        linhas = []
+        for i in range(inicio, min(inicio + 10000, qtd_pedidos)):
+            valor = round(aleatorio.uniform(100, 10000), 2)
+            data_pedido = agora - timedelta(days=aleatorio.randint(0, 365))
+            linhas.append({
+                'id_pedido': f'PED-{i:08d}',
+                'cliente_id': aleatorio.randint(1, qtd_clientes),
+                'tipo_servico': aleatorio.choice(['Social Media', 'Gráfica', 'Encarte', 'Branding']),
+                'status': aleatorio.choice(status_pedido),
+                'data_pedido': data_pedido,
+                'data_entrega': data_pedido + timedelta(days=aleatorio.randint(1, 60)),
+                'valor': valor,
+                'custo': round(valor * aleatorio.uniform(0.3, 0.9), 2)
+            })
+        db.session.execute(insert(Pedido), linhas)
+
+    db.session.execute(insert(TransacaoFinanceira), [
+        {
+            'descricao': f'Transação {i}',
+            'tipo': aleatorio.choice(['Receita', 'Despesa']),
+            'categoria': aleatorio.choice(['Vendas', 'Fornecedores', 'Salários', 'Ferramentas']),
+            'valor': round(aleatorio.uniform(50, 5000), 2),
+            'data': agora - timedelta(days=aleatorio.randint(0, 365)),
+            'status': aleatorio.choice(['Pago', 'Pendente', 'Atrasado'])
+        }
+        for i in range(qtd_pedidos // 2)
+    ])
+
+    db.session.execute(insert(DemandaSocialMedia), [
+        {
+            'demanda': f'Demanda {i}',
+            'cliente_id': aleatorio.randint(1, qtd_clientes),
+            'tipo_arte': aleatorio.choice(['Post Simples', 'Carrossel', 'Stories', 'Reels']),
+            'status': aleatorio.choice(['Briefing', 'Criação', 'Aguardando Aprovação', 'Aprovado']),
+            'prioridade': aleatorio.choice(['Urgente', 'Alta', 'Normal'])
+        }
+        for i in range(qtd_pedidos // 10)
+    ])
+    db.session.commit()
+
+
+def medir(funcao, repeticoes):
+    consultas = []
+
+    def contar(*args):
+        consultas.append(1)
+
+    event.listen(db.engine, 'before_cursor_execute', contar)
+    try:
+        tempos = []
+        for _ in range(repeticoes):
+            consultas.clear()
+            db.session.expunge_all()
+            inicio = time.perf_counter()
+            resultado = funcao()
+            tempos.append(time.perf_counter() - inicio)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', contar)
+
+    return resultado, len(consultas), min(tempos), sorted(tempos)[len(tempos) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pedidos', type=int, default=100000)
+    parser.add_argument('--clientes', type=int, default=2000)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(diretorio, 'bench.db')}"
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            print(f'Populando {args.clientes} clientes e {args.pedidos} pedidos...')
+            popular(args.clientes, args.pedidos)
+            reconstruir_resumos()
+
+            antes, consultas_antes, min_antes, med_antes = medir(kpis_legado, args.repeticoes)
+            depois, consultas_depois, min_depois, med_depois = medir(kpis_motor, args.repeticoes)
+
+            print(f"{'':<10}{'consultas':>12}{'mín (ms)':>12}{'mediana (ms)':>15}")
+            print(f"{'antes':<10}{consultas_antes:>12}{min_antes * 1000:>12.1f}{med_antes * 1000:>15.1f}")
+            print(f"{'depois':<10}{consultas_depois:>12}{min_depois * 1000:>12.1f}{med_depois * 1000:>15.1f}")
+
+            # O histórico antigo andava em passos de 30 dias e ignorava o último dia
+            # de cada mês; o resumo usa meses de calendário, então não é comparado
+            divergentes = [
+                chave for chave in antes
+                if chave != 'faturamento_historico'
+                and antes[chave] != depois[chave]
+                and not (isinstance(antes[chave], float) and abs(antes[chave] - depois[chave]) < 1e-6)
+            ]
+            if divergentes:
+                print(f'ATENÇÃO: resultados divergentes em {divergentes}')
+                sys.exit(1)
+            print('Resultados idênticos.')
+
+
+if __name__ == '__main__':
+    main()
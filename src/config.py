@@ -0,0 +1,91 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+# Configuração do banco de dados a partir de variáveis de ambiente.
+#
+# DATABASE_URL                 URL do banco (padrão: SQLite em src/database/app.db)
+# DB_POOL_SIZE                 conexões mantidas no pool por worker (padrão: 5)
+# DB_MAX_OVERFLOW              conexões extras permitidas em picos (padrão: 5)
+# DB_POOL_TIMEOUT              segundos esperando uma conexão livre (padrão: 30)
+# DB_POOL_RECYCLE              segundos até reciclar uma conexão (padrão: 1800)
+# DB_POOL_PRE_PING             testa a conexão antes de usar (padrão: true)
+# DB_STATEMENT_TIMEOUT_MS      tempo máximo de cada comando no PostgreSQL (padrão: 30000, 0 desliga)
+# DB_SQLITE_TIMEOUT            segundos esperando o lock do arquivo SQLite (padrão: 15)
+# DB_SQLITE_WAL                usa journal_mode=WAL no SQLite (padrão: true)
+
+DIRETORIO_BANCO = os.path.join(os.path.dirname(__file__), 'database')
+
+
+def _env_int(nome, padrao):
+    valor = os.environ.get(nome)
+    return int(valor) if valor not in (None, '') else padrao
+
+
+def _env_bool(nome, padrao):
+    valor = os.environ.get(nome)
+    if valor in (None, ''):
+        return padrao
+    return valor.strip().lower() in ('1', 'true', 'sim', 'yes', 'on')
+
+
+def url_banco():
+    """URL do banco de dados, lida de DATABASE_URL"""
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        os.makedirs(DIRETORIO_BANCO, exist_ok=True)
+        return f"sqlite:///{os.path.join(DIRETORIO_BANCO, 'app.db')}"
+
+    # Heroku e alguns provedores ainda usam o esquema antigo postgres://
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def opcoes_engine(url):
+    """Opções do engine SQLAlchemy (pool e timeouts) para a URL informada"""
+    backend = make_url(url).get_backend_name()
+
+    if backend == 'sqlite':
+        return {
+            'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+            'connect_args': {'timeout': _env_int('DB_SQLITE_TIMEOUT', 15)}
+        }
+
+    opcoes = {
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 5),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True)
+    }
+
+    timeout_ms = _env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+    if backend == 'postgresql' and timeout_ms > 0:
+        opcoes['connect_args'] = {'options': f'-c statement_timeout={timeout_ms}'}
+
+    return opcoes
+
+
+@event.listens_for(Engine, 'connect')
+def _configurar_sqlite(conexao_dbapi, registro):
+    # WAL permite leituras concorrentes com uma escrita em andamento, o que
+    # reduz a disputa pelo lock do arquivo entre os workers do gunicorn
+    if type(conexao_dbapi).__module__ != 'sqlite3' or not _env_bool('DB_SQLITE_WAL', True):
+        return
+    cursor = conexao_dbapi.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.close()
+
+
+def configurar_banco(app):
+    """Aplica a configuração do banco no app e registra no log as opções em vigor"""
+    url = url_banco()
+    opcoes = opcoes_engine(url)
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    resumo = ', '.join(f'{chave}={valor}' for chave, valor in opcoes.items())
+    print(f"Banco de dados: {make_url(url).render_as_string(hide_password=True)} ({resumo}) [pid {os.getpid()}]")
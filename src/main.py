@@ -3,8 +3,10 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+from dotenv import load_dotenv
 from flask import Flask, send_from_directory
 from flask_cors import CORS
+from src.config import configurar_banco
 from src.models.user import db
 from src.routes.user import user_bp
 from src.routes.cliente import cliente_bp
@@ -16,6 +18,8 @@ from src.routes.tabela_preco import tabela_preco_bp
 from src.routes.dashboard import dashboard_bp
 from src.routes.assistente_ia import assistente_ia_bp
 from src.routes.upload import upload_bp
+from src.routes.tarefa import tarefa_bp
+from src.routes.busca import busca_bp
 
 # Importar todos os modelos para que sejam criados no banco
 from src.models.cliente import Cliente
@@ -25,6 +29,15 @@ from src.models.financeiro import TransacaoFinanceira
 from src.models.fornecedor import Fornecedor
 from src.models.tabela_preco import TabelaPreco
 from src.models.configuracao import ConfiguracaoEmpresa
+from src.models.resumo_mensal import ResumoMensalFinanceiro, ResumoMensalPedido
+from src.models.registro_alteracao import RegistroAlteracao
+from src.models.tarefa import Tarefa
+from src.services.resumo_mensal import reconstruir_resumos, resumos_vazios
+from src.services.indices import criar_indices_ausentes, verificar_planos
+from src.services.busca import criar_indice_busca
+from src.services.tarefas import configurar_tarefas
+from src.utils.compressao import configurar_compressao
+from src.utils.estaticos import ManifestoEstaticos
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -32,6 +45,13 @@ app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 # Habilitar CORS para todas as rotas
 CORS(app)
 
+# Compressão das respostas da API (gzip/brotli/zstd, ver src/utils/compressao.py)
+configurar_compressao(app)
+
+# Tarefas em segundo plano: o agendador inicia na primeira requisição de cada
+# worker e só um deles executa (ver src/services/tarefas.py)
+configurar_tarefas(app)
+
 # Registrar blueprints
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(cliente_bp, url_prefix='/api')
@@ -43,15 +63,26 @@ app.register_blueprint(tabela_preco_bp, url_prefix='/api')
 app.register_blueprint(dashboard_bp, url_prefix='/api')
 app.register_blueprint(assistente_ia_bp, url_prefix='/api')
 app.register_blueprint(upload_bp, url_prefix='/api')
+app.register_blueprint(tarefa_bp, url_prefix='/api')
+app.register_blueprint(busca_bp, url_prefix='/api')
 
-# Configuração do banco de dados
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Configuração do banco de dados (DATABASE_URL e pool, ver src/config.py)
+load_dotenv()
+configurar_banco(app)
 db.init_app(app)
 
 with app.app_context():
     db.create_all()
     
+    # Criar em bancos existentes os índices adicionados aos modelos
+    indices_criados = criar_indices_ausentes()
+    if indices_criados:
+        print(f"Índices criados: {', '.join(indices_criados)}")
+    
+    # Criar e preencher o índice de busca textual em bancos que ainda não o têm
+    if criar_indice_busca():
+        print("Índice de busca criado")
+    
     # Criar usuário admin padrão se não existir
     from src.models.user import User
     admin_user = User.query.filter_by(username='admin').first()
@@ -70,6 +101,34 @@ with app.app_context():
         
         db.session.commit()
         print("Usuário admin criado com sucesso!")
+    
+    # Gerar os resumos mensais em bases criadas antes deles existirem
+    if resumos_vazios():
+        reconstruir_resumos()
+        print("Resumos mensais gerados com sucesso!")
+
+@app.cli.command('reconstruir-resumos')
+def reconstruir_resumos_command():
+    """Recalcula do zero os resumos mensais de faturamento, receitas e despesas"""
+    reconstruir_resumos()
+    print("Resumos mensais reconstruídos com sucesso!")
+
+@app.cli.command('verificar-indices')
+def verificar_indices_command():
+    """Roda EXPLAIN nas consultas quentes e falha se alguma fizer varredura completa"""
+    falhas = 0
+    for nome, detalhes, varredura in verificar_planos():
+        print(f"[{'FALHA' if varredura else 'OK'}] {nome}")
+        for detalhe in detalhes:
+            print(f"    {detalhe}")
+        falhas += varredura
+    
+    if falhas:
+        print(f"{falhas} consulta(s) sem índice", file=sys.stderr)
+        sys.exit(1)
+
+# Arquivos da SPA em memória, com versões comprimidas (ver src/utils/estaticos.py)
+estaticos = ManifestoEstaticos(app.static_folder, recarregar=app.debug or os.environ.get('FLASK_DEBUG') == '1')
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -78,14 +137,19 @@ def serve(path):
     if static_folder_path is None:
             return "Static folder not configured", 404
 
+    arquivo = estaticos.obter(path) if path != "" else None
+    if arquivo is not None:
+        return arquivo.resposta()
+    
+    # Arquivos enviados (uploads/) não fazem parte do manifesto
     if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
         return send_from_directory(static_folder_path, path)
+    
+    index = estaticos.obter('index.html')
+    if index is not None:
+        return index.resposta()
     else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+        return "index.html not found", 404
 
 
 if __name__ == '__main__':
@@ -0,0 +1,18 @@
+import os
+
+# Política de carregamento dos relacionamentos entre os modelos.
+#
+# 'select' (padrão) carrega o relacionamento sob demanda, com um SELECT por
+# objeto. Em desenvolvimento, use ERP_LAZY_RELACIONAMENTOS=raise_on_sql para
+# que qualquer acesso a um relacionamento não carregado explicitamente
+# (joinedload/selectinload ou join na consulta) gere erro, evitando N+1
+# em endpoints novos.
+POLITICAS_CARREGAMENTO = ('select', 'selectin', 'joined', 'raise_on_sql', 'raise')
+
+LAZY_RELACIONAMENTOS = os.environ.get('ERP_LAZY_RELACIONAMENTOS', 'select')
+
+if LAZY_RELACIONAMENTOS not in POLITICAS_CARREGAMENTO:
+    raise ValueError(
+        f"ERP_LAZY_RELACIONAMENTOS inválido: {LAZY_RELACIONAMENTOS}. "
+        f"Use um de: {', '.join(POLITICAS_CARREGAMENTO)}"
+    )
@@ -1,4 +1,6 @@
 from src.models.user import db
+from src.models.carregamento import LAZY_RELACIONAMENTOS
+from sqlalchemy.orm.attributes import set_committed_value
 from datetime import datetime
 
 class Cliente(db.Model):
@@ -10,28 +12,72 @@ class Cliente(db.Model):
     contato_principal = db.Column(db.String(200))
     whatsapp = db.Column(db.String(20))
     email = db.Column(db.String(120))
-    status = db.Column(db.String(20), nullable=False, default='Prospect')  # Ativo, Prospect, Inativo, Bloqueado
+    status = db.Column(db.String(20), nullable=False, default='Prospect', index=True)  # Ativo, Prospect, Inativo, Bloqueado
     segmento = db.Column(db.String(50))  # Alimentação, Moda, Farmácia, Eletrônicos, Outros
     data_cadastro = db.Column(db.DateTime, default=datetime.utcnow)
     ultimo_contato = db.Column(db.DateTime)
     observacoes = db.Column(db.Text)
     
     # Relacionamentos
-    pedidos = db.relationship('Pedido', backref='cliente', lazy=True)
-    demandas_social = db.relationship('DemandaSocialMedia', backref='cliente', lazy=True)
+    pedidos = db.relationship(
+        'Pedido', backref=db.backref('cliente', lazy=LAZY_RELACIONAMENTOS), lazy=LAZY_RELACIONAMENTOS
+    )
+    demandas_social = db.relationship(
+        'DemandaSocialMedia', backref=db.backref('cliente', lazy=LAZY_RELACIONAMENTOS), lazy=LAZY_RELACIONAMENTOS
+    )
 
     def __repr__(self):
         return f'<Cliente {self.nome}>'
 
+    # Agregados dos pedidos calculados no banco (ver opcoes_agregados)
+    _valor_total = db.query_expression()
+    _qtd_pedidos = db.query_expression()
+
+    @classmethod
+    def opcoes_agregados(cls):
+        """Opções de consulta que trazem valor_total e qtd_pedidos como subconsultas correlacionadas"""
+        from src.models.pedido import Pedido
+        valor_total = db.select(db.func.coalesce(db.func.sum(Pedido.valor), 0)).where(
+            Pedido.cliente_id == cls.id
+        ).correlate_except(Pedido).scalar_subquery()
+        qtd_pedidos = db.select(db.func.count(Pedido.id)).where(
+            Pedido.cliente_id == cls.id
+        ).correlate_except(Pedido).scalar_subquery()
+        return [
+            db.with_expression(cls._valor_total, valor_total),
+            db.with_expression(cls._qtd_pedidos, qtd_pedidos)
+        ]
+
+    def definir_agregados(self, valor_total, qtd_pedidos):
+        """Registra agregados já calculados sem marcar o cliente como alterado"""
+        set_committed_value(self, '_valor_total', valor_total)
+        set_committed_value(self, '_qtd_pedidos', qtd_pedidos)
+
+    def _carregar_agregados(self):
+        if self._valor_total is not None and self._qtd_pedidos is not None:
+            return
+        if 'pedidos' in self.__dict__:
+            # Pedidos já carregados: não precisa consultar o banco
+            self.definir_agregados(sum(pedido.valor or 0 for pedido in self.pedidos), len(self.pedidos))
+            return
+        from src.models.pedido import Pedido
+        valor_total, qtd_pedidos = db.session.query(
+            db.func.coalesce(db.func.sum(Pedido.valor), 0),
+            db.func.count(Pedido.id)
+        ).filter(Pedido.cliente_id == self.id).one()
+        self.definir_agregados(valor_total, qtd_pedidos)
+
     @property
     def valor_total(self):
         """Calcula o valor total de todos os pedidos do cliente"""
-        return sum(pedido.valor or 0 for pedido in self.pedidos)
+        self._carregar_agregados()
+        return self._valor_total
 
     @property
     def qtd_pedidos(self):
         """Conta a quantidade de pedidos do cliente"""
-        return len(self.pedidos)
+        self._carregar_agregados()
+        return self._qtd_pedidos
 
     @property
     def ticket_medio(self):
@@ -1,19 +1,26 @@
 from src.models.user import db
+from src.models.prazo import PrazoEntregaMixin
+from src.services.imagens import urls_imagem
 from datetime import datetime
 
-class DemandaSocialMedia(db.Model):
+class DemandaSocialMedia(PrazoEntregaMixin, db.Model):
     __tablename__ = 'demanda_social_media'
+    __table_args__ = (
+        db.Index('ix_demanda_social_data_entrega_status', 'data_entrega', 'status'),
+    )
+    # dias_para_entrega e status_prazo vêm de PrazoEntregaMixin
+    STATUS_FINALIZADO = 'Publicado'
     
     id = db.Column(db.Integer, primary_key=True)
     demanda = db.Column(db.String(200), nullable=False)
-    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False)
-    pedido_id = db.Column(db.Integer, db.ForeignKey('pedido.id'))
+    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False, index=True)
+    pedido_id = db.Column(db.Integer, db.ForeignKey('pedido.id'), index=True)
     tipo_arte = db.Column(db.String(50), nullable=False)  # Post Simples, Carrossel, Stories, Reels, Capa
     tema_conteudo = db.Column(db.Text)
-    data_solicitacao = db.Column(db.DateTime, default=datetime.utcnow)
+    data_solicitacao = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     data_entrega = db.Column(db.DateTime)
-    status = db.Column(db.String(30), nullable=False, default='Briefing')  # Briefing, Criação, Aguardando Aprovação, Aprovado, Publicado
-    prioridade = db.Column(db.String(20), default='Normal')  # Urgente, Alta, Normal
+    status = db.Column(db.String(30), nullable=False, default='Briefing', index=True)  # Briefing, Criação, Aguardando Aprovação, Aprovado, Publicado
+    prioridade = db.Column(db.String(20), default='Normal', index=True)  # Urgente, Alta, Normal
     observacoes = db.Column(db.Text)
     arquivo_final = db.Column(db.String(255))  # Path do arquivo final
     aprovado = db.Column(db.Boolean, default=False)
@@ -21,14 +28,6 @@ class DemandaSocialMedia(db.Model):
     def __repr__(self):
         return f'<DemandaSocialMedia {self.demanda}>'
 
-    @property
-    def dias_para_entrega(self):
-        """Calcula quantos dias faltam para a entrega"""
-        if self.data_entrega:
-            delta = self.data_entrega - datetime.utcnow()
-            return delta.days
-        return None
-
     def to_dict(self):
         return {
             'id': self.id,
@@ -43,7 +42,9 @@ class DemandaSocialMedia(db.Model):
             'prioridade': self.prioridade,
             'observacoes': self.observacoes,
             'arquivo_final': self.arquivo_final,
+            'arquivo_final_derivados': urls_imagem(self.arquivo_final),
             'aprovado': self.aprovado,
-            'dias_para_entrega': self.dias_para_entrega
+            'dias_para_entrega': self.dias_para_entrega,
+            'status_prazo': self.status_prazo
         }
 
@@ -3,17 +3,20 @@ from datetime import datetime
 
 class TransacaoFinanceira(db.Model):
     __tablename__ = 'transacao_financeira'
+    __table_args__ = (
+        db.Index('ix_transacao_financeira_tipo_data', 'tipo', 'data'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     descricao = db.Column(db.String(200), nullable=False)
     tipo = db.Column(db.String(20), nullable=False)  # Receita, Despesa
     categoria = db.Column(db.String(50), nullable=False)  # Vendas, Fornecedores, Salários, Ferramentas, Marketing, Escritório, Outros
     valor = db.Column(db.Float, nullable=False)
-    data = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(20), nullable=False, default='Pendente')  # Pago, Pendente, Atrasado
+    data = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    status = db.Column(db.String(20), nullable=False, default='Pendente', index=True)  # Pago, Pendente, Atrasado
     cliente_fornecedor = db.Column(db.String(200))
     forma_pagamento = db.Column(db.String(50))  # Dinheiro, PIX, Cartão, Transferência, Boleto
-    pedido_id = db.Column(db.Integer, db.ForeignKey('pedido.id'))
+    pedido_id = db.Column(db.Integer, db.ForeignKey('pedido.id'), index=True)
     observacoes = db.Column(db.Text)
     comprovante = db.Column(db.String(255))  # Path do arquivo de comprovante
 
@@ -1,4 +1,5 @@
 from src.models.user import db
+from src.models.carregamento import LAZY_RELACIONAMENTOS
 from datetime import datetime
 
 class Fornecedor(db.Model):
@@ -17,7 +18,9 @@ class Fornecedor(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relacionamentos
-    produtos_servicos = db.relationship('TabelaPreco', backref='fornecedor', lazy=True)
+    produtos_servicos = db.relationship(
+        'TabelaPreco', backref=db.backref('fornecedor', lazy=LAZY_RELACIONAMENTOS), lazy=LAZY_RELACIONAMENTOS
+    )
 
     def __repr__(self):
         return f'<Fornecedor {self.nome}>'
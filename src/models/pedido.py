@@ -1,15 +1,24 @@
 from src.models.user import db
+from src.models.carregamento import LAZY_RELACIONAMENTOS
+from src.models.prazo import PrazoEntregaMixin
 from datetime import datetime
 
-class Pedido(db.Model):
+class Pedido(PrazoEntregaMixin, db.Model):
+    __table_args__ = (
+        db.Index('ix_pedido_status_data_pedido', 'status', 'data_pedido'),
+        db.Index('ix_pedido_data_entrega_status', 'data_entrega', 'status'),
+    )
+    # dias_para_entrega e status_prazo vêm de PrazoEntregaMixin
+    STATUS_FINALIZADO = 'Concluído'
+    
     id = db.Column(db.Integer, primary_key=True)
     id_pedido = db.Column(db.String(50), unique=True, nullable=False)
-    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False, index=True)
     tipo_servico = db.Column(db.String(50), nullable=False)  # Social Media, Gráfica, Encarte, Branding, Consultoria
     descricao = db.Column(db.Text)
     status = db.Column(db.String(20), nullable=False, default='Orçamento')  # Orçamento, Aprovado, Produção, Concluído, Cancelado
     prioridade = db.Column(db.String(20), default='Normal')  # Urgente, Alta, Normal, Baixa
-    data_pedido = db.Column(db.DateTime, default=datetime.utcnow)
+    data_pedido = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     data_entrega = db.Column(db.DateTime)
     responsavel = db.Column(db.String(50))  # Yuri, Laina, Alysson, Externo
     valor = db.Column(db.Float, default=0.0)
@@ -20,8 +29,12 @@ class Pedido(db.Model):
     arquivos = db.Column(db.Text)  # JSON string com paths dos arquivos
     
     # Relacionamentos
-    demandas_social = db.relationship('DemandaSocialMedia', backref='pedido', lazy=True)
-    transacoes_financeiras = db.relationship('TransacaoFinanceira', backref='pedido', lazy=True)
+    demandas_social = db.relationship(
+        'DemandaSocialMedia', backref=db.backref('pedido', lazy=LAZY_RELACIONAMENTOS), lazy=LAZY_RELACIONAMENTOS
+    )
+    transacoes_financeiras = db.relationship(
+        'TransacaoFinanceira', backref=db.backref('pedido', lazy=LAZY_RELACIONAMENTOS), lazy=LAZY_RELACIONAMENTOS
+    )
 
     def __repr__(self):
         return f'<Pedido {self.id_pedido}>'
@@ -33,28 +46,6 @@ class Pedido(db.Model):
             return ((self.valor - (self.custo or 0)) / self.valor) * 100
         return 0
 
-    @property
-    def dias_para_entrega(self):
-        """Calcula quantos dias faltam para a entrega"""
-        if self.data_entrega:
-            delta = self.data_entrega - datetime.utcnow()
-            return delta.days
-        return None
-
-    @property
-    def status_prazo(self):
-        """Retorna o status do prazo (Atrasado, Urgente, No Prazo)"""
-        if not self.data_entrega or self.status == 'Concluído':
-            return 'No Prazo'
-        
-        dias = self.dias_para_entrega
-        if dias < 0:
-            return 'Atrasado'
-        elif dias <= 3:
-            return 'Urgente'
-        else:
-            return 'No Prazo'
-
     def to_dict(self):
         return {
             'id': self.id,
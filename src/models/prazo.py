@@ -0,0 +1,79 @@
+from sqlalchemy.ext.hybrid import hybrid_property
+from src.models.user import db
+from datetime import datetime, timedelta
+
+# Classificação do prazo de entrega (Atrasado, Urgente, No Prazo) comum a
+# pedidos e demandas, calculada em Python para um registro e em SQL para
+# filtrar e ordenar no banco, com a mesma regra.
+
+STATUS_PRAZO = ('Atrasado', 'Urgente', 'No Prazo')
+
+# Entrega em até DIAS_URGENCIA dias (completos) é urgente
+DIAS_URGENCIA = 3
+
+
+class PrazoEntregaMixin:
+    """dias_para_entrega e status_prazo a partir de data_entrega e status.
+
+    As classes definem STATUS_FINALIZADO: registros nesse status estão
+    sempre No Prazo.
+    """
+    STATUS_FINALIZADO = None
+
+    @property
+    def dias_para_entrega(self):
+        """Calcula quantos dias faltam para a entrega"""
+        if self.data_entrega:
+            delta = self.data_entrega - datetime.utcnow()
+            return delta.days
+        return None
+
+    @hybrid_property
+    def status_prazo(self):
+        """Retorna o status do prazo (Atrasado, Urgente, No Prazo)"""
+        if not self.data_entrega or self.status == self.STATUS_FINALIZADO:
+            return 'No Prazo'
+
+        dias = self.dias_para_entrega
+        if dias < 0:
+            return 'Atrasado'
+        elif dias <= DIAS_URGENCIA:
+            return 'Urgente'
+        else:
+            return 'No Prazo'
+
+    @status_prazo.expression
+    def status_prazo(cls):
+        # dias < 0 equivale a data_entrega < agora e dias <= 3 a
+        # data_entrega < agora + 4 dias (delta.days arredonda para baixo)
+        agora = datetime.utcnow()
+        return db.case(
+            (db.or_(cls.data_entrega.is_(None), cls.status == cls.STATUS_FINALIZADO), 'No Prazo'),
+            (cls.data_entrega < agora, 'Atrasado'),
+            (cls.data_entrega < agora + timedelta(days=DIAS_URGENCIA + 1), 'Urgente'),
+            else_='No Prazo'
+        )
+
+    @classmethod
+    def filtro_status_prazo(cls, status_prazo):
+        """Condição equivalente a status_prazo == valor, usando o índice de data_entrega"""
+        agora = datetime.utcnow()
+        limite_urgencia = agora + timedelta(days=DIAS_URGENCIA + 1)
+        pendente = cls.status != cls.STATUS_FINALIZADO
+
+        if status_prazo == 'Atrasado':
+            return db.and_(cls.data_entrega < agora, pendente)
+        if status_prazo == 'Urgente':
+            return db.and_(cls.data_entrega >= agora, cls.data_entrega < limite_urgencia, pendente)
+        if status_prazo == 'No Prazo':
+            return db.or_(
+                cls.data_entrega.is_(None),
+                cls.status == cls.STATUS_FINALIZADO,
+                cls.data_entrega >= limite_urgencia
+            )
+        raise ValueError(f"status_prazo inválido. Use um destes: {', '.join(STATUS_PRAZO)}")
+
+    @classmethod
+    def filtro_vence_ate(cls, limite):
+        """Pendentes com entrega antes de `limite` (inclui os atrasados)"""
+        return db.and_(cls.data_entrega < limite, cls.status != cls.STATUS_FINALIZADO)
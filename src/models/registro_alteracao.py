@@ -0,0 +1,15 @@
+from src.models.user import db
+
+class RegistroAlteracao(db.Model):
+    """Registro sequencial das alterações em pedidos e transações (ver src/services/colunar.py)"""
+    __tablename__ = 'registro_alteracao'
+    __table_args__ = (
+        db.Index('ix_registro_alteracao_tabela_seq', 'tabela', 'seq'),
+    )
+
+    seq = db.Column(db.Integer, primary_key=True)
+    tabela = db.Column(db.String(50), nullable=False)
+    registro_id = db.Column(db.Integer)  # None: a tabela inteira deve ser relida
+
+    def __repr__(self):
+        return f'<RegistroAlteracao {self.seq} {self.tabela} {self.registro_id}>'
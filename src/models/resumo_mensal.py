@@ -0,0 +1,53 @@
+from src.models.user import db
+
+class ResumoMensalFinanceiro(db.Model):
+    """Total mensal das transações financeiras por tipo e categoria"""
+    __tablename__ = 'resumo_mensal_financeiro'
+    __table_args__ = (
+        db.UniqueConstraint('mes', 'tipo', 'categoria', name='uq_resumo_financeiro_mes_tipo_categoria'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    mes = db.Column(db.String(7), nullable=False)  # AAAA-MM
+    tipo = db.Column(db.String(20), nullable=False)  # Receita, Despesa
+    categoria = db.Column(db.String(50), nullable=False)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ResumoMensalFinanceiro {self.mes} {self.tipo} {self.categoria}>'
+
+    def to_dict(self):
+        return {
+            'mes': self.mes,
+            'tipo': self.tipo,
+            'categoria': self.categoria,
+            'total': self.total,
+            'quantidade': self.quantidade
+        }
+
+class ResumoMensalPedido(db.Model):
+    """Total mensal dos pedidos (pela data do pedido) por status"""
+    __tablename__ = 'resumo_mensal_pedido'
+    __table_args__ = (
+        db.UniqueConstraint('mes', 'status', name='uq_resumo_pedido_mes_status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    mes = db.Column(db.String(7), nullable=False)  # AAAA-MM
+    status = db.Column(db.String(20), nullable=False)
+    total_valor = db.Column(db.Float, nullable=False, default=0.0)
+    total_custo = db.Column(db.Float, nullable=False, default=0.0)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ResumoMensalPedido {self.mes} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'mes': self.mes,
+            'status': self.status,
+            'total_valor': self.total_valor,
+            'total_custo': self.total_custo,
+            'quantidade': self.quantidade
+        }
@@ -3,6 +3,9 @@ from datetime import datetime
 
 class TabelaPreco(db.Model):
     __tablename__ = 'tabela_preco'
+    __table_args__ = (
+        db.Index('ix_tabela_preco_fornecedor_produto', 'fornecedor_id', 'produto_servico'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     produto_servico = db.Column(db.String(200), nullable=False)
@@ -11,7 +14,7 @@ class TabelaPreco(db.Model):
     preco_custo = db.Column(db.Float, nullable=False, default=0.0)
     markup = db.Column(db.Float, nullable=False, default=0.0)  # em percentual
     unidade = db.Column(db.String(20), nullable=False)  # Unidade, m², Pacote, Mês, Projeto
-    fornecedor_id = db.Column(db.Integer, db.ForeignKey('fornecedor.id'))
+    fornecedor_id = db.Column(db.Integer, db.ForeignKey('fornecedor.id'), index=True)
     ativo = db.Column(db.Boolean, default=True)
     ultima_atualizacao = db.Column(db.DateTime, default=datetime.utcnow)
 
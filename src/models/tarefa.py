@@ -0,0 +1,41 @@
+from src.models.user import db
+from datetime import datetime
+import json
+
+class Tarefa(db.Model):
+    """Tarefa executada em segundo plano (ver src/services/tarefas.py)"""
+    __tablename__ = 'tarefa'
+
+    id = db.Column(db.String(32), primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    parametros = db.Column(db.Text)  # JSON
+    # Hash de tipo + parâmetros enquanto a tarefa não termina: o índice único
+    # impede duas tarefas idênticas em andamento (None depois de concluída)
+    chave_ativa = db.Column(db.String(40), unique=True)
+    status = db.Column(db.String(20), nullable=False, default='Pendente', index=True)  # Pendente, Executando, Concluída, Erro
+    resultado = db.Column(db.Text)  # JSON
+    erro = db.Column(db.Text)
+    usuario_id = db.Column(db.Integer)
+    criada_em = db.Column(db.DateTime, default=datetime.utcnow)
+    iniciada_em = db.Column(db.DateTime)
+    concluida_em = db.Column(db.DateTime)
+    expira_em = db.Column(db.DateTime, index=True)
+
+    def __repr__(self):
+        return f'<Tarefa {self.id} {self.tipo} {self.status}>'
+
+    def to_dict(self, incluir_resultado=True):
+        dados = {
+            'id': self.id,
+            'tipo': self.tipo,
+            'parametros': json.loads(self.parametros) if self.parametros else {},
+            'status': self.status,
+            'erro': self.erro,
+            'criada_em': self.criada_em.isoformat() if self.criada_em else None,
+            'iniciada_em': self.iniciada_em.isoformat() if self.iniciada_em else None,
+            'concluida_em': self.concluida_em.isoformat() if self.concluida_em else None,
+            'expira_em': self.expira_em.isoformat() if self.expira_em else None
+        }
+        if incluir_resultado:
+            dados['resultado'] = json.loads(self.resultado) if self.resultado else None
+        return dados
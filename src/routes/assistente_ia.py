@@ -1,37 +1,38 @@
-from flask import Blueprint, jsonify, request, session
-from src.models.user import db
+from flask import Blueprint, jsonify, request
 from src.models.cliente import Cliente
 from src.models.pedido import Pedido
 from src.models.demanda_social import DemandaSocialMedia
 from src.models.financeiro import TransacaoFinanceira
-from datetime import datetime, timedelta
+from src.services.fatos import obter_fatos
+from src.services.perguntas import processar_pergunta
+from src.services.tarefas import tipo_tarefa
+from src.routes.tarefa import resposta_tarefa
+from src.utils.cache import etag_versoes
+from src.utils.auth import require_permissao
+from datetime import datetime
 import json
 
 assistente_ia_bp = Blueprint('assistente_ia', __name__)
 
-# Middleware para verificar autenticação
-def require_auth(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Acesso negado. Faça login primeiro.'}), 401
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
+# As análises e respostas usam dados de clientes, pedidos, financeiro e
+# demandas: quem consulta o assistente precisa poder ler todos eles
+RECURSOS_ASSISTENTE = ('assistente_ia', 'cliente', 'pedido', 'financeiro', 'demanda_social')
 
 class AssistenteIA:
     """Assistente IA para análise de dados do ERP"""
     
     @staticmethod
-    def analisar_performance_geral():
+    def analisar_performance_geral(fatos=None):
         """Analisa a performance geral da empresa"""
+        fatos = fatos or obter_fatos()
         insights = []
         alertas = []
         recomendacoes = []
         
         # Análise de clientes
-        total_clientes = Cliente.query.count()
-        clientes_ativos = Cliente.query.filter_by(status='Ativo').count()
-        prospects = Cliente.query.filter_by(status='Prospect').count()
+        total_clientes = fatos.total_clientes
+        clientes_ativos = fatos.clientes_ativos
+        prospects = fatos.prospects
         
         if total_clientes > 0:
             taxa_conversao = (clientes_ativos / total_clientes) * 100
@@ -59,10 +60,7 @@ class AssistenteIA:
             })
         
         # Análise de pedidos
-        pedidos_atrasados = Pedido.query.filter(
-            Pedido.data_entrega < datetime.utcnow(),
-            Pedido.status != 'Concluído'
-        ).count()
+        pedidos_atrasados = fatos.pedidos_atrasados
         
         if pedidos_atrasados > 0:
             alertas.append({
@@ -73,16 +71,8 @@ class AssistenteIA:
             })
         
         # Análise financeira
-        inicio_mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        receitas_mes = db.session.query(db.func.sum(TransacaoFinanceira.valor)).filter(
-            TransacaoFinanceira.tipo == 'Receita',
-            TransacaoFinanceira.data >= inicio_mes
-        ).scalar() or 0
-        
-        despesas_mes = db.session.query(db.func.sum(TransacaoFinanceira.valor)).filter(
-            TransacaoFinanceira.tipo == 'Despesa',
-            TransacaoFinanceira.data >= inicio_mes
-        ).scalar() or 0
+        receitas_mes = fatos.receitas_mes
+        despesas_mes = fatos.despesas_mes
         
         if despesas_mes > receitas_mes:
             alertas.append({
@@ -93,24 +83,20 @@ class AssistenteIA:
             })
         
         # Análise de margem
-        pedidos_concluidos = Pedido.query.filter_by(status='Concluído').all()
-        if pedidos_concluidos:
-            margens = [p.margem for p in pedidos_concluidos if p.valor and p.valor > 0]
-            if margens:
-                margem_media = sum(margens) / len(margens)
-                if margem_media < 20:
-                    alertas.append({
-                        'tipo': 'warning',
-                        'titulo': 'Margem Baixa',
-                        'descricao': f'Margem média de {margem_media:.1f}% está abaixo do recomendado (20%+).',
-                        'categoria': 'financeiro'
-                    })
-                    recomendacoes.append({
-                        'titulo': 'Otimize a Margem de Lucro',
-                        'descricao': 'Revise a tabela de preços e negocie melhores condições com fornecedores.',
-                        'prioridade': 'alta',
-                        'categoria': 'financeiro'
-                    })
+        margem_media = fatos.margem_media
+        if margem_media is not None and margem_media < 20:
+            alertas.append({
+                'tipo': 'warning',
+                'titulo': 'Margem Baixa',
+                'descricao': f'Margem média de {margem_media:.1f}% está abaixo do recomendado (20%+).',
+                'categoria': 'financeiro'
+            })
+            recomendacoes.append({
+                'titulo': 'Otimize a Margem de Lucro',
+                'descricao': 'Revise a tabela de preços e negocie melhores condições com fornecedores.',
+                'prioridade': 'alta',
+                'categoria': 'financeiro'
+            })
         
         return {
             'insights': insights,
@@ -119,31 +105,21 @@ class AssistenteIA:
         }
     
     @staticmethod
-    def analisar_tendencias():
+    def analisar_tendencias(fatos=None):
         """Analisa tendências dos últimos meses"""
+        fatos = fatos or obter_fatos()
         tendencias = []
         
         # Análise de faturamento dos últimos 6 meses
-        faturamentos = []
-        for i in range(6):
-            data_ref = datetime.now().replace(day=1) - timedelta(days=30 * i)
-            inicio = data_ref.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            fim = (inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-            
-            faturamento = db.session.query(db.func.sum(Pedido.valor)).filter(
-                Pedido.data_pedido >= inicio,
-                Pedido.data_pedido <= fim,
-                Pedido.status == 'Concluído'
-            ).scalar() or 0
-            
-            faturamentos.insert(0, faturamento)
+        faturamentos = fatos.faturamento_meses
         
         # Calcular tendência
         if len(faturamentos) >= 3:
             ultimos_3 = sum(faturamentos[-3:]) / 3
             primeiros_3 = sum(faturamentos[:3]) / 3
             
-            if ultimos_3 > primeiros_3 * 1.1:
+            # Sem faturamento no início do período não há base para o percentual
+            if primeiros_3 > 0 and ultimos_3 > primeiros_3 * 1.1:
                 tendencias.append({
                     'tipo': 'crescimento',
                     'titulo': 'Faturamento em Crescimento',
@@ -161,12 +137,13 @@ class AssistenteIA:
         return tendencias
     
     @staticmethod
-    def sugerir_acoes():
+    def sugerir_acoes(fatos=None):
         """Sugere ações baseadas nos dados atuais"""
+        fatos = fatos or obter_fatos()
         acoes = []
         
         # Verificar demandas urgentes
-        demandas_urgentes = DemandaSocialMedia.query.filter_by(prioridade='Urgente').count()
+        demandas_urgentes = fatos.demandas_urgentes
         if demandas_urgentes > 0:
             acoes.append({
                 'titulo': 'Priorizar Demandas Urgentes',
@@ -176,11 +153,7 @@ class AssistenteIA:
             })
         
         # Verificar clientes sem contato recente
-        um_mes_atras = datetime.now() - timedelta(days=30)
-        clientes_sem_contato = Cliente.query.filter(
-            Cliente.ultimo_contato < um_mes_atras,
-            Cliente.status == 'Ativo'
-        ).count()
+        clientes_sem_contato = fatos.clientes_sem_contato
         
         if clientes_sem_contato > 0:
             acoes.append({
@@ -191,13 +164,12 @@ class AssistenteIA:
             })
         
         # Verificar oportunidades de upsell
-        clientes_com_poucos_pedidos = Cliente.query.all()
-        clientes_oportunidade = [c for c in clientes_com_poucos_pedidos if c.qtd_pedidos == 1 and c.status == 'Ativo']
+        clientes_oportunidade = fatos.clientes_um_pedido
         
         if clientes_oportunidade:
             acoes.append({
                 'titulo': 'Oportunidades de Upsell',
-                'descricao': f'{len(clientes_oportunidade)} clientes ativos fizeram apenas 1 pedido. Ofereça novos serviços.',
+                'descricao': f'{clientes_oportunidade} clientes ativos fizeram apenas 1 pedido. Ofereça novos serviços.',
                 'tipo': 'oportunidade',
                 'categoria': 'vendas'
             })
@@ -205,7 +177,8 @@ class AssistenteIA:
         return acoes
 
 @assistente_ia_bp.route('/assistente-ia/analise-geral', methods=['GET'])
-@require_auth
+@require_permissao('ler', *RECURSOS_ASSISTENTE)
+@etag_versoes(Cliente, Pedido, TransacaoFinanceira, DemandaSocialMedia, depende_do_tempo=True)
 def get_analise_geral():
     """Retorna análise geral da performance"""
     try:
@@ -215,7 +188,8 @@ def get_analise_geral():
         return jsonify({'error': f'Erro na análise: {str(e)}'}), 500
 
 @assistente_ia_bp.route('/assistente-ia/tendencias', methods=['GET'])
-@require_auth
+@require_permissao('ler', *RECURSOS_ASSISTENTE)
+@etag_versoes(Cliente, Pedido, TransacaoFinanceira, DemandaSocialMedia, depende_do_tempo=True)
 def get_tendencias():
     """Retorna análise de tendências"""
     try:
@@ -225,7 +199,8 @@ def get_tendencias():
         return jsonify({'error': f'Erro na análise de tendências: {str(e)}'}), 500
 
 @assistente_ia_bp.route('/assistente-ia/sugestoes', methods=['GET'])
-@require_auth
+@require_permissao('ler', *RECURSOS_ASSISTENTE)
+@etag_versoes(Cliente, Pedido, TransacaoFinanceira, DemandaSocialMedia, depende_do_tempo=True)
 def get_sugestoes():
     """Retorna sugestões de ações"""
     try:
@@ -235,40 +210,23 @@ def get_sugestoes():
         return jsonify({'error': f'Erro ao gerar sugestões: {str(e)}'}), 500
 
 @assistente_ia_bp.route('/assistente-ia/relatorio-completo', methods=['GET'])
-@require_auth
+@require_permissao('ler', *RECURSOS_ASSISTENTE)
+@etag_versoes(Cliente, Pedido, TransacaoFinanceira, DemandaSocialMedia, depende_do_tempo=True)
 def get_relatorio_completo():
     """Retorna relatório completo do assistente IA"""
     try:
-        analise_geral = AssistenteIA.analisar_performance_geral()
-        tendencias = AssistenteIA.analisar_tendencias()
-        acoes = AssistenteIA.sugerir_acoes()
-        
-        # Estatísticas resumidas
-        total_clientes = Cliente.query.count()
-        total_pedidos = Pedido.query.count()
-        pedidos_mes = Pedido.query.filter(
-            Pedido.data_pedido >= datetime.now().replace(day=1)
-        ).count()
-        
-        relatorio = {
-            'timestamp': datetime.now().isoformat(),
-            'resumo': {
-                'total_clientes': total_clientes,
-                'total_pedidos': total_pedidos,
-                'pedidos_mes': pedidos_mes
-            },
-            'analise_geral': analise_geral,
-            'tendencias': tendencias,
-            'acoes_sugeridas': acoes,
-            'score_saude': AssistenteIA.calcular_score_saude()
-        }
-        
-        return jsonify(relatorio)
+        return jsonify(montar_relatorio_completo())
     except Exception as e:
         return jsonify({'error': f'Erro ao gerar relatório: {str(e)}'}), 500
 
+@assistente_ia_bp.route('/assistente-ia/relatorio-completo', methods=['POST'])
+@require_permissao('ler', *RECURSOS_ASSISTENTE)
+def enviar_relatorio_completo():
+    """Gera o relatório completo em segundo plano (consultar em /api/tarefas/<id>)"""
+    return resposta_tarefa('relatorio_completo')
+
 @assistente_ia_bp.route('/assistente-ia/pergunta', methods=['POST'])
-@require_auth
+@require_permissao('ler', *RECURSOS_ASSISTENTE)
 def responder_pergunta():
     """Responde perguntas específicas sobre os dados"""
     try:
@@ -281,77 +239,45 @@ def responder_pergunta():
         return jsonify({'error': f'Erro ao processar pergunta: {str(e)}'}), 500
 
 # Métodos auxiliares para o AssistenteIA
-def calcular_score_saude():
+@tipo_tarefa('relatorio_completo', recursos=RECURSOS_ASSISTENTE)
+def montar_relatorio_completo():
+    """Monta o relatório completo (também executado como tarefa)"""
+    # Todas as análises leem o mesmo retrato dos fatos
+    fatos = obter_fatos()
+    
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'resumo': {
+            'total_clientes': fatos.total_clientes,
+            'total_pedidos': fatos.total_pedidos,
+            'pedidos_mes': fatos.pedidos_mes
+        },
+        'analise_geral': AssistenteIA.analisar_performance_geral(fatos),
+        'tendencias': AssistenteIA.analisar_tendencias(fatos),
+        'acoes_sugeridas': AssistenteIA.sugerir_acoes(fatos),
+        'score_saude': AssistenteIA.calcular_score_saude(fatos)
+    }
+
+def calcular_score_saude(fatos=None):
     """Calcula um score de saúde da empresa (0-100)"""
+    fatos = fatos or obter_fatos()
     score = 100
     
     # Penalizar por pedidos atrasados
-    pedidos_atrasados = Pedido.query.filter(
-        Pedido.data_entrega < datetime.utcnow(),
-        Pedido.status != 'Concluído'
-    ).count()
-    total_pedidos = Pedido.query.count()
-    
-    if total_pedidos > 0:
-        taxa_atraso = pedidos_atrasados / total_pedidos
+    if fatos.total_pedidos > 0:
+        taxa_atraso = fatos.pedidos_atrasados / fatos.total_pedidos
         score -= taxa_atraso * 30
     
     # Penalizar por margem baixa
-    pedidos_concluidos = Pedido.query.filter_by(status='Concluído').all()
-    if pedidos_concluidos:
-        margens = [p.margem for p in pedidos_concluidos if p.valor and p.valor > 0]
-        if margens:
-            margem_media = sum(margens) / len(margens)
-            if margem_media < 20:
-                score -= (20 - margem_media) * 2
+    if fatos.margem_media is not None and fatos.margem_media < 20:
+        score -= (20 - fatos.margem_media) * 2
     
     # Bonificar por crescimento
-    inicio_mes = datetime.now().replace(day=1)
-    mes_anterior = (inicio_mes - timedelta(days=1)).replace(day=1)
-    
-    pedidos_mes_atual = Pedido.query.filter(Pedido.data_pedido >= inicio_mes).count()
-    pedidos_mes_anterior = Pedido.query.filter(
-        Pedido.data_pedido >= mes_anterior,
-        Pedido.data_pedido < inicio_mes
-    ).count()
-    
-    if pedidos_mes_anterior > 0 and pedidos_mes_atual > pedidos_mes_anterior:
+    if fatos.pedidos_mes_anterior > 0 and fatos.pedidos_mes > fatos.pedidos_mes_anterior:
         score += 10
     
     return max(0, min(100, round(score)))
 
-def processar_pergunta(pergunta):
-    """Processa perguntas em linguagem natural"""
-    pergunta = pergunta.lower()
-    
-    if 'faturamento' in pergunta or 'receita' in pergunta:
-        inicio_mes = datetime.now().replace(day=1)
-        faturamento = db.session.query(db.func.sum(Pedido.valor)).filter(
-            Pedido.data_pedido >= inicio_mes,
-            Pedido.status == 'Concluído'
-        ).scalar() or 0
-        return f"O faturamento deste mês é de R$ {faturamento:.2f}."
-    
-    elif 'cliente' in pergunta:
-        total = Cliente.query.count()
-        ativos = Cliente.query.filter_by(status='Ativo').count()
-        return f"Você tem {total} clientes cadastrados, sendo {ativos} ativos."
-    
-    elif 'pedido' in pergunta:
-        total = Pedido.query.count()
-        andamento = Pedido.query.filter(Pedido.status.in_(['Aprovado', 'Produção'])).count()
-        return f"Existem {total} pedidos no total, com {andamento} em andamento."
-    
-    elif 'atraso' in pergunta:
-        atrasados = Pedido.query.filter(
-            Pedido.data_entrega < datetime.utcnow(),
-            Pedido.status != 'Concluído'
-        ).count()
-        return f"Há {atrasados} pedidos atrasados no momento."
-    
-    else:
-        return "Desculpe, não entendi sua pergunta. Tente perguntar sobre faturamento, clientes, pedidos ou atrasos."
-
 # Adicionar métodos ao AssistenteIA
 AssistenteIA.calcular_score_saude = staticmethod(calcular_score_saude)
 AssistenteIA.processar_pergunta = staticmethod(processar_pergunta)
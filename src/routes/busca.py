@@ -0,0 +1,37 @@
+from flask import Blueprint, jsonify, request
+from src.models.cliente import Cliente
+from src.models.pedido import Pedido
+from src.models.fornecedor import Fornecedor
+from src.models.demanda_social import DemandaSocialMedia
+from src.models.tabela_preco import TabelaPreco
+from src.services.busca import FONTES_POR_NOME, TIPOS, ConsultaInvalida, buscar
+from src.utils.cache import etag_versoes
+from src.utils.auth import obter_principal, pode, require_login
+
+busca_bp = Blueprint('busca', __name__)
+
+@busca_bp.route('/search', methods=['GET'])
+@require_login
+@etag_versoes(Cliente, Pedido, Fornecedor, DemandaSocialMedia, TabelaPreco)
+def search():
+    """Busca por palavras (ou início de palavras) em todos os cadastros"""
+    texto = request.args.get('q', '')
+    tipos = request.args.getlist('tipo') or list(TIPOS)
+    limite = request.args.get('limite', 20, type=int)
+
+    invalidos = set(tipos) - set(TIPOS)
+    if invalidos:
+        return jsonify({'error': f"Tipo inválido: {', '.join(sorted(invalidos))}. Use um destes: {', '.join(TIPOS)}"}), 400
+    if not 1 <= limite <= 100:
+        return jsonify({'error': 'limite deve estar entre 1 e 100'}), 400
+
+    # Só os tipos que o usuário pode consultar
+    principal = obter_principal()
+    tipos = [tipo for tipo in tipos if pode(principal, FONTES_POR_NOME[tipo].recurso, 'ler')]
+
+    try:
+        resultados = buscar(texto, tipos, limite)
+    except ConsultaInvalida as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'q': texto, 'resultados': resultados})
@@ -1,28 +1,30 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, request
 from src.models.user import db
 from src.models.cliente import Cliente
+from src.models.pedido import Pedido
+from src.services.ranking import ranking_clientes, CRITERIOS_RANKING
+from src.services.validacao import ErroValidacao, valores_cliente
+from src.services.importacao import importar_clientes
+from src.utils.paginacao import paginacao_solicitada, paginar
+from src.utils.streaming import resposta_json_stream
+from src.utils.cache import cache_resposta, etag_versoes
+from src.utils.planilhas import registros_da_requisicao
+from src.utils.auth import require_auth
 from datetime import datetime
 
 cliente_bp = Blueprint('cliente', __name__)
 
-# Middleware para verificar autenticação
-def require_auth(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Acesso negado. Faça login primeiro.'}), 401
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
-
 @cliente_bp.route('/clientes', methods=['GET'])
 @require_auth
+@etag_versoes(Cliente, Pedido)
 def get_clientes():
     # Filtros opcionais
     status = request.args.get('status')
     tipo = request.args.get('tipo')
     cidade = request.args.get('cidade')
     
-    query = Cliente.query
+    # valor_total/qtd_pedidos/ticket_medio calculados no banco, sem carregar os pedidos
+    query = Cliente.query.options(*Cliente.opcoes_agregados())
     
     if status:
         query = query.filter(Cliente.status == status)
@@ -31,42 +33,37 @@ def get_clientes():
     if cidade:
         query = query.filter(Cliente.cidade.ilike(f'%{cidade}%'))
     
-    clientes = query.all()
-    return jsonify([cliente.to_dict() for cliente in clientes])
+    if paginacao_solicitada():
+        return paginar(query, [(Cliente.id, False)], Cliente.to_dict)
+    
+    return resposta_json_stream(query, Cliente.to_dict)
 
 @cliente_bp.route('/clientes', methods=['POST'])
 @require_auth
 def create_cliente():
     data = request.json
     
-    # Validações
-    if not data.get('nome'):
-        return jsonify({'error': 'Nome é obrigatório'}), 400
-    
-    if not data.get('tipo'):
-        return jsonify({'error': 'Tipo é obrigatório'}), 400
-    
-    cliente = Cliente(
-        nome=data['nome'],
-        tipo=data['tipo'],
-        cidade=data.get('cidade'),
-        populacao=data.get('populacao'),
-        contato_principal=data.get('contato_principal'),
-        whatsapp=data.get('whatsapp'),
-        email=data.get('email'),
-        status=data.get('status', 'Prospect'),
-        segmento=data.get('segmento'),
-        observacoes=data.get('observacoes')
-    )
+    try:
+        cliente = Cliente(**valores_cliente(data))
+    except ErroValidacao as e:
+        return jsonify({'error': str(e)}), 400
     
     db.session.add(cliente)
     db.session.commit()
     return jsonify(cliente.to_dict()), 201
 
+@cliente_bp.route('/clientes/importar', methods=['POST'])
+@require_auth
+def importar_clientes_lote():
+    """Importa clientes em lote a partir de CSV ou array JSON (corpo ou arquivo)"""
+    relatorio = importar_clientes(registros_da_requisicao())
+    return jsonify(relatorio), 400 if 'error' in relatorio else 200
+
 @cliente_bp.route('/clientes/<int:cliente_id>', methods=['GET'])
 @require_auth
+@etag_versoes(Cliente, Pedido)
 def get_cliente(cliente_id):
-    cliente = Cliente.query.get_or_404(cliente_id)
+    cliente = Cliente.query.options(*Cliente.opcoes_agregados()).filter(Cliente.id == cliente_id).first_or_404()
     return jsonify(cliente.to_dict())
 
 @cliente_bp.route('/clientes/<int:cliente_id>', methods=['PUT'])
@@ -102,6 +99,8 @@ def delete_cliente(cliente_id):
 
 @cliente_bp.route('/clientes/stats', methods=['GET'])
 @require_auth
+@etag_versoes(Cliente, Pedido)
+@cache_resposta(Cliente, Pedido)
 def get_clientes_stats():
     """Retorna estatísticas dos clientes"""
     total_clientes = Cliente.query.count()
@@ -109,9 +108,7 @@ def get_clientes_stats():
     prospects = Cliente.query.filter_by(status='Prospect').count()
     
     # Top 5 clientes por valor total
-    top_clientes = Cliente.query.all()
-    top_clientes.sort(key=lambda x: x.valor_total, reverse=True)
-    top_5 = [cliente.to_dict() for cliente in top_clientes[:5]]
+    top_5 = [cliente.to_dict() for cliente, *_ in ranking_clientes('valor_total', 5)]
     
     return jsonify({
         'total_clientes': total_clientes,
@@ -120,3 +117,28 @@ def get_clientes_stats():
         'top_clientes': top_5
     })
 
+@cliente_bp.route('/clientes/ranking', methods=['GET'])
+@require_auth
+@etag_versoes(Cliente, Pedido)
+def get_clientes_ranking():
+    """Retorna o ranking de clientes por valor total, quantidade de pedidos ou ticket médio"""
+    criterio = request.args.get('criterio', 'valor_total')
+    limite = request.args.get('limite', 5, type=int)
+    status = request.args.get('status')
+    
+    if criterio not in CRITERIOS_RANKING:
+        return jsonify({'error': f"Critério inválido. Use: {', '.join(CRITERIOS_RANKING)}"}), 400
+    
+    ranking = ranking_clientes(criterio, max(1, min(limite, 100)), status)
+    return jsonify([
+        {
+            'id': cliente.id,
+            'nome': cliente.nome,
+            'status': cliente.status,
+            'valor_total': valor_total,
+            'qtd_pedidos': qtd_pedidos,
+            'ticket_medio': ticket_medio
+        }
+        for cliente, valor_total, qtd_pedidos, ticket_medio in ranking
+    ])
+
@@ -1,140 +1,101 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, request
 from src.models.user import db
+from src.models.configuracao import ConfiguracaoEmpresa
 from src.models.cliente import Cliente
 from src.models.pedido import Pedido
-from src.models.demanda_social import DemandaSocialMedia
 from src.models.financeiro import TransacaoFinanceira
-from src.models.configuracao import ConfiguracaoEmpresa
-from datetime import datetime, timedelta
+from src.models.demanda_social import DemandaSocialMedia
+from src.services.kpis import (
+    periodo_mes_atual, kpis_clientes, kpis_pedidos,
+    pedidos_por_status, kpis_financeiro, kpis_demandas
+)
+from src.services.prazos import FONTES as FONTES_PRAZOS, quadro_prazos
+from src.services.ranking import ranking_clientes
+from src.services.resumo_mensal import ultimos_meses, serie_pedidos
+from src.services.imagens import VERSAO_DERIVADOS, urls_imagem
+from src.utils.cache import cache_resposta, etag_versoes
+from src.utils.auth import require_auth, require_permissao
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
-# Middleware para verificar autenticação
-def require_auth(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Acesso negado. Faça login primeiro.'}), 401
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
-
 @dashboard_bp.route('/dashboard', methods=['GET'])
-@require_auth
+@require_permissao('ler', 'dashboard', 'cliente', 'pedido', 'financeiro', 'demanda_social')
+@etag_versoes(Cliente, Pedido, TransacaoFinanceira, DemandaSocialMedia, depende_do_tempo=True)
+@cache_resposta(Cliente, Pedido, TransacaoFinanceira, DemandaSocialMedia)
 def get_dashboard():
     """Retorna todos os KPIs do dashboard principal"""
     
     # Período atual (mês atual)
-    inicio_mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    fim_mes = (inicio_mes + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-    
-    # KPIs de Clientes
-    total_clientes = Cliente.query.count()
-    clientes_ativos = Cliente.query.filter_by(status='Ativo').count()
-    novos_clientes_mes = Cliente.query.filter(Cliente.data_cadastro >= inicio_mes).count()
-    
-    # KPIs de Pedidos
-    total_pedidos = Pedido.query.count()
-    pedidos_em_andamento = Pedido.query.filter(Pedido.status.in_(['Aprovado', 'Produção'])).count()
-    pedidos_atrasados = Pedido.query.filter(
-        Pedido.data_entrega < datetime.utcnow(),
-        Pedido.status != 'Concluído'
-    ).count()
+    inicio_mes, fim_mes = periodo_mes_atual()
     
-    # Faturamento do mês
-    faturamento_mes = db.session.query(db.func.sum(Pedido.valor)).filter(
-        Pedido.data_pedido >= inicio_mes,
-        Pedido.status == 'Concluído'
-    ).scalar() or 0
+    # Uma consulta agregada por entidade
+    clientes = kpis_clientes(inicio_mes)
+    pedidos = kpis_pedidos(inicio_mes)
+    financeiro = kpis_financeiro(inicio_mes, fim_mes)
+    demandas = kpis_demandas()
     
-    # Margem média
-    pedidos_concluidos = Pedido.query.filter_by(status='Concluído').all()
-    margem_media = 0
-    if pedidos_concluidos:
-        margens = [p.margem for p in pedidos_concluidos if p.valor and p.valor > 0]
-        margem_media = sum(margens) / len(margens) if margens else 0
-    
-    # KPIs Financeiros
-    receitas_mes = db.session.query(db.func.sum(TransacaoFinanceira.valor)).filter(
-        TransacaoFinanceira.tipo == 'Receita',
-        TransacaoFinanceira.data >= inicio_mes,
-        TransacaoFinanceira.data <= fim_mes
-    ).scalar() or 0
-    
-    despesas_mes = db.session.query(db.func.sum(TransacaoFinanceira.valor)).filter(
-        TransacaoFinanceira.tipo == 'Despesa',
-        TransacaoFinanceira.data >= inicio_mes,
-        TransacaoFinanceira.data <= fim_mes
-    ).scalar() or 0
-    
-    saldo_mes = receitas_mes - despesas_mes
-    
-    # KPIs de Demandas Social Media
-    demandas_em_criacao = DemandaSocialMedia.query.filter_by(status='Criação').count()
-    demandas_aguardando = DemandaSocialMedia.query.filter_by(status='Aguardando Aprovação').count()
-    demandas_urgentes = DemandaSocialMedia.query.filter_by(prioridade='Urgente').count()
-    
-    # Pedidos por status (para gráfico)
-    pedidos_por_status = db.session.query(
-        Pedido.status,
-        db.func.count(Pedido.id)
-    ).group_by(Pedido.status).all()
-    
-    # Faturamento dos últimos 6 meses (para gráfico)
-    faturamento_historico = []
-    for i in range(6):
-        data_ref = datetime.now().replace(day=1) - timedelta(days=30 * i)
-        inicio = data_ref.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        fim = (inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        faturamento = db.session.query(db.func.sum(Pedido.valor)).filter(
-            Pedido.data_pedido >= inicio,
-            Pedido.data_pedido <= fim,
-            Pedido.status == 'Concluído'
-        ).scalar() or 0
-        
-        faturamento_historico.insert(0, {
-            'mes': inicio.strftime('%Y-%m'),
-            'valor': faturamento
-        })
+    # Faturamento dos últimos 6 meses (para gráfico), lido do resumo mensal
+    meses = ultimos_meses(6)
+    faturamentos = serie_pedidos(meses, status='Concluído')['valor']
+    faturamento_historico = [{'mes': mes, 'valor': valor} for mes, valor in zip(meses, faturamentos)]
     
     # Top 5 clientes por valor
-    top_clientes = Cliente.query.all()
-    top_clientes.sort(key=lambda x: x.valor_total, reverse=True)
     top_5_clientes = [
         {
             'nome': cliente.nome,
-            'valor_total': cliente.valor_total,
-            'qtd_pedidos': cliente.qtd_pedidos
+            'valor_total': valor_total,
+            'qtd_pedidos': qtd_pedidos
         }
-        for cliente in top_clientes[:5]
+        for cliente, valor_total, qtd_pedidos, _ in ranking_clientes('valor_total', 5)
     ]
     
     return jsonify({
         'kpis': {
-            'total_clientes': total_clientes,
-            'clientes_ativos': clientes_ativos,
-            'novos_clientes_mes': novos_clientes_mes,
-            'total_pedidos': total_pedidos,
-            'pedidos_em_andamento': pedidos_em_andamento,
-            'pedidos_atrasados': pedidos_atrasados,
-            'faturamento_mes': faturamento_mes,
-            'margem_media': round(margem_media, 2),
-            'receitas_mes': receitas_mes,
-            'despesas_mes': despesas_mes,
-            'saldo_mes': saldo_mes,
-            'demandas_em_criacao': demandas_em_criacao,
-            'demandas_aguardando': demandas_aguardando,
-            'demandas_urgentes': demandas_urgentes
+            'total_clientes': clientes['total_clientes'],
+            'clientes_ativos': clientes['clientes_ativos'],
+            'novos_clientes_mes': clientes['novos_clientes_mes'],
+            'total_pedidos': pedidos['total_pedidos'],
+            'pedidos_em_andamento': pedidos['pedidos_em_andamento'],
+            'pedidos_atrasados': pedidos['pedidos_atrasados'],
+            'faturamento_mes': pedidos['faturamento_mes'],
+            'margem_media': round(pedidos['margem_media'], 2),
+            'receitas_mes': financeiro['receitas_mes'],
+            'despesas_mes': financeiro['despesas_mes'],
+            'saldo_mes': financeiro['saldo_mes'],
+            'demandas_em_criacao': demandas['demandas_em_criacao'],
+            'demandas_aguardando': demandas['demandas_aguardando'],
+            'demandas_urgentes': demandas['demandas_urgentes']
         },
         'graficos': {
-            'pedidos_por_status': {status: count for status, count in pedidos_por_status},
+            'pedidos_por_status': pedidos_por_status(),
             'faturamento_historico': faturamento_historico,
             'top_clientes': top_5_clientes
         }
     })
 
+@dashboard_bp.route('/dashboard/prazos', methods=['GET'])
+@require_permissao('ler', 'dashboard', 'cliente', 'pedido', 'demanda_social')
+@etag_versoes(Cliente, Pedido, DemandaSocialMedia, depende_do_tempo=True)
+@cache_resposta(Cliente, Pedido, DemandaSocialMedia)
+def get_quadro_prazos():
+    """Pedidos e demandas atrasados ou que vencem em breve, por data de entrega"""
+    dias = request.args.get('dias', 7, type=int)
+    limite = request.args.get('limite', 50, type=int)
+    tipos = request.args.getlist('tipo') or list(FONTES_PRAZOS)
+    
+    if not 0 <= dias <= 365:
+        return jsonify({'error': 'dias deve estar entre 0 e 365'}), 400
+    if not 1 <= limite <= 500:
+        return jsonify({'error': 'limite deve estar entre 1 e 500'}), 400
+    invalidos = set(tipos) - set(FONTES_PRAZOS)
+    if invalidos:
+        return jsonify({'error': f"Tipo inválido: {', '.join(sorted(invalidos))}"}), 400
+    
+    return jsonify(quadro_prazos(dias, limite, tipos))
+
 @dashboard_bp.route('/configuracao', methods=['GET'])
 @require_auth
+@etag_versoes(ConfiguracaoEmpresa, VERSAO_DERIVADOS)
 def get_configuracao():
     """Retorna a configuração da empresa"""
     config = ConfiguracaoEmpresa.query.first()
@@ -144,7 +105,7 @@ def get_configuracao():
         db.session.add(config)
         db.session.commit()
     
-    return jsonify(config.to_dict())
+    return jsonify({**config.to_dict(), 'logo_derivados': urls_imagem(config.logo_path)})
 
 @dashboard_bp.route('/configuracao', methods=['PUT'])
 @require_auth
@@ -168,5 +129,5 @@ def update_configuracao():
     config.tema_escuro = data.get('tema_escuro', config.tema_escuro)
     
     db.session.commit()
-    return jsonify(config.to_dict())
+    return jsonify({**config.to_dict(), 'logo_derivados': urls_imagem(config.logo_path)})
 
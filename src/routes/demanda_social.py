@@ -1,51 +1,59 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, request
 from src.models.user import db
 from src.models.demanda_social import DemandaSocialMedia
 from src.models.cliente import Cliente
 from src.models.pedido import Pedido
+from src.services.validacao import CAMPOS_LOTE_DEMANDA, ErroValidacao
+from src.services.lote import atualizar_em_lote, filtros_para_condicoes
+from src.services.imagens import VERSAO_DERIVADOS
+from src.utils.paginacao import paginacao_solicitada, paginar
+from src.utils.streaming import resposta_json_stream
+from src.utils.cache import cache_resposta, etag_versoes
+from src.utils.auth import require_auth
 from datetime import datetime
 
 demanda_social_bp = Blueprint('demanda_social', __name__)
 
-# Middleware para verificar autenticação
-def require_auth(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Acesso negado. Faça login primeiro.'}), 401
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
+def _query_demandas():
+    # O nome do cliente vem na mesma consulta (evita um SELECT por demanda)
+    return db.session.query(DemandaSocialMedia, Cliente.nome).outerjoin(
+        Cliente, DemandaSocialMedia.cliente_id == Cliente.id
+    )
+
+# Filtros aceitos pela listagem e pelas alterações em lote
+FILTROS_DEMANDAS = {
+    'status': DemandaSocialMedia.status,
+    'tipo_arte': DemandaSocialMedia.tipo_arte,
+    'cliente_id': DemandaSocialMedia.cliente_id,
+    'prioridade': DemandaSocialMedia.prioridade,
+    # Atrasado, Urgente ou No Prazo, calculado no banco
+    'status_prazo': DemandaSocialMedia.filtro_status_prazo
+}
+
+def _serializar_demanda(linha):
+    demanda, cliente_nome = linha
+    demanda_dict = demanda.to_dict()
+    demanda_dict['cliente_nome'] = cliente_nome
+    return demanda_dict
 
 @demanda_social_bp.route('/demandas-social', methods=['GET'])
 @require_auth
+@etag_versoes(DemandaSocialMedia, Cliente, VERSAO_DERIVADOS, depende_do_tempo=True)
 def get_demandas_social():
     # Filtros opcionais
-    status = request.args.get('status')
-    tipo_arte = request.args.get('tipo_arte')
-    cliente_id = request.args.get('cliente_id')
-    prioridade = request.args.get('prioridade')
-    
-    query = DemandaSocialMedia.query
-    
-    if status:
-        query = query.filter(DemandaSocialMedia.status == status)
-    if tipo_arte:
-        query = query.filter(DemandaSocialMedia.tipo_arte == tipo_arte)
-    if cliente_id:
-        query = query.filter(DemandaSocialMedia.cliente_id == cliente_id)
-    if prioridade:
-        query = query.filter(DemandaSocialMedia.prioridade == prioridade)
-    
-    demandas = query.order_by(DemandaSocialMedia.data_solicitacao.desc()).all()
-    
-    # Incluir dados do cliente
-    result = []
-    for demanda in demandas:
-        demanda_dict = demanda.to_dict()
-        demanda_dict['cliente_nome'] = demanda.cliente.nome if demanda.cliente else None
-        result.append(demanda_dict)
-    
-    return jsonify(result)
+    try:
+        query = _query_demandas().filter(*filtros_para_condicoes(FILTROS_DEMANDAS, request.args))
+    except ErroValidacao as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if paginacao_solicitada():
+        return paginar(
+            query,
+            [(DemandaSocialMedia.data_solicitacao, True), (DemandaSocialMedia.id, True)],
+            _serializar_demanda
+        )
+    
+    return resposta_json_stream(query.order_by(DemandaSocialMedia.data_solicitacao.desc()), _serializar_demanda)
 
 @demanda_social_bp.route('/demandas-social', methods=['POST'])
 @require_auth
@@ -96,11 +104,10 @@ def create_demanda_social():
 
 @demanda_social_bp.route('/demandas-social/<int:demanda_id>', methods=['GET'])
 @require_auth
+@etag_versoes(DemandaSocialMedia, Cliente, VERSAO_DERIVADOS, depende_do_tempo=True)
 def get_demanda_social(demanda_id):
-    demanda = DemandaSocialMedia.query.get_or_404(demanda_id)
-    result = demanda.to_dict()
-    result['cliente_nome'] = demanda.cliente.nome if demanda.cliente else None
-    return jsonify(result)
+    linha = _query_demandas().filter(DemandaSocialMedia.id == demanda_id).first_or_404()
+    return jsonify(_serializar_demanda(linha))
 
 @demanda_social_bp.route('/demandas-social/<int:demanda_id>', methods=['PUT'])
 @require_auth
@@ -134,9 +141,8 @@ def update_demanda_social(demanda_id):
     
     db.session.commit()
     
-    result = demanda.to_dict()
-    result['cliente_nome'] = demanda.cliente.nome if demanda.cliente else None
-    return jsonify(result)
+    linha = _query_demandas().filter(DemandaSocialMedia.id == demanda.id).one()
+    return jsonify(_serializar_demanda(linha))
 
 @demanda_social_bp.route('/demandas-social/<int:demanda_id>', methods=['DELETE'])
 @require_auth
@@ -146,8 +152,21 @@ def delete_demanda_social(demanda_id):
     db.session.commit()
     return '', 204
 
+@demanda_social_bp.route('/demandas-social/lote', methods=['PATCH'])
+@require_auth
+def update_demandas_social_lote():
+    """Altera status, prioridade e/ou aprovação de várias demandas (ids ou filtro)"""
+    try:
+        ids = atualizar_em_lote(DemandaSocialMedia, request.json or {}, CAMPOS_LOTE_DEMANDA, FILTROS_DEMANDAS)
+    except ErroValidacao as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'ids': ids, 'total': len(ids)})
+
 @demanda_social_bp.route('/demandas-social/stats', methods=['GET'])
 @require_auth
+@etag_versoes(DemandaSocialMedia)
+@cache_resposta(DemandaSocialMedia)
 def get_demandas_social_stats():
     """Retorna estatísticas das demandas de social media"""
     total_demandas = DemandaSocialMedia.query.count()
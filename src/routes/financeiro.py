@@ -1,22 +1,24 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, request
 from src.models.user import db
 from src.models.financeiro import TransacaoFinanceira
 from src.models.pedido import Pedido
+from src.services.colunar import obter_colunar
+from src.services.kpis import periodo_mes_atual
+from src.services.resumo_mensal import ultimos_meses, serie_financeira
+from src.services.validacao import ErroValidacao, valores_transacao
+from src.services.importacao import importar_transacoes
+from src.utils.paginacao import paginacao_solicitada, paginar
+from src.utils.streaming import resposta_json_stream
+from src.utils.cache import cache_resposta, etag_versoes
+from src.utils.planilhas import registros_da_requisicao
+from src.utils.auth import require_auth
 from datetime import datetime, timedelta
 
 financeiro_bp = Blueprint('financeiro', __name__)
 
-# Middleware para verificar autenticação
-def require_auth(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Acesso negado. Faça login primeiro.'}), 401
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
-
 @financeiro_bp.route('/financeiro', methods=['GET'])
 @require_auth
+@etag_versoes(TransacaoFinanceira)
 def get_transacoes():
     # Filtros opcionais
     tipo = request.args.get('tipo')
@@ -38,55 +40,47 @@ def get_transacoes():
     if data_fim:
         query = query.filter(TransacaoFinanceira.data <= datetime.fromisoformat(data_fim))
     
-    transacoes = query.order_by(TransacaoFinanceira.data.desc()).all()
-    return jsonify([transacao.to_dict() for transacao in transacoes])
+    if paginacao_solicitada():
+        return paginar(
+            query,
+            [(TransacaoFinanceira.data, True), (TransacaoFinanceira.id, True)],
+            TransacaoFinanceira.to_dict
+        )
+    
+    return resposta_json_stream(query.order_by(TransacaoFinanceira.data.desc()), TransacaoFinanceira.to_dict)
 
 @financeiro_bp.route('/financeiro', methods=['POST'])
 @require_auth
 def create_transacao():
     data = request.json
     
-    # Validações
-    if not data.get('descricao'):
-        return jsonify({'error': 'Descrição é obrigatória'}), 400
-    
-    if not data.get('tipo'):
-        return jsonify({'error': 'Tipo é obrigatório'}), 400
-    
-    if not data.get('categoria'):
-        return jsonify({'error': 'Categoria é obrigatória'}), 400
-    
-    if not data.get('valor'):
-        return jsonify({'error': 'Valor é obrigatório'}), 400
+    try:
+        valores = valores_transacao(data)
+    except ErroValidacao as e:
+        return jsonify({'error': str(e)}), 400
     
     # Verificar se pedido existe (opcional)
-    if data.get('pedido_id'):
-        pedido = Pedido.query.get(data['pedido_id'])
+    if valores['pedido_id']:
+        pedido = Pedido.query.get(valores['pedido_id'])
         if not pedido:
             return jsonify({'error': 'Pedido não encontrado'}), 404
     
-    transacao = TransacaoFinanceira(
-        descricao=data['descricao'],
-        tipo=data['tipo'],
-        categoria=data['categoria'],
-        valor=data['valor'],
-        status=data.get('status', 'Pendente'),
-        cliente_fornecedor=data.get('cliente_fornecedor'),
-        forma_pagamento=data.get('forma_pagamento'),
-        pedido_id=data.get('pedido_id'),
-        observacoes=data.get('observacoes'),
-        comprovante=data.get('comprovante')
-    )
-    
-    if data.get('data'):
-        transacao.data = datetime.fromisoformat(data['data'].replace('Z', '+00:00'))
+    transacao = TransacaoFinanceira(**valores)
     
     db.session.add(transacao)
     db.session.commit()
     return jsonify(transacao.to_dict()), 201
 
+@financeiro_bp.route('/financeiro/importar', methods=['POST'])
+@require_auth
+def importar_transacoes_lote():
+    """Importa transações financeiras em lote a partir de CSV ou array JSON (corpo ou arquivo)"""
+    relatorio = importar_transacoes(registros_da_requisicao())
+    return jsonify(relatorio), 400 if 'error' in relatorio else 200
+
 @financeiro_bp.route('/financeiro/<int:transacao_id>', methods=['GET'])
 @require_auth
+@etag_versoes(TransacaoFinanceira)
 def get_transacao(transacao_id):
     transacao = TransacaoFinanceira.query.get_or_404(transacao_id)
     return jsonify(transacao.to_dict())
@@ -129,96 +123,41 @@ def delete_transacao(transacao_id):
 
 @financeiro_bp.route('/financeiro/stats', methods=['GET'])
 @require_auth
+@etag_versoes(TransacaoFinanceira, depende_do_tempo=True)
+@cache_resposta(TransacaoFinanceira)
 def get_financeiro_stats():
     """Retorna estatísticas financeiras"""
-    # Período atual (mês atual)
-    inicio_mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    fim_mes = (inicio_mes + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-    
-    # Receitas do mês
-    receitas_mes = db.session.query(db.func.sum(TransacaoFinanceira.valor)).filter(
-        TransacaoFinanceira.tipo == 'Receita',
-        TransacaoFinanceira.data >= inicio_mes,
-        TransacaoFinanceira.data <= fim_mes
-    ).scalar() or 0
-    
-    # Despesas do mês
-    despesas_mes = db.session.query(db.func.sum(TransacaoFinanceira.valor)).filter(
-        TransacaoFinanceira.tipo == 'Despesa',
-        TransacaoFinanceira.data >= inicio_mes,
-        TransacaoFinanceira.data <= fim_mes
-    ).scalar() or 0
-    
-    # Saldo do mês
-    saldo_mes = receitas_mes - despesas_mes
-    
-    # Transações pendentes
-    pendentes = TransacaoFinanceira.query.filter_by(status='Pendente').count()
-    
-    # Receitas por categoria
-    receitas_categoria = db.session.query(
-        TransacaoFinanceira.categoria,
-        db.func.sum(TransacaoFinanceira.valor)
-    ).filter(
-        TransacaoFinanceira.tipo == 'Receita',
-        TransacaoFinanceira.data >= inicio_mes,
-        TransacaoFinanceira.data <= fim_mes
-    ).group_by(TransacaoFinanceira.categoria).all()
-    
-    # Despesas por categoria
-    despesas_categoria = db.session.query(
-        TransacaoFinanceira.categoria,
-        db.func.sum(TransacaoFinanceira.valor)
-    ).filter(
-        TransacaoFinanceira.tipo == 'Despesa',
-        TransacaoFinanceira.data >= inicio_mes,
-        TransacaoFinanceira.data <= fim_mes
-    ).group_by(TransacaoFinanceira.categoria).all()
+    # Período atual (mês atual), até o início do último dia como no dashboard
+    inicio_mes, fim_mes = periodo_mes_atual()
+    
+    # Calculadas sobre o retrato colunar, sem consultas por agregado
+    transacoes = obter_colunar(TransacaoFinanceira)
+    no_mes = transacoes.entre('data', inicio=inicio_mes, fim=fim_mes + timedelta(microseconds=1))
+    receitas = no_mes & transacoes.igual('tipo', 'Receita')
+    despesas = no_mes & transacoes.igual('tipo', 'Despesa')
+    
+    receitas_mes = transacoes.somar('valor', receitas)
+    despesas_mes = transacoes.somar('valor', despesas)
     
     return jsonify({
         'receitas_mes': receitas_mes,
         'despesas_mes': despesas_mes,
-        'saldo_mes': saldo_mes,
-        'pendentes': pendentes,
-        'receitas_categoria': {cat: valor for cat, valor in receitas_categoria},
-        'despesas_categoria': {cat: valor for cat, valor in despesas_categoria}
+        'saldo_mes': receitas_mes - despesas_mes,
+        'pendentes': transacoes.contar(transacoes.igual('status', 'Pendente')),
+        'receitas_categoria': transacoes.agrupar('categoria', 'valor', receitas),
+        'despesas_categoria': transacoes.agrupar('categoria', 'valor', despesas)
     })
 
 @financeiro_bp.route('/financeiro/fluxo-caixa', methods=['GET'])
 @require_auth
+@etag_versoes(TransacaoFinanceira, depende_do_tempo=True)
 def get_fluxo_caixa():
     """Retorna dados para o fluxo de caixa dos últimos 12 meses"""
-    meses = []
-    receitas = []
-    despesas = []
-    
-    for i in range(12):
-        # Calcular o mês
-        data_ref = datetime.now().replace(day=1) - timedelta(days=30 * i)
-        inicio_mes = data_ref.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        fim_mes = (inicio_mes + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        # Receitas do mês
-        receita_mes = db.session.query(db.func.sum(TransacaoFinanceira.valor)).filter(
-            TransacaoFinanceira.tipo == 'Receita',
-            TransacaoFinanceira.data >= inicio_mes,
-            TransacaoFinanceira.data <= fim_mes
-        ).scalar() or 0
-        
-        # Despesas do mês
-        despesa_mes = db.session.query(db.func.sum(TransacaoFinanceira.valor)).filter(
-            TransacaoFinanceira.tipo == 'Despesa',
-            TransacaoFinanceira.data >= inicio_mes,
-            TransacaoFinanceira.data <= fim_mes
-        ).scalar() or 0
-        
-        meses.insert(0, inicio_mes.strftime('%Y-%m'))
-        receitas.insert(0, receita_mes)
-        despesas.insert(0, despesa_mes)
+    meses = ultimos_meses(12)
+    serie = serie_financeira(meses)
     
     return jsonify({
         'meses': meses,
-        'receitas': receitas,
-        'despesas': despesas
+        'receitas': serie['Receita'],
+        'despesas': serie['Despesa']
     })
-
@@ -1,20 +1,16 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, request
 from src.models.user import db
 from src.models.fornecedor import Fornecedor
+from src.utils.paginacao import paginacao_solicitada, paginar
+from src.utils.streaming import resposta_json_stream
+from src.utils.cache import cache_resposta, etag_versoes
+from src.utils.auth import require_auth
 
 fornecedor_bp = Blueprint('fornecedor', __name__)
 
-# Middleware para verificar autenticação
-def require_auth(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Acesso negado. Faça login primeiro.'}), 401
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
-
 @fornecedor_bp.route('/fornecedores', methods=['GET'])
 @require_auth
+@etag_versoes(Fornecedor)
 def get_fornecedores():
     # Filtros opcionais
     tipo_servico = request.args.get('tipo_servico')
@@ -30,8 +26,10 @@ def get_fornecedores():
     if cidade:
         query = query.filter(Fornecedor.cidade.ilike(f'%{cidade}%'))
     
-    fornecedores = query.all()
-    return jsonify([fornecedor.to_dict() for fornecedor in fornecedores])
+    if paginacao_solicitada():
+        return paginar(query, [(Fornecedor.id, False)], Fornecedor.to_dict)
+    
+    return resposta_json_stream(query, Fornecedor.to_dict)
 
 @fornecedor_bp.route('/fornecedores', methods=['POST'])
 @require_auth
@@ -65,6 +63,7 @@ def create_fornecedor():
 
 @fornecedor_bp.route('/fornecedores/<int:fornecedor_id>', methods=['GET'])
 @require_auth
+@etag_versoes(Fornecedor)
 def get_fornecedor(fornecedor_id):
     fornecedor = Fornecedor.query.get_or_404(fornecedor_id)
     return jsonify(fornecedor.to_dict())
@@ -100,6 +99,8 @@ def delete_fornecedor(fornecedor_id):
 
 @fornecedor_bp.route('/fornecedores/stats', methods=['GET'])
 @require_auth
+@etag_versoes(Fornecedor)
+@cache_resposta(Fornecedor)
 def get_fornecedores_stats():
     """Retorna estatísticas dos fornecedores"""
     total_fornecedores = Fornecedor.query.count()
@@ -1,89 +1,72 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, request
 from src.models.user import db
 from src.models.pedido import Pedido
 from src.models.cliente import Cliente
+from src.services.colunar import obter_colunar
+from src.services.kpis import periodo_mes_atual
+from src.services.validacao import CAMPOS_LOTE_PEDIDO, ErroValidacao, valores_pedido
+from src.services.importacao import importar_pedidos
+from src.services.lote import atualizar_em_lote, filtros_para_condicoes
+from src.utils.paginacao import paginacao_solicitada, paginar
+from src.utils.streaming import resposta_json_stream
+from src.utils.cache import cache_resposta, etag_versoes
+from src.utils.planilhas import registros_da_requisicao
+from src.utils.auth import require_auth
 from datetime import datetime
-import uuid
 
 pedido_bp = Blueprint('pedido', __name__)
 
-# Middleware para verificar autenticação
-def require_auth(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Acesso negado. Faça login primeiro.'}), 401
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
+def _query_pedidos():
+    # O nome do cliente vem na mesma consulta (evita um SELECT por pedido)
+    return db.session.query(Pedido, Cliente.nome).outerjoin(Cliente, Pedido.cliente_id == Cliente.id)
+
+# Filtros aceitos pela listagem e pelas alterações em lote
+FILTROS_PEDIDOS = {
+    'status': Pedido.status,
+    'tipo_servico': Pedido.tipo_servico,
+    'responsavel': Pedido.responsavel,
+    'cliente_id': Pedido.cliente_id,
+    # Atrasado, Urgente ou No Prazo, calculado no banco
+    'status_prazo': Pedido.filtro_status_prazo
+}
+
+def _serializar_pedido(linha):
+    pedido, cliente_nome = linha
+    pedido_dict = pedido.to_dict()
+    pedido_dict['cliente_nome'] = cliente_nome
+    return pedido_dict
 
 @pedido_bp.route('/pedidos', methods=['GET'])
 @require_auth
+@etag_versoes(Pedido, Cliente, depende_do_tempo=True)
 def get_pedidos():
     # Filtros opcionais
-    status = request.args.get('status')
-    tipo_servico = request.args.get('tipo_servico')
-    responsavel = request.args.get('responsavel')
-    cliente_id = request.args.get('cliente_id')
-    
-    query = Pedido.query
-    
-    if status:
-        query = query.filter(Pedido.status == status)
-    if tipo_servico:
-        query = query.filter(Pedido.tipo_servico == tipo_servico)
-    if responsavel:
-        query = query.filter(Pedido.responsavel == responsavel)
-    if cliente_id:
-        query = query.filter(Pedido.cliente_id == cliente_id)
-    
-    pedidos = query.order_by(Pedido.data_pedido.desc()).all()
-    
-    # Incluir dados do cliente
-    result = []
-    for pedido in pedidos:
-        pedido_dict = pedido.to_dict()
-        pedido_dict['cliente_nome'] = pedido.cliente.nome if pedido.cliente else None
-        result.append(pedido_dict)
-    
-    return jsonify(result)
+    try:
+        query = _query_pedidos().filter(*filtros_para_condicoes(FILTROS_PEDIDOS, request.args))
+    except ErroValidacao as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if paginacao_solicitada():
+        return paginar(query, [(Pedido.data_pedido, True), (Pedido.id, True)], _serializar_pedido)
+    
+    return resposta_json_stream(query.order_by(Pedido.data_pedido.desc()), _serializar_pedido)
 
 @pedido_bp.route('/pedidos', methods=['POST'])
 @require_auth
 def create_pedido():
     data = request.json
     
-    # Validações
-    if not data.get('cliente_id'):
-        return jsonify({'error': 'Cliente é obrigatório'}), 400
-    
-    if not data.get('tipo_servico'):
-        return jsonify({'error': 'Tipo de serviço é obrigatório'}), 400
+    try:
+        valores = valores_pedido(data)
+    except ErroValidacao as e:
+        return jsonify({'error': str(e)}), 400
     
     # Verificar se cliente existe
-    cliente = Cliente.query.get(data['cliente_id'])
+    cliente = Cliente.query.get(valores['cliente_id'])
     if not cliente:
         return jsonify({'error': 'Cliente não encontrado'}), 404
     
-    # Gerar ID único do pedido
-    id_pedido = data.get('id_pedido') or f"PED-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
-    
-    pedido = Pedido(
-        id_pedido=id_pedido,
-        cliente_id=data['cliente_id'],
-        tipo_servico=data['tipo_servico'],
-        descricao=data.get('descricao'),
-        status=data.get('status', 'Orçamento'),
-        prioridade=data.get('prioridade', 'Normal'),
-        responsavel=data.get('responsavel'),
-        valor=data.get('valor', 0.0),
-        custo=data.get('custo', 0.0),
-        forma_pagamento=data.get('forma_pagamento'),
-        status_pagamento=data.get('status_pagamento', 'Pendente'),
-        observacoes=data.get('observacoes')
-    )
-    
-    if data.get('data_entrega'):
-        pedido.data_entrega = datetime.fromisoformat(data['data_entrega'].replace('Z', '+00:00'))
+    pedido = Pedido(**valores)
     
     db.session.add(pedido)
     db.session.commit()
@@ -92,13 +75,19 @@ def create_pedido():
     result['cliente_nome'] = cliente.nome
     return jsonify(result), 201
 
+@pedido_bp.route('/pedidos/importar', methods=['POST'])
+@require_auth
+def importar_pedidos_lote():
+    """Importa pedidos em lote a partir de CSV ou array JSON (corpo ou arquivo)"""
+    relatorio = importar_pedidos(registros_da_requisicao())
+    return jsonify(relatorio), 400 if 'error' in relatorio else 200
+
 @pedido_bp.route('/pedidos/<int:pedido_id>', methods=['GET'])
 @require_auth
+@etag_versoes(Pedido, Cliente, depende_do_tempo=True)
 def get_pedido(pedido_id):
-    pedido = Pedido.query.get_or_404(pedido_id)
-    result = pedido.to_dict()
-    result['cliente_nome'] = pedido.cliente.nome if pedido.cliente else None
-    return jsonify(result)
+    linha = _query_pedidos().filter(Pedido.id == pedido_id).first_or_404()
+    return jsonify(_serializar_pedido(linha))
 
 @pedido_bp.route('/pedidos/<int:pedido_id>', methods=['PUT'])
 @require_auth
@@ -128,9 +117,8 @@ def update_pedido(pedido_id):
     
     db.session.commit()
     
-    result = pedido.to_dict()
-    result['cliente_nome'] = pedido.cliente.nome if pedido.cliente else None
-    return jsonify(result)
+    linha = _query_pedidos().filter(Pedido.id == pedido.id).one()
+    return jsonify(_serializar_pedido(linha))
 
 @pedido_bp.route('/pedidos/<int:pedido_id>', methods=['DELETE'])
 @require_auth
@@ -140,38 +128,42 @@ def delete_pedido(pedido_id):
     db.session.commit()
     return '', 204
 
+@pedido_bp.route('/pedidos/lote', methods=['PATCH'])
+@require_auth
+def update_pedidos_lote():
+    """Altera status, prioridade e/ou responsável de vários pedidos (ids ou filtro)"""
+    try:
+        ids = atualizar_em_lote(Pedido, request.json or {}, CAMPOS_LOTE_PEDIDO, FILTROS_PEDIDOS)
+    except ErroValidacao as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'ids': ids, 'total': len(ids)})
+
 @pedido_bp.route('/pedidos/stats', methods=['GET'])
 @require_auth
+@etag_versoes(Pedido, depende_do_tempo=True)
+@cache_resposta(Pedido)
 def get_pedidos_stats():
     """Retorna estatísticas dos pedidos"""
-    total_pedidos = Pedido.query.count()
-    em_andamento = Pedido.query.filter(Pedido.status.in_(['Aprovado', 'Produção'])).count()
-    concluidos = Pedido.query.filter_by(status='Concluído').count()
-    atrasados = Pedido.query.filter(
-        Pedido.data_entrega < datetime.utcnow(),
-        Pedido.status != 'Concluído'
-    ).count()
-    
-    # Faturamento do mês atual
-    inicio_mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    faturamento_mes = db.session.query(db.func.sum(Pedido.valor)).filter(
-        Pedido.data_pedido >= inicio_mes,
-        Pedido.status == 'Concluído'
-    ).scalar() or 0
-    
-    # Margem média
-    pedidos_concluidos = Pedido.query.filter_by(status='Concluído').all()
-    margem_media = 0
-    if pedidos_concluidos:
-        margens = [p.margem for p in pedidos_concluidos if p.valor and p.valor > 0]
-        margem_media = sum(margens) / len(margens) if margens else 0
+    # Calculadas sobre o retrato colunar, sem carregar os pedidos no ORM
+    pedidos = obter_colunar(Pedido)
+    inicio_mes, _ = periodo_mes_atual()
+    
+    concluido = pedidos.igual('status', 'Concluído')
+    atrasado = pedidos.entre('data_entrega', fim=datetime.utcnow()) & ~concluido
+    
+    # Margem média dos concluídos com valor
+    com_valor = concluido & (pedidos.coluna('valor') > 0)
+    valores = pedidos.coluna('valor', com_valor)
+    custos = pedidos.coluna('custo', com_valor)
+    margem_media = float(((valores - custos) / valores * 100).mean()) if len(valores) else 0
     
     return jsonify({
-        'total_pedidos': total_pedidos,
-        'em_andamento': em_andamento,
-        'concluidos': concluidos,
-        'atrasados': atrasados,
-        'faturamento_mes': faturamento_mes,
+        'total_pedidos': pedidos.contar(),
+        'em_andamento': pedidos.contar(pedidos.em('status', ['Aprovado', 'Produção'])),
+        'concluidos': pedidos.contar(concluido),
+        'atrasados': pedidos.contar(atrasado),
+        'faturamento_mes': pedidos.somar('valor', concluido & pedidos.entre('data_pedido', inicio=inicio_mes)),
         'margem_media': margem_media
     })
 
@@ -1,29 +1,55 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, request
 from src.models.user import db
 from src.models.tabela_preco import TabelaPreco
 from src.models.fornecedor import Fornecedor
+from src.services.validacao import ErroValidacao, valores_tabela_preco
+from src.services.tabela_precos import importar_tabela_precos
+from src.utils.paginacao import paginacao_solicitada, paginar
+from src.utils.streaming import resposta_json_stream
+from src.utils.cache import cache_resposta, etag_versoes
+from src.utils.planilhas import FormatoInvalido, ler_planilha
+from src.utils.auth import require_auth
 from datetime import datetime
+import os
 
 tabela_preco_bp = Blueprint('tabela_preco', __name__)
 
-# Middleware para verificar autenticação
-def require_auth(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Acesso negado. Faça login primeiro.'}), 401
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
+def _query_precos():
+    # O nome do fornecedor vem na mesma consulta (evita um SELECT por item)
+    return db.session.query(TabelaPreco, Fornecedor.nome).outerjoin(
+        Fornecedor, TabelaPreco.fornecedor_id == Fornecedor.id
+    )
+
+def _arquivo_tabela_fornecedor(fornecedor):
+    # Fornecedor.tabela_precos guarda o caminho devolvido pelo upload
+    # (uploads/<categoria>/<arquivo>), relativo à pasta static
+    if not fornecedor.tabela_precos:
+        return None
+    static_dir = os.path.realpath(os.path.join(os.path.dirname(__file__), '..', 'static'))
+    relativo = fornecedor.tabela_precos.lstrip('/')
+    if relativo.startswith('static/'):
+        relativo = relativo[len('static/'):]
+    caminho = os.path.realpath(os.path.join(static_dir, relativo))
+    if not caminho.startswith(os.path.join(static_dir, 'uploads') + os.sep) or not os.path.isfile(caminho):
+        return None
+    return caminho
+
+def _serializar_preco(linha):
+    preco, fornecedor_nome = linha
+    preco_dict = preco.to_dict()
+    preco_dict['fornecedor_nome'] = fornecedor_nome
+    return preco_dict
 
 @tabela_preco_bp.route('/tabela-precos', methods=['GET'])
 @require_auth
+@etag_versoes(TabelaPreco, Fornecedor)
 def get_tabela_precos():
     # Filtros opcionais
     categoria = request.args.get('categoria')
     fornecedor_id = request.args.get('fornecedor_id')
     ativo = request.args.get('ativo')
     
-    query = TabelaPreco.query
+    query = _query_precos()
     
     if categoria:
         query = query.filter(TabelaPreco.categoria == categoria)
@@ -32,63 +58,41 @@ def get_tabela_precos():
     if ativo is not None:
         query = query.filter(TabelaPreco.ativo == (ativo.lower() == 'true'))
     
-    precos = query.all()
+    if paginacao_solicitada():
+        return paginar(query, [(TabelaPreco.id, False)], _serializar_preco)
     
-    # Incluir dados do fornecedor
-    result = []
-    for preco in precos:
-        preco_dict = preco.to_dict()
-        preco_dict['fornecedor_nome'] = preco.fornecedor.nome if preco.fornecedor else None
-        result.append(preco_dict)
-    
-    return jsonify(result)
+    return resposta_json_stream(query, _serializar_preco)
 
 @tabela_preco_bp.route('/tabela-precos', methods=['POST'])
 @require_auth
 def create_tabela_preco():
     data = request.json
     
-    # Validações
-    if not data.get('produto_servico'):
-        return jsonify({'error': 'Produto/Serviço é obrigatório'}), 400
-    
-    if not data.get('categoria'):
-        return jsonify({'error': 'Categoria é obrigatória'}), 400
-    
-    if not data.get('unidade'):
-        return jsonify({'error': 'Unidade é obrigatória'}), 400
+    try:
+        valores = valores_tabela_preco(data)
+    except ErroValidacao as e:
+        return jsonify({'error': str(e)}), 400
     
     # Verificar se fornecedor existe (opcional)
-    if data.get('fornecedor_id'):
-        fornecedor = Fornecedor.query.get(data['fornecedor_id'])
+    fornecedor = None
+    if valores['fornecedor_id']:
+        fornecedor = Fornecedor.query.get(valores['fornecedor_id'])
         if not fornecedor:
             return jsonify({'error': 'Fornecedor não encontrado'}), 404
     
-    preco = TabelaPreco(
-        produto_servico=data['produto_servico'],
-        categoria=data['categoria'],
-        descricao=data.get('descricao'),
-        preco_custo=data.get('preco_custo', 0.0),
-        markup=data.get('markup', 0.0),
-        unidade=data['unidade'],
-        fornecedor_id=data.get('fornecedor_id'),
-        ativo=data.get('ativo', True)
-    )
+    preco = TabelaPreco(**valores)
     
     db.session.add(preco)
     db.session.commit()
     
-    result = preco.to_dict()
-    result['fornecedor_nome'] = preco.fornecedor.nome if preco.fornecedor else None
-    return jsonify(result), 201
+    return jsonify(_serializar_preco((preco, fornecedor.nome if fornecedor else None))), 201
 
 @tabela_preco_bp.route('/tabela-precos/<int:preco_id>', methods=['GET'])
 @require_auth
+@etag_versoes(TabelaPreco, Fornecedor)
 def get_tabela_preco(preco_id):
-    preco = TabelaPreco.query.get_or_404(preco_id)
-    result = preco.to_dict()
-    result['fornecedor_nome'] = preco.fornecedor.nome if preco.fornecedor else None
-    return jsonify(result)
+    linha = _query_precos().filter(TabelaPreco.id == preco_id).first_or_404()
+    return jsonify(_serializar_preco(linha))
 
 @tabela_preco_bp.route('/tabela-precos/<int:preco_id>', methods=['PUT'])
 @require_auth
@@ -113,9 +117,8 @@ def update_tabela_preco(preco_id):
     
     db.session.commit()
     
-    result = preco.to_dict()
-    result['fornecedor_nome'] = preco.fornecedor.nome if preco.fornecedor else None
-    return jsonify(result)
+    linha = _query_precos().filter(TabelaPreco.id == preco.id).one()
+    return jsonify(_serializar_preco(linha))
 
 @tabela_preco_bp.route('/tabela-precos/<int:preco_id>', methods=['DELETE'])
 @require_auth
@@ -125,8 +128,41 @@ def delete_tabela_preco(preco_id):
     db.session.commit()
     return '', 204
 
+@tabela_preco_bp.route('/fornecedores/<int:fornecedor_id>/tabela-precos/importar', methods=['POST'])
+@require_auth
+def importar_tabela_precos_fornecedor(fornecedor_id):
+    """Importa a planilha de preços (CSV ou XLSX) de um fornecedor.
+    
+    Usa o arquivo enviado no campo `arquivo` ou, sem envio, o arquivo
+    registrado em Fornecedor.tabela_precos.
+    """
+    fornecedor = Fornecedor.query.get_or_404(fornecedor_id)
+    
+    # Valores para colunas ausentes ou células vazias
+    padroes = {
+        'categoria': request.args.get('categoria') or fornecedor.tipo_servico,
+        'unidade': request.args.get('unidade') or 'Unidade'
+    }
+    
+    try:
+        arquivo = request.files.get('arquivo')
+        if arquivo:
+            resumo = importar_tabela_precos(fornecedor.id, ler_planilha(arquivo.stream, arquivo.filename), padroes)
+        else:
+            caminho = _arquivo_tabela_fornecedor(fornecedor)
+            if not caminho:
+                return jsonify({'error': 'Fornecedor sem arquivo de tabela de preços'}), 404
+            with open(caminho, 'rb') as fluxo:
+                resumo = importar_tabela_precos(fornecedor.id, ler_planilha(fluxo, caminho), padroes)
+    except FormatoInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(resumo), 400 if 'error' in resumo else 200
+
 @tabela_preco_bp.route('/tabela-precos/stats', methods=['GET'])
 @require_auth
+@etag_versoes(TabelaPreco)
+@cache_resposta(TabelaPreco)
 def get_tabela_precos_stats():
     """Retorna estatísticas da tabela de preços"""
     total_produtos = TabelaPreco.query.count()
@@ -0,0 +1,92 @@
+from flask import Blueprint, jsonify, request, send_file, session, url_for
+from src.services.tarefas import (
+    STATUS_EM_ANDAMENTO, ErroTarefa, caminho_arquivo, enviar_tarefa, obter_tarefa, recursos_tarefa
+)
+from src.utils.auth import obter_principal, pode, require_auth, require_permissao
+import json
+import os
+
+# Registra o tipo de tarefa 'exportar'
+import src.services.exportacao  # noqa: F401
+
+tarefa_bp = Blueprint('tarefa', __name__)
+
+# Sugestão de intervalo (segundos) para o cliente consultar de novo
+INTERVALO_CONSULTA = 2
+
+def _pode_ler_dados(tipo, parametros):
+    """True se o usuário pode ler todos os recursos cujos dados a tarefa usa"""
+    principal = obter_principal()
+    return all(pode(principal, recurso, 'ler') for recurso in recursos_tarefa(tipo, parametros))
+
+def _obter_tarefa_permitida(tarefa_id):
+    """(tarefa, None) ou (None, resposta de erro) para a tarefa do id"""
+    tarefa = obter_tarefa(tarefa_id)
+    if tarefa is None:
+        return None, (jsonify({'error': 'Tarefa não encontrada ou expirada'}), 404)
+    if not _pode_ler_dados(tarefa.tipo, json.loads(tarefa.parametros or '{}')):
+        return None, (jsonify({'error': 'Acesso negado. Permissão insuficiente.'}), 403)
+    return tarefa, None
+
+def resposta_tarefa(tipo, parametros=None):
+    """Envia a tarefa e responde 202 com o id e a URL de consulta"""
+    if not _pode_ler_dados(tipo, parametros if isinstance(parametros, dict) else {}):
+        return jsonify({'error': 'Acesso negado. Permissão insuficiente.'}), 403
+    
+    try:
+        tarefa, criada = enviar_tarefa(tipo, parametros, session.get('user_id'))
+    except ErroTarefa as e:
+        return jsonify({'error': str(e)}), 400
+    
+    resultado = tarefa.to_dict(incluir_resultado=False)
+    resultado['reaproveitada'] = not criada
+    resultado['url'] = url_for('tarefa.get_tarefa', tarefa_id=tarefa.id)
+    resposta = jsonify(resultado)
+    resposta.status_code = 202
+    resposta.headers['Location'] = resultado['url']
+    resposta.headers['Retry-After'] = str(INTERVALO_CONSULTA)
+    return resposta
+
+@tarefa_bp.route('/tarefas', methods=['POST'])
+@require_permissao('ler')
+def create_tarefa():
+    """Envia uma tarefa para execução em segundo plano ({tipo, parametros})"""
+    data = request.json or {}
+    if not data.get('tipo'):
+        return jsonify({'error': 'Informe o tipo da tarefa'}), 400
+    
+    return resposta_tarefa(data['tipo'], data.get('parametros'))
+
+@tarefa_bp.route('/tarefas/<tarefa_id>', methods=['GET'])
+@require_auth
+def get_tarefa(tarefa_id):
+    """Situação da tarefa e, quando concluída, o resultado"""
+    tarefa, erro = _obter_tarefa_permitida(tarefa_id)
+    if erro:
+        return erro
+    
+    resposta = jsonify(tarefa.to_dict())
+    if tarefa.status in STATUS_EM_ANDAMENTO:
+        resposta.headers['Retry-After'] = str(INTERVALO_CONSULTA)
+    resposta.headers['Cache-Control'] = 'no-store'
+    return resposta
+
+@tarefa_bp.route('/tarefas/<tarefa_id>/arquivo', methods=['GET'])
+@require_auth
+def download_arquivo_tarefa(tarefa_id):
+    """Baixa o arquivo gerado por uma tarefa concluída (exportações)"""
+    tarefa, erro = _obter_tarefa_permitida(tarefa_id)
+    if erro:
+        return erro
+    if tarefa.status != 'Concluída':
+        return jsonify({'error': 'A tarefa ainda não foi concluída', 'status': tarefa.status}), 409
+    
+    resultado = tarefa.to_dict()['resultado'] or {}
+    if not isinstance(resultado, dict) or not resultado.get('arquivo'):
+        return jsonify({'error': 'A tarefa não gerou arquivo'}), 404
+    
+    caminho = caminho_arquivo(resultado['arquivo'])
+    if not os.path.exists(caminho):
+        return jsonify({'error': 'Arquivo não encontrado'}), 404
+    
+    return send_file(caminho, as_attachment=True, download_name=resultado.get('nome_download'))
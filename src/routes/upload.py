@@ -1,6 +1,12 @@
 from flask import Blueprint, jsonify, request, session
 from src.models.user import db
 from src.models.configuracao import ConfiguracaoEmpresa
+from src.services.imagens import agendar_derivados, remover_derivados, urls_imagem
+from src.services.envio_partes import (
+    ErroEnvio, iniciar_envio, situacao_envio, enviar_parte,
+    concluir_envio, cancelar_envio, armazenado_por_conteudo
+)
+from src.utils.auth import require_auth
 import os
 from werkzeug.utils import secure_filename
 import uuid
@@ -15,15 +21,6 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# Middleware para verificar autenticação
-def require_auth(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Acesso negado. Faça login primeiro.'}), 401
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
-
 @upload_bp.route('/upload/logo', methods=['POST'])
 @require_auth
 def upload_logo():
@@ -61,14 +58,19 @@ def upload_logo():
                 old_logo_path = os.path.join(os.path.dirname(__file__), '..', 'static', config.logo_path)
                 if os.path.exists(old_logo_path):
                     os.remove(old_logo_path)
+                remover_derivados(config.logo_path)
             
             config.logo_path = f"{UPLOAD_FOLDER}/{filename}"
             db.session.commit()
             
+            # Miniaturas e WebP são gerados em segundo plano
+            agendar_derivados(config.logo_path)
+            
             return jsonify({
                 'message': 'Logo enviado com sucesso',
                 'logo_path': config.logo_path,
-                'logo_url': f"/static/{config.logo_path}"
+                'logo_url': f"/static/{config.logo_path}",
+                'derivados': urls_imagem(config.logo_path)
             }), 200
         
         return jsonify({'error': 'Tipo de arquivo não permitido'}), 400
@@ -104,16 +106,38 @@ def upload_arquivo():
             # Salvar arquivo
             file.save(filepath)
             
+            caminho = f"{UPLOAD_FOLDER}/{categoria}/{filename}"
+            agendar_derivados(caminho)
+            
             return jsonify({
                 'message': 'Arquivo enviado com sucesso',
                 'filename': filename,
-                'filepath': f"{UPLOAD_FOLDER}/{categoria}/{filename}",
-                'url': f"/static/{UPLOAD_FOLDER}/{categoria}/{filename}"
+                'filepath': caminho,
+                'url': f"/static/{caminho}",
+                'derivados': urls_imagem(caminho)
             }), 200
     
     except Exception as e:
         return jsonify({'error': f'Erro no upload: {str(e)}'}), 500
 
+@upload_bp.route('/upload/derivados', methods=['GET'])
+@require_auth
+def get_derivados():
+    """URLs dos derivados de uma imagem enviada (o original enquanto não ficam prontos)"""
+    filepath = request.args.get('filepath')
+    
+    if not filepath:
+        return jsonify({'error': 'Caminho do arquivo é obrigatório'}), 400
+    
+    if not filepath.startswith(UPLOAD_FOLDER) or '..' in filepath.split('/'):
+        return jsonify({'error': 'Caminho de arquivo inválido'}), 400
+    
+    full_path = os.path.join(os.path.dirname(__file__), '..', 'static', filepath)
+    if not os.path.exists(full_path):
+        return jsonify({'error': 'Arquivo não encontrado'}), 404
+    
+    return jsonify(urls_imagem(filepath))
+
 @upload_bp.route('/upload/remover', methods=['DELETE'])
 @require_auth
 def remover_arquivo():
@@ -126,13 +150,18 @@ def remover_arquivo():
             return jsonify({'error': 'Caminho do arquivo é obrigatório'}), 400
         
         # Verificar se o arquivo está dentro do diretório permitido
-        if not filepath.startswith(UPLOAD_FOLDER):
+        if not filepath.startswith(UPLOAD_FOLDER) or '..' in filepath.split('/'):
             return jsonify({'error': 'Caminho de arquivo inválido'}), 400
         
+        # O mesmo conteúdo pode ter sido enviado por outros registros
+        if armazenado_por_conteudo(filepath):
+            return jsonify({'error': 'Arquivos deduplicados não podem ser removidos individualmente'}), 409
+        
         full_path = os.path.join(os.path.dirname(__file__), '..', 'static', filepath)
         
         if os.path.exists(full_path):
             os.remove(full_path)
+            remover_derivados(filepath)
             return jsonify({'message': 'Arquivo removido com sucesso'}), 200
         else:
             return jsonify({'error': 'Arquivo não encontrado'}), 404
@@ -140,3 +169,75 @@ def remover_arquivo():
     except Exception as e:
         return jsonify({'error': f'Erro ao remover arquivo: {str(e)}'}), 500
 
+def _erro_envio(e):
+    return jsonify({'error': str(e), **e.dados}), e.status
+
+@upload_bp.route('/upload/partes', methods=['POST'])
+@require_auth
+def iniciar_upload_partes():
+    """Inicia um envio em partes (arquivos grandes, com retomada)"""
+    data = request.json or {}
+    
+    try:
+        situacao = iniciar_envio(data.get('filename'), data.get('tamanho'), session['user_id'])
+    except ErroEnvio as e:
+        return _erro_envio(e)
+    
+    return jsonify(situacao), 201
+
+@upload_bp.route('/upload/partes/<sessao_id>', methods=['GET'])
+@require_auth
+def get_upload_partes(sessao_id):
+    """Situação de um envio em partes; `offset` indica de onde continuar"""
+    try:
+        return jsonify(situacao_envio(sessao_id, session['user_id']))
+    except ErroEnvio as e:
+        return _erro_envio(e)
+
+@upload_bp.route('/upload/partes/<sessao_id>', methods=['PUT'])
+@require_auth
+def enviar_upload_parte(sessao_id):
+    """Recebe uma parte no corpo da requisição, a partir de ?offset="""
+    try:
+        situacao = enviar_parte(
+            sessao_id,
+            session['user_id'],
+            request.args.get('offset', request.headers.get('Upload-Offset')),
+            request.stream,
+            request.content_length,
+            request.headers.get('X-Parte-SHA256')
+        )
+    except ErroEnvio as e:
+        return _erro_envio(e)
+    
+    return jsonify(situacao)
+
+@upload_bp.route('/upload/partes/<sessao_id>/concluir', methods=['POST'])
+@require_auth
+def concluir_upload_partes(sessao_id):
+    """Conclui um envio em partes e retorna o arquivo armazenado"""
+    try:
+        arquivo = concluir_envio(sessao_id, session['user_id'])
+    except ErroEnvio as e:
+        return _erro_envio(e)
+    
+    if not arquivo['deduplicado']:
+        agendar_derivados(arquivo['filepath'])
+    
+    return jsonify({
+        'message': 'Arquivo enviado com sucesso',
+        **arquivo,
+        'url': f"/static/{arquivo['filepath']}",
+        'derivados': urls_imagem(arquivo['filepath'])
+    }), 200
+
+@upload_bp.route('/upload/partes/<sessao_id>', methods=['DELETE'])
+@require_auth
+def cancelar_upload_partes(sessao_id):
+    """Cancela um envio em partes"""
+    try:
+        cancelar_envio(sessao_id, session['user_id'])
+    except ErroEnvio as e:
+        return _erro_envio(e)
+    
+    return jsonify({'message': 'Envio cancelado'}), 200
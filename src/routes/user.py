@@ -1,30 +1,22 @@
 from flask import Blueprint, jsonify, request, session
 from src.models.user import User, db
+from src.utils.cache import etag_versoes
+from src.utils.auth import PAPEIS, compilar_permissoes, obter_principal, require_admin, require_login
 from datetime import datetime
 import json
 
 user_bp = Blueprint('user', __name__)
 
-# Middleware para verificar autenticação
-def require_auth(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Acesso negado. Faça login primeiro.'}), 401
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
-
-def require_admin(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Acesso negado. Faça login primeiro.'}), 401
-        
-        user = User.query.get(session['user_id'])
-        if not user or user.role != 'admin':
-            return jsonify({'error': 'Acesso negado. Apenas administradores.'}), 403
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
+def _validar_papel_e_permissoes(data):
+    """Mensagem de erro para papel ou permissões inválidos (None se válidos)"""
+    if 'role' in data and data['role'] not in PAPEIS:
+        return f"Papel inválido. Use um destes: {', '.join(PAPEIS)}"
+    if data.get('permissions'):
+        try:
+            compilar_permissoes(data['permissions'])
+        except ValueError as e:
+            return str(e)
+    return None
 
 # Rotas de autenticação
 @user_bp.route('/login', methods=['POST'])
@@ -55,13 +47,14 @@ def login():
         return jsonify({'error': 'Credenciais inválidas ou usuário inativo'}), 401
 
 @user_bp.route('/logout', methods=['POST'])
-@require_auth
+@require_login
 def logout():
     session.clear()
     return jsonify({'message': 'Logout realizado com sucesso'}), 200
 
 @user_bp.route('/me', methods=['GET'])
-@require_auth
+@require_login
+@etag_versoes(User)
 def get_current_user():
     user = User.query.get(session['user_id'])
     return jsonify(user.to_dict())
@@ -69,6 +62,7 @@ def get_current_user():
 # Rotas de gerenciamento de usuários
 @user_bp.route('/users', methods=['GET'])
 @require_admin
+@etag_versoes(User)
 def get_users():
     users = User.query.all()
     return jsonify([user.to_dict() for user in users])
@@ -82,6 +76,10 @@ def create_user():
     if not data.get('username') or not data.get('email') or not data.get('password'):
         return jsonify({'error': 'Username, email e password são obrigatórios'}), 400
     
+    erro = _validar_papel_e_permissoes(data)
+    if erro:
+        return jsonify({'error': erro}), 400
+    
     # Verificar se username já existe
     if User.query.filter_by(username=data['username']).first():
         return jsonify({'error': 'Username já existe'}), 400
@@ -103,11 +101,12 @@ def create_user():
     return jsonify(user.to_dict()), 201
 
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
-@require_auth
+@require_login
+@etag_versoes(User)
 def get_user(user_id):
     # Usuários podem ver apenas seus próprios dados, admins podem ver todos
-    current_user = User.query.get(session['user_id'])
-    if current_user.role != 'admin' and current_user.id != user_id:
+    principal = obter_principal()
+    if principal.role != 'admin' and principal.id != user_id:
         return jsonify({'error': 'Acesso negado'}), 403
     
     user = User.query.get_or_404(user_id)
@@ -119,6 +118,10 @@ def update_user(user_id):
     user = User.query.get_or_404(user_id)
     data = request.json
     
+    erro = _validar_papel_e_permissoes(data)
+    if erro:
+        return jsonify({'error': erro}), 400
+    
     # Verificar se username já existe (exceto para o próprio usuário)
     if data.get('username') and data['username'] != user.username:
         if User.query.filter_by(username=data['username']).first():
@@ -157,7 +160,7 @@ def delete_user(user_id):
     return '', 204
 
 @user_bp.route('/change-password', methods=['POST'])
-@require_auth
+@require_login
 def change_password():
     data = request.json
     current_password = data.get('current_password')
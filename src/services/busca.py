@@ -0,0 +1,290 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.cliente import Cliente
+from src.models.pedido import Pedido
+from src.models.fornecedor import Fornecedor
+from src.models.demanda_social import DemandaSocialMedia
+from src.models.tabela_preco import TabelaPreco
+from src.services.perguntas import palavras
+from collections import namedtuple
+
+# Busca textual em clientes, pedidos, fornecedores, demandas e produtos das
+# tabelas de preço, com resultados ordenados por relevância e busca por
+# prefixo (cada palavra digitada casa com o início de uma palavra indexada).
+#
+# Os textos de cada registro ficam em uma única tabela `busca`: no SQLite uma
+# tabela virtual FTS5 (com índices de prefixo de 2 e 3 letras) e no
+# PostgreSQL uma tabela comum com uma coluna tsvector e índice GIN. Os textos
+# são indexados sem acentos e em minúsculas, e a chave de cada documento
+# combina o tipo e o id do registro, então atualizar ou remover um documento
+# é uma operação pela chave primária.
+#
+# O índice acompanha as gravações na mesma transação: a sessão reindexa os
+# objetos inseridos, alterados e removidos no flush, e as gravações em lote
+# (importações, alterações em lote) chamam indexar_busca para as linhas que
+# escreveram. criar_indice_busca() cria e preenche a tabela em bancos que
+# ainda não a têm.
+
+TAMANHO_LOTE = 1000
+TAMANHO_IN = 500
+
+LIMITE_PALAVRAS = 8
+MINIMO_LETRAS = 2
+
+# Peso do título em relação ao restante do texto na relevância
+PESO_TITULO = 10.0
+
+# Ordem dos resultados: primeiro os documentos que têm as palavras digitadas
+# inteiras, depois os que só as têm como início de palavra; em cada grupo, pela
+# relevância (bm25 no SQLite, ts_rank no PostgreSQL) calculada sobre todos os
+# documentos encontrados.
+#
+# A exceção são as consultas só com palavras de até PREFIXO_CURTO letras (o
+# tamanho dos índices de prefixo): um prefixo curto e comum ("ma") casa com boa
+# parte da base, e calcular a relevância de todos custaria mais que a busca
+# inteira. Nelas entram todos os documentos com as palavras inteiras e só os
+# primeiros CANDIDATOS dos demais.
+PREFIXO_CURTO = 3
+CANDIDATOS = 1000
+
+DIALETOS = ('sqlite', 'postgresql')
+
+# nome: tipo do resultado; codigo: compõe a chave (id * 8 + codigo); recurso:
+# blueprint que dá permissão de leitura; titulo/texto: colunas indexadas;
+# detalhe: coluna exibida abaixo do título
+Fonte = namedtuple('Fonte', 'nome codigo modelo recurso titulo texto detalhe')
+
+FONTES = (
+    Fonte('cliente', 1, Cliente, 'cliente', ('nome',), ('cidade', 'contato_principal', 'observacoes'), 'cidade'),
+    Fonte('pedido', 2, Pedido, 'pedido', ('id_pedido', 'tipo_servico'), ('descricao', 'observacoes'), 'status'),
+    Fonte('fornecedor', 3, Fornecedor, 'fornecedor', ('nome',), ('tipo_servico', 'cidade', 'observacoes'), 'tipo_servico'),
+    Fonte('demanda', 4, DemandaSocialMedia, 'demanda_social', ('demanda',), ('tema_conteudo', 'observacoes'), 'tipo_arte'),
+    Fonte('produto', 5, TabelaPreco, 'tabela_preco', ('produto_servico',), ('categoria', 'descricao'), 'categoria')
+)
+
+FONTES_POR_MODELO = {fonte.modelo: fonte for fonte in FONTES}
+FONTES_POR_NOME = {fonte.nome: fonte for fonte in FONTES}
+
+TIPOS = tuple(FONTES_POR_NOME)
+
+_DDL = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE busca USING fts5("
+        "tipo, titulo UNINDEXED, detalhe UNINDEXED, chave, texto, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ],
+    'postgresql': [
+        "CREATE TABLE busca ("
+        "id BIGINT PRIMARY KEY, tipo VARCHAR(20) NOT NULL, titulo TEXT, detalhe TEXT, chave TEXT, texto TEXT, "
+        "documento TSVECTOR GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(chave, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(texto, '')), 'B')) STORED)",
+        "CREATE INDEX ix_busca_documento ON busca USING GIN (documento)"
+    ]
+}
+
+_COLUNA_CHAVE = {'sqlite': 'rowid', 'postgresql': 'id'}
+
+
+class ConsultaInvalida(ValueError):
+    pass
+
+
+def colunas_indexadas(modelo):
+    """Colunas de `modelo` gravadas no índice de busca (vazio se não é indexado)"""
+    fonte = FONTES_POR_MODELO.get(modelo)
+    return _colunas(fonte) if fonte else set()
+
+
+def _chave(fonte, registro_id):
+    return registro_id * 8 + fonte.codigo
+
+
+def _juntar(registro, colunas, separador=' '):
+    return separador.join(str(valor) for valor in (getattr(registro, coluna) for coluna in colunas) if valor)
+
+
+def _documento(fonte, registro):
+    titulo = _juntar(registro, fonte.titulo, ' - ')
+    return {
+        'chave_documento': _chave(fonte, registro.id),
+        'tipo': fonte.nome,
+        'titulo': titulo,
+        'detalhe': getattr(registro, fonte.detalhe),
+        'chave': ' '.join(palavras(titulo)),
+        'texto': ' '.join(palavras(_juntar(registro, fonte.texto)))
+    }
+
+
+def _colunas(fonte):
+    return {'id', *fonte.titulo, *fonte.texto, fonte.detalhe}
+
+
+def _remover(conexao, chaves):
+    coluna = _COLUNA_CHAVE[conexao.dialect.name]
+    chaves = list(chaves)
+    for inicio in range(0, len(chaves), TAMANHO_IN):
+        parte = chaves[inicio:inicio + TAMANHO_IN]
+        conexao.execute(
+            db.text(f'DELETE FROM busca WHERE {coluna} IN ({", ".join(str(chave) for chave in parte)})')
+        )
+
+
+def _gravar(conexao, documentos):
+    if not documentos:
+        return
+    _remover(conexao, [documento['chave_documento'] for documento in documentos])
+    coluna = _COLUNA_CHAVE[conexao.dialect.name]
+    conexao.execute(
+        db.text(
+            f'INSERT INTO busca ({coluna}, tipo, titulo, detalhe, chave, texto) '
+            'VALUES (:chave_documento, :tipo, :titulo, :detalhe, :chave, :texto)'
+        ),
+        documentos
+    )
+
+
+def indexar_busca(conexao, modelo, condicao):
+    """Reindexa as linhas de `modelo` que atendem à condição (gravações em lote)"""
+    fonte = FONTES_POR_MODELO.get(modelo)
+    if fonte is None or conexao.dialect.name not in DIALETOS:
+        return
+    tabela = modelo.__table__
+    resultado = conexao.execution_options(yield_per=TAMANHO_LOTE).execute(
+        db.select(*[tabela.c[coluna] for coluna in _colunas(fonte)]).where(condicao)
+    )
+    for linhas in resultado.partitions():
+        _gravar(conexao, [_documento(fonte, linha) for linha in linhas])
+
+
+def reconstruir_indice_busca(conexao):
+    """Apaga e preenche de novo todo o índice de busca"""
+    conexao.execute(db.text('DELETE FROM busca'))
+    for fonte in FONTES:
+        indexar_busca(conexao, fonte.modelo, db.true())
+
+
+def criar_indice_busca():
+    """Cria e preenche a tabela de busca se ela ainda não existe; retorna True se criou"""
+    dialeto = db.engine.dialect.name
+    if dialeto not in DIALETOS or db.inspect(db.engine).has_table('busca'):
+        return False
+    with db.engine.begin() as conexao:
+        for comando in _DDL[dialeto]:
+            conexao.execute(db.text(comando))
+        reconstruir_indice_busca(conexao)
+    return True
+
+
+# Sincronização com a sessão
+
+@event.listens_for(Session, 'after_flush')
+def _indexar_alteracoes_sessao(session, flush_context):
+    gravar, remover = [], []
+    for obj in list(session.new) + list(session.dirty):
+        fonte = FONTES_POR_MODELO.get(type(obj))
+        if fonte is None:
+            continue
+        if obj in session.dirty:
+            estado = db.inspect(obj)
+            if not any(estado.attrs[coluna].history.has_changes() for coluna in _colunas(fonte)):
+                continue
+        gravar.append(_documento(fonte, obj))
+    for obj in session.deleted:
+        fonte = FONTES_POR_MODELO.get(type(obj))
+        if fonte is not None:
+            remover.append(_chave(fonte, obj.id))
+
+    if not gravar and not remover:
+        return
+    conexao = session.connection()
+    if conexao.dialect.name not in DIALETOS:
+        return
+    _remover(conexao, remover)
+    _gravar(conexao, gravar)
+
+
+# Consulta
+
+def termos_da_consulta(texto):
+    """Palavras da consulta (sem acentos, minúsculas) com ao menos MINIMO_LETRAS letras"""
+    termos = [termo for termo in palavras(texto or '') if len(termo) >= MINIMO_LETRAS]
+    if not termos:
+        raise ConsultaInvalida(f'Informe ao menos {MINIMO_LETRAS} letras para buscar')
+    return termos[:LIMITE_PALAVRAS]
+
+
+def _so_prefixos_curtos(termos):
+    return all(len(termo) <= PREFIXO_CURTO for termo in termos)
+
+
+def _consulta_sqlite(termos, tipos, limite):
+    # Todas as palavras, cada uma como prefixo (expressao) ou inteira (exata);
+    # o filtro de tipo também vai no MATCH (coluna tipo), para não descartar
+    # documentos depois de lê-los
+    expressao = ' AND '.join(f'"{termo}"*' for termo in termos)
+    exata = ' AND '.join(f'"{termo}"' for termo in termos)
+    if set(tipos) != set(TIPOS):
+        filtro_tipo = f"tipo : ({' OR '.join(tipos)})"
+        expressao, exata = f'{filtro_tipo} AND {expressao}', f'{filtro_tipo} AND {exata}'
+
+    exatas = 'rowid IN (SELECT rowid FROM busca WHERE busca MATCH :exata)'
+    candidatos = ''
+    if _so_prefixos_curtos(termos):
+        candidatos = (
+            f' AND ({exatas} OR rowid IN (SELECT rowid FROM busca WHERE busca MATCH :expressao LIMIT :candidatos))'
+        )
+    sql = (
+        'SELECT tipo, rowid AS chave_documento, titulo, detalhe, '
+        f'-bm25(busca, 0, 0, 0, {PESO_TITULO}, 1.0) AS relevancia, {exatas} AS exata '
+        f'FROM busca WHERE busca MATCH :expressao{candidatos} '
+        'ORDER BY exata DESC, relevancia DESC LIMIT :limite'
+    )
+    return sql, {'expressao': expressao, 'exata': exata, 'candidatos': CANDIDATOS, 'limite': limite}
+
+
+def _consulta_postgresql(termos, tipos, limite):
+    expressao = ' & '.join(f'{termo}:*' for termo in termos)
+    exata = ' & '.join(termos)
+    candidatos = ''
+    if _so_prefixos_curtos(termos):
+        candidatos = (
+            " AND (documento @@ to_tsquery('simple', :exata) OR id IN ("
+            "SELECT id FROM busca WHERE documento @@ to_tsquery('simple', :expressao) AND tipo = ANY(:tipos) "
+            'LIMIT :candidatos))'
+        )
+    sql = (
+        'SELECT tipo, id AS chave_documento, titulo, detalhe, '
+        "ts_rank(documento, to_tsquery('simple', :expressao)) AS relevancia, "
+        "documento @@ to_tsquery('simple', :exata) AS exata FROM busca "
+        f"WHERE documento @@ to_tsquery('simple', :expressao) AND tipo = ANY(:tipos){candidatos} "
+        'ORDER BY exata DESC, relevancia DESC LIMIT :limite'
+    )
+    return sql, {
+        'expressao': expressao, 'exata': exata, 'tipos': list(tipos), 'candidatos': CANDIDATOS, 'limite': limite
+    }
+
+
+def buscar(texto, tipos=TIPOS, limite=20):
+    """Registros que contêm todas as palavras de `texto` (por prefixo); primeiro os
+    que as contêm inteiras, depois por relevância"""
+    termos = termos_da_consulta(texto)
+    dialeto = db.engine.dialect.name
+    if dialeto not in DIALETOS:
+        raise ConsultaInvalida(f'Busca indisponível no banco {dialeto}')
+    if not tipos:
+        return []
+
+    montar = _consulta_sqlite if dialeto == 'sqlite' else _consulta_postgresql
+    sql, parametros = montar(termos, tipos, limite)
+    return [
+        {
+            'tipo': linha.tipo,
+            'id': linha.chave_documento // 8,
+            'titulo': linha.titulo,
+            'detalhe': linha.detalhe,
+            'relevancia': round(linha.relevancia, 4)
+        }
+        for linha in db.session.execute(db.text(sql), parametros)
+    ]
@@ -0,0 +1,304 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.pedido import Pedido
+from src.models.financeiro import TransacaoFinanceira
+from src.models.registro_alteracao import RegistroAlteracao
+from src.utils.cache import obter_backend
+import numpy as np
+import threading
+
+# Retrato colunar (arrays NumPy) dos fatos de pedidos e transações para as
+# análises ad hoc: filtros, somas, médias e agrupamentos vetorizados, sem
+# montar um objeto do ORM por linha. Cada linha ocupa algumas dezenas de bytes
+# (ver bytes_por_linha) e textos repetidos (status, categoria...) viram
+# códigos de um dicionário por coluna.
+#
+# O retrato é carregado uma vez por processo e atualizado de forma
+# incremental: toda alteração feita pela sessão (e pelas gravações em lote)
+# grava o id do registro em registro_alteracao, e a atualização relê só os
+# registros com seq acima da marca d'água do retrato. Importações em lote
+# registram a tabela inteira (registro_id nulo), que é recarregada. Antes de
+# consultar o registro, a versão da tabela no cache (src/utils/cache.py)
+# indica se houve alguma alteração desde a última atualização.
+
+TAMANHO_LOTE = 10000
+TAMANHO_IN = 500
+
+# Relê as últimas seqs já vistas: no PostgreSQL uma transação pode confirmar
+# uma seq menor depois de outra maior (reprocessar um id é inofensivo)
+JANELA_RELEITURA = 1000
+
+# O registro guarda no máximo esta quantidade de alterações
+LIMITE_REGISTRO = 100000
+
+_CATEGORICA, _NUMERO, _INTEIRO, _DATA = 'categorica', 'numero', 'inteiro', 'data'
+
+_TIPOS_NUMPY = {_CATEGORICA: np.int16, _NUMERO: np.float64, _INTEIRO: np.int32, _DATA: 'datetime64[us]'}
+
+_COLUNAS = {
+    Pedido: {
+        'cliente_id': _INTEIRO,
+        'status': _CATEGORICA,
+        'tipo_servico': _CATEGORICA,
+        'responsavel': _CATEGORICA,
+        'valor': _NUMERO,
+        'custo': _NUMERO,
+        'data_pedido': _DATA,
+        'data_entrega': _DATA
+    },
+    TransacaoFinanceira: {
+        'tipo': _CATEGORICA,
+        'categoria': _CATEGORICA,
+        'status': _CATEGORICA,
+        'valor': _NUMERO,
+        'data': _DATA,
+        'pedido_id': _INTEIRO
+    }
+}
+
+_tabelas = {}
+_lock = threading.Lock()
+
+
+class TabelaColunar:
+    """Colunas de um modelo em arrays NumPy, alinhadas pelo array de ids.
+
+    Valores nulos: 0.0 em números, -1 em inteiros, NaT em datas e o código 0
+    (rótulo None) em colunas categóricas.
+    """
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.tipos = _COLUNAS[modelo]
+        self.rotulos = {nome: [None] for nome, tipo in self.tipos.items() if tipo == _CATEGORICA}
+        self._codigos = {nome: {None: 0} for nome in self.rotulos}
+        self.ids = np.empty(0, dtype=np.int64)
+        self.colunas = {nome: np.empty(0, dtype=_TIPOS_NUMPY[tipo]) for nome, tipo in self.tipos.items()}
+        self.marca = 0
+        self.versao = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _codificar(self, nome, valores):
+        codigos = self._codigos[nome]
+        rotulos = self.rotulos[nome]
+        resultado = np.empty(len(valores), dtype=np.int16)
+        for i, valor in enumerate(valores):
+            codigo = codigos.get(valor)
+            if codigo is None:
+                codigo = codigos[valor] = len(rotulos)
+                rotulos.append(valor)
+            resultado[i] = codigo
+        return resultado
+
+    def _converter(self, linhas):
+        ids = np.fromiter((linha[0] for linha in linhas), dtype=np.int64, count=len(linhas))
+        colunas = {}
+        for posicao, (nome, tipo) in enumerate(self.tipos.items(), start=1):
+            valores = [linha[posicao] for linha in linhas]
+            if tipo == _CATEGORICA:
+                colunas[nome] = self._codificar(nome, valores)
+            elif tipo == _NUMERO:
+                colunas[nome] = np.array([v or 0.0 for v in valores], dtype=np.float64)
+            elif tipo == _INTEIRO:
+                colunas[nome] = np.array([-1 if v is None else v for v in valores], dtype=np.int32)
+            else:
+                colunas[nome] = np.array(valores, dtype='datetime64[us]')
+        return ids, colunas
+
+    def _consulta(self):
+        tabela = self.modelo.__table__
+        return db.select(tabela.c.id, *[tabela.c[nome] for nome in self.tipos])
+
+    def _anexar(self, partes):
+        if not partes:
+            return
+        self.ids = np.concatenate([self.ids] + [ids for ids, _ in partes])
+        for nome in self.tipos:
+            self.colunas[nome] = np.concatenate([self.colunas[nome]] + [colunas[nome] for _, colunas in partes])
+
+    def carregar(self, conexao):
+        """Lê a tabela inteira, em lotes"""
+        self.ids = np.empty(0, dtype=np.int64)
+        self.colunas = {nome: np.empty(0, dtype=_TIPOS_NUMPY[tipo]) for nome, tipo in self.tipos.items()}
+
+        resultado = conexao.execution_options(yield_per=TAMANHO_LOTE).execute(self._consulta())
+        self._anexar([self._converter(linhas) for linhas in resultado.partitions()])
+
+    def atualizar_registros(self, conexao, ids):
+        """Relê os registros informados (removidos somem do retrato)"""
+        ids = sorted(ids)
+        manter = ~np.isin(self.ids, np.array(ids, dtype=np.int64))
+        self.ids = self.ids[manter]
+        for nome in self.tipos:
+            self.colunas[nome] = self.colunas[nome][manter]
+
+        partes = []
+        for inicio in range(0, len(ids), TAMANHO_IN):
+            linhas = conexao.execute(
+                self._consulta().where(self.modelo.__table__.c.id.in_(ids[inicio:inicio + TAMANHO_IN]))
+            ).all()
+            if linhas:
+                partes.append(self._converter(linhas))
+        self._anexar(partes)
+
+    # Filtros: retornam máscaras booleanas, combináveis com & | ~
+
+    def igual(self, nome, valor):
+        if nome in self.rotulos:
+            codigo = self._codigos[nome].get(valor)
+            if codigo is None:
+                return np.zeros(len(self), dtype=bool)
+            return self.colunas[nome] == codigo
+        return self.colunas[nome] == valor
+
+    def em(self, nome, valores):
+        if nome in self.rotulos:
+            valores = [self._codigos[nome][v] for v in valores if v in self._codigos[nome]]
+        return np.isin(self.colunas[nome], valores)
+
+    def entre(self, nome, inicio=None, fim=None):
+        """inicio <= coluna < fim (datas nulas nunca entram)"""
+        coluna = self.colunas[nome]
+        mascara = np.ones(len(self), dtype=bool)
+        if inicio is not None:
+            mascara &= coluna >= np.datetime64(inicio, 'us')
+        if fim is not None:
+            mascara &= coluna < np.datetime64(fim, 'us')
+        return mascara
+
+    # Agregações: retornam tipos do Python (serializáveis pelo jsonify)
+
+    def coluna(self, nome, mascara=None):
+        coluna = self.colunas[nome]
+        return coluna if mascara is None else coluna[mascara]
+
+    def contar(self, mascara=None):
+        return len(self) if mascara is None else int(np.count_nonzero(mascara))
+
+    def somar(self, nome, mascara=None):
+        return float(self.coluna(nome, mascara).sum())
+
+    def agrupar(self, chave, valores=None, mascara=None, agregacao='soma'):
+        """{valor da chave: agregado} por bincount; `valores` é um nome de coluna ou um array
+
+        agregacao: 'soma', 'contagem' ou 'media'. Grupos sem linhas não aparecem.
+        """
+        codigos = self.coluna(chave, mascara)
+        if chave in self.rotulos:
+            rotulos = self.rotulos[chave]
+        else:
+            rotulos, codigos = np.unique(codigos, return_inverse=True)
+            rotulos = rotulos.tolist()
+
+        contagem = np.bincount(codigos, minlength=len(rotulos))
+        if agregacao == 'contagem':
+            resultado = contagem
+        else:
+            if isinstance(valores, str):
+                valores = self.coluna(valores, mascara)
+            elif mascara is not None:
+                valores = valores[mascara]
+            resultado = np.bincount(codigos, weights=valores, minlength=len(rotulos))
+            if agregacao == 'media':
+                resultado = resultado / np.maximum(contagem, 1)
+
+        return {
+            rotulos[i]: resultado[i].item()
+            for i in np.flatnonzero(contagem)
+        }
+
+    def bytes_por_linha(self):
+        if not len(self):
+            return 0
+        total = self.ids.nbytes + sum(coluna.nbytes for coluna in self.colunas.values())
+        return total / len(self)
+
+
+def _atualizar(tabela, conexao):
+    """Aplica as alterações registradas após a marca; retorna até que seq o registro pode ser podado"""
+    nome = tabela.modelo.__table__.name
+    registro = RegistroAlteracao.__table__
+
+    primeira_seq = conexao.execute(db.select(db.func.min(registro.c.seq))).scalar()
+    alteracoes = conexao.execute(
+        db.select(registro.c.seq, registro.c.registro_id).where(
+            registro.c.tabela == nome,
+            registro.c.seq > tabela.marca - JANELA_RELEITURA
+        ).order_by(registro.c.seq)
+    ).all()
+
+    if not alteracoes:
+        return None
+
+    ultima_seq = alteracoes[-1].seq
+    # Registros anteriores à marca já foram apagados: não dá para saber o que mudou
+    registro_podado = primeira_seq is not None and primeira_seq > tabela.marca + 1
+    if registro_podado or any(alteracao.registro_id is None for alteracao in alteracoes):
+        tabela.carregar(conexao)
+    else:
+        tabela.atualizar_registros(conexao, {alteracao.registro_id for alteracao in alteracoes})
+    tabela.marca = max(tabela.marca, ultima_seq)
+
+    if primeira_seq is not None and ultima_seq - primeira_seq > LIMITE_REGISTRO:
+        return ultima_seq - LIMITE_REGISTRO
+    return None
+
+
+def obter_colunar(modelo):
+    """Retrato colunar atualizado de Pedido ou TransacaoFinanceira"""
+    backend = obter_backend()
+    versao = backend.versoes([modelo.__table__.name]) if backend is not None else None
+
+    with _lock:
+        tabela = _tabelas.get(modelo)
+        if tabela is not None and versao is not None and tabela.versao == versao:
+            return tabela
+
+        podar_ate = None
+        # Conexão própria: o retrato só vê dados confirmados
+        with db.engine.connect() as conexao:
+            if tabela is None:
+                tabela = TabelaColunar(modelo)
+                tabela.marca = conexao.execute(
+                    db.select(db.func.max(RegistroAlteracao.seq))
+                ).scalar() or 0
+                tabela.carregar(conexao)
+                _tabelas[modelo] = tabela
+            else:
+                podar_ate = _atualizar(tabela, conexao)
+        tabela.versao = versao
+
+    if podar_ate is not None:
+        with db.engine.begin() as conexao:
+            conexao.execute(RegistroAlteracao.__table__.delete().where(RegistroAlteracao.seq <= podar_ate))
+    return tabela
+
+
+def registrar_alterados(conexao, modelo, ids=None):
+    """Registra registros alterados fora da sessão (`ids` None: a tabela inteira)"""
+    if modelo not in _COLUNAS:
+        return
+    nome = modelo.__table__.name
+    linhas = [{'tabela': nome, 'registro_id': None}] if ids is None else [
+        {'tabela': nome, 'registro_id': registro_id} for registro_id in ids
+    ]
+    if linhas:
+        conexao.execute(RegistroAlteracao.__table__.insert(), linhas)
+
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_alteracoes_sessao(session, flush_context):
+    linhas = []
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        modelo = type(obj)
+        if modelo not in _COLUNAS:
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        linhas.append({'tabela': modelo.__table__.name, 'registro_id': obj.id})
+
+    if linhas:
+        session.connection().execute(RegistroAlteracao.__table__.insert(), linhas)
@@ -0,0 +1,297 @@
+from datetime import datetime, timedelta
+from werkzeug.utils import secure_filename
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+
+# Envio de arquivos grandes em partes, com retomada.
+#
+# 1. iniciar_envio cria uma sessão em UPLOAD_PARCIAIS_DIR/<id>/ com o arquivo
+#    parcial (dados) e os metadados (sessao.json). A pasta fica fora de
+#    static/: um arquivo parcial não pode ser baixado antes de concluído.
+#    Só o usuário que iniciou a sessão pode consultá-la, enviar partes,
+#    concluir ou cancelar; para os demais ela não existe (404).
+# 2. Cada parte é enviada com o offset em que começa; ela é gravada direto do
+#    fluxo da requisição no fim do arquivo parcial, em blocos, e o SHA-256 da
+#    parte é registrado (e conferido, se o cliente informar). Uma parte com
+#    offset diferente do tamanho atual é recusada com o offset esperado, e é
+#    a partir dele que o cliente retoma depois de uma queda de conexão.
+# 3. concluir_envio confere o tamanho, calcula o SHA-256 do arquivo e o move
+#    para uploads/cas/<2 primeiros dígitos>/<sha256><extensão>. Se o conteúdo
+#    já existe lá, o parcial é descartado e o arquivo existente é reutilizado.
+#
+# O estado fica em disco para funcionar com vários workers do gunicorn; um
+# flock no arquivo parcial serializa as partes de uma mesma sessão. O hash do
+# arquivo inteiro é acumulado em memória pelo worker que recebe as partes e,
+# se elas passarem por workers diferentes, o arquivo é relido na conclusão.
+#
+# UPLOAD_TAMANHO_PARTE  tamanho máximo de cada parte em bytes (padrão: 8 MB)
+# UPLOAD_TAMANHO_MAXIMO tamanho máximo do arquivo em bytes (padrão: 2 GB)
+# UPLOAD_VALIDADE_HORAS horas até uma sessão abandonada ser apagada (padrão: 24)
+# UPLOAD_PARCIAIS_DIR   pasta dos envios em andamento (padrão: erp-agencia-parciais
+#                       na pasta temporária do sistema)
+
+STATIC_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), '..', 'static'))
+UPLOAD_FOLDER = 'uploads'
+PASTA_PARCIAIS = os.environ.get('UPLOAD_PARCIAIS_DIR') or os.path.join(tempfile.gettempdir(), 'erp-agencia-parciais')
+PASTA_CAS = 'cas'
+
+TAMANHO_PARTE = int(os.environ.get('UPLOAD_TAMANHO_PARTE', 8 * 1024 * 1024))
+TAMANHO_MAXIMO = int(os.environ.get('UPLOAD_TAMANHO_MAXIMO', 2 * 1024 * 1024 * 1024))
+VALIDADE = timedelta(hours=int(os.environ.get('UPLOAD_VALIDADE_HORAS', 24)))
+
+TAMANHO_BLOCO = 256 * 1024
+
+# Hash acumulado por sessão neste processo: {id: (bytes já incluídos, sha256)}
+_hashes = {}
+_hashes_lock = threading.Lock()
+
+
+class ErroEnvio(ValueError):
+    def __init__(self, mensagem, status=400, **dados):
+        super().__init__(mensagem)
+        self.status = status
+        self.dados = dados
+
+
+def _pasta_sessao(sessao_id):
+    # O id vem da URL: só aceita o formato gerado por iniciar_envio
+    try:
+        sessao_id = uuid.UUID(sessao_id).hex
+    except (TypeError, ValueError):
+        raise ErroEnvio('Sessão de envio não encontrada', 404)
+    return os.path.join(PASTA_PARCIAIS, sessao_id)
+
+
+def _ler_sessao(sessao_id, user_id):
+    pasta = _pasta_sessao(sessao_id)
+    try:
+        with open(os.path.join(pasta, 'sessao.json')) as arquivo:
+            sessao = json.load(arquivo)
+    except (OSError, ValueError):
+        raise ErroEnvio('Sessão de envio não encontrada', 404)
+    # Sessão de outro usuário: responde como se não existisse
+    if sessao.get('user_id') != user_id:
+        raise ErroEnvio('Sessão de envio não encontrada', 404)
+    return pasta, sessao
+
+
+def _gravar_sessao(pasta, sessao):
+    temporario = os.path.join(pasta, 'sessao.json.tmp')
+    with open(temporario, 'w') as arquivo:
+        json.dump(sessao, arquivo)
+    os.replace(temporario, os.path.join(pasta, 'sessao.json'))
+
+
+def _situacao(sessao, offset):
+    return {
+        'id': sessao['id'],
+        'filename': sessao['filename'],
+        'tamanho': sessao['tamanho'],
+        'tamanho_parte': TAMANHO_PARTE,
+        'offset': offset,
+        'partes': len(sessao['partes'])
+    }
+
+
+def _limpar_expiradas():
+    limite = (datetime.utcnow() - VALIDADE).timestamp()
+    try:
+        pastas = os.listdir(PASTA_PARCIAIS)
+    except OSError:
+        return
+    for nome in pastas:
+        pasta = os.path.join(PASTA_PARCIAIS, nome)
+        try:
+            if os.path.getmtime(pasta) < limite:
+                shutil.rmtree(pasta, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def iniciar_envio(filename, tamanho, user_id):
+    """Cria uma sessão de envio em partes e retorna sua situação"""
+    filename = secure_filename(filename or '')
+    if not filename:
+        raise ErroEnvio('Nome do arquivo é obrigatório')
+
+    try:
+        tamanho = int(tamanho)
+    except (TypeError, ValueError):
+        raise ErroEnvio('Tamanho do arquivo é obrigatório')
+    if tamanho <= 0:
+        raise ErroEnvio('Tamanho do arquivo inválido')
+    if tamanho > TAMANHO_MAXIMO:
+        raise ErroEnvio(f'Arquivo maior que o limite de {TAMANHO_MAXIMO} bytes', 413)
+
+    _limpar_expiradas()
+
+    sessao = {
+        'id': uuid.uuid4().hex,
+        'filename': filename,
+        'tamanho': tamanho,
+        'user_id': user_id,
+        'criado_em': datetime.utcnow().isoformat(),
+        'partes': []
+    }
+    pasta = os.path.join(PASTA_PARCIAIS, sessao['id'])
+    os.makedirs(pasta, mode=0o700)
+    open(os.path.join(pasta, 'dados'), 'wb').close()
+    _gravar_sessao(pasta, sessao)
+    return _situacao(sessao, 0)
+
+
+def situacao_envio(sessao_id, user_id):
+    """Situação de uma sessão; `offset` é de onde o envio deve continuar"""
+    pasta, sessao = _ler_sessao(sessao_id, user_id)
+    return _situacao(sessao, os.path.getsize(os.path.join(pasta, 'dados')))
+
+
+def enviar_parte(sessao_id, user_id, offset, fluxo, tamanho_parte, sha256_informado=None):
+    """Grava uma parte lida de `fluxo` a partir de `offset` e retorna a situação"""
+    pasta, sessao = _ler_sessao(sessao_id, user_id)
+
+    try:
+        offset = int(offset)
+    except (TypeError, ValueError):
+        raise ErroEnvio('Offset da parte é obrigatório')
+    if tamanho_parte is None:
+        raise ErroEnvio('Content-Length da parte é obrigatório', 411)
+    if tamanho_parte <= 0 or tamanho_parte > TAMANHO_PARTE:
+        raise ErroEnvio(f'Cada parte deve ter até {TAMANHO_PARTE} bytes', 413)
+
+    with open(os.path.join(pasta, 'dados'), 'r+b') as dados:
+        fcntl.flock(dados, fcntl.LOCK_EX)
+        # A sessão é relida com o lock: outra parte pode ter acabado de entrar
+        pasta, sessao = _ler_sessao(sessao_id, user_id)
+        atual = os.fstat(dados.fileno()).st_size
+        if offset != atual:
+            raise ErroEnvio('Offset fora de sequência', 409, offset=atual)
+        if offset + tamanho_parte > sessao['tamanho']:
+            raise ErroEnvio('A parte ultrapassa o tamanho do arquivo', 416, offset=atual)
+
+        with _hashes_lock:
+            acumulado = _hashes.pop(sessao['id'], None)
+        if acumulado is not None and acumulado[0] != offset:
+            acumulado = None
+        if offset == 0:
+            acumulado = (0, hashlib.sha256())
+
+        hash_parte = hashlib.sha256()
+        recebidos = 0
+        dados.seek(offset)
+        while recebidos < tamanho_parte:
+            bloco = fluxo.read(min(TAMANHO_BLOCO, tamanho_parte - recebidos))
+            if not bloco:
+                break
+            dados.write(bloco)
+            hash_parte.update(bloco)
+            if acumulado is not None:
+                acumulado[1].update(bloco)
+            recebidos += len(bloco)
+
+        digest = hash_parte.hexdigest()
+        if recebidos != tamanho_parte or (sha256_informado and sha256_informado.lower() != digest):
+            # Parte incompleta ou corrompida: descarta e mantém o offset anterior
+            dados.truncate(offset)
+            if recebidos != tamanho_parte:
+                raise ErroEnvio('Parte incompleta', 400, offset=offset)
+            raise ErroEnvio('SHA-256 da parte não confere', 422, offset=offset)
+
+        dados.flush()
+        os.fsync(dados.fileno())
+
+        sessao['partes'].append({'offset': offset, 'tamanho': recebidos, 'sha256': digest})
+        _gravar_sessao(pasta, sessao)
+
+    if acumulado is not None:
+        with _hashes_lock:
+            _hashes[sessao['id']] = (offset + recebidos, acumulado[1])
+
+    return _situacao(sessao, offset + recebidos)
+
+
+def _hash_arquivo(caminho):
+    sha256 = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1024 * 1024), b''):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+
+def _mover(origem, destino):
+    try:
+        os.replace(origem, destino)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # Parciais em outro sistema de arquivos: copia para um temporário ao
+        # lado do destino e renomeia, para o arquivo nunca aparecer pela metade
+        temporario = f'{destino}.{uuid.uuid4().hex}.tmp'
+        try:
+            shutil.copyfile(origem, temporario)
+            os.replace(temporario, destino)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+
+def concluir_envio(sessao_id, user_id):
+    """Conclui o envio e retorna o arquivo armazenado por conteúdo.
+
+    Retorna filename, filepath (relativo a static/), sha256, tamanho e se o
+    conteúdo já existia (deduplicado).
+    """
+    pasta, sessao = _ler_sessao(sessao_id, user_id)
+    caminho_dados = os.path.join(pasta, 'dados')
+
+    with open(caminho_dados, 'rb') as dados:
+        fcntl.flock(dados, fcntl.LOCK_EX)
+        tamanho = os.fstat(dados.fileno()).st_size
+        if tamanho != sessao['tamanho']:
+            raise ErroEnvio('Envio incompleto', 409, offset=tamanho)
+
+        with _hashes_lock:
+            acumulado = _hashes.pop(sessao['id'], None)
+        if acumulado is not None and acumulado[0] == tamanho:
+            sha256 = acumulado[1].hexdigest()
+        else:
+            sha256 = _hash_arquivo(caminho_dados)
+
+        extensao = os.path.splitext(sessao['filename'])[1].lower()
+        relativo = f"{UPLOAD_FOLDER}/{PASTA_CAS}/{sha256[:2]}/{sha256}{extensao}"
+        destino = os.path.join(STATIC_DIR, relativo)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+
+        deduplicado = os.path.exists(destino)
+        if not deduplicado:
+            _mover(caminho_dados, destino)
+
+    shutil.rmtree(pasta, ignore_errors=True)
+
+    return {
+        'filename': sessao['filename'],
+        'filepath': relativo,
+        'sha256': sha256,
+        'tamanho': tamanho,
+        'deduplicado': deduplicado
+    }
+
+
+def cancelar_envio(sessao_id, user_id):
+    """Descarta uma sessão de envio e o que já foi recebido"""
+    pasta, sessao = _ler_sessao(sessao_id, user_id)
+    with _hashes_lock:
+        _hashes.pop(sessao['id'], None)
+    shutil.rmtree(pasta, ignore_errors=True)
+
+
+def armazenado_por_conteudo(filepath):
+    """Indica se o arquivo está no armazenamento por conteúdo (compartilhado entre envios)"""
+    return filepath.startswith(f'{UPLOAD_FOLDER}/{PASTA_CAS}/')
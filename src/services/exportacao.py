@@ -0,0 +1,76 @@
+from src.models.user import db
+from src.models.cliente import Cliente
+from src.models.pedido import Pedido
+from src.models.financeiro import TransacaoFinanceira
+from src.services.tarefas import DIRETORIO_ARQUIVOS, ErroTarefa, tipo_tarefa
+from datetime import datetime
+import csv
+import os
+import uuid
+
+# Exportação de clientes, pedidos e transações financeiras em CSV, executada
+# como tarefa em segundo plano (ver src/services/tarefas.py).
+#
+# As linhas são lidas em lotes de TAMANHO_LOTE e escritas direto no arquivo,
+# no formato que o Excel em português abre sem ajustes (UTF-8 com BOM e ponto
+# e vírgula) e que a importação (src/utils/planilhas.py) aceita de volta.
+
+TAMANHO_LOTE = 1000
+
+ENTIDADES = {
+    'clientes': Cliente,
+    'pedidos': Pedido,
+    'transacoes': TransacaoFinanceira
+}
+
+# Blueprint cuja permissão de leitura cobre cada entidade
+RECURSOS = {
+    'clientes': 'cliente',
+    'pedidos': 'pedido',
+    'transacoes': 'financeiro'
+}
+
+
+def _formatar(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+
+def validar_exportacao(parametros):
+    if parametros.get('entidade') not in ENTIDADES:
+        raise ErroTarefa(f"Entidade inválida. Use uma destas: {', '.join(ENTIDADES)}")
+
+
+def recursos_exportacao(parametros):
+    recurso = RECURSOS.get(parametros.get('entidade'))
+    return (recurso,) if recurso else ()
+
+
+@tipo_tarefa('exportar', validar=validar_exportacao, recursos=recursos_exportacao)
+def exportar_csv(entidade):
+    """Grava a tabela da entidade em um CSV; retorna o nome do arquivo gerado"""
+    tabela = ENTIDADES[entidade].__table__
+    nome = f'{uuid.uuid4().hex}.csv'
+    caminho = os.path.join(DIRETORIO_ARQUIVOS, nome)
+    temporario = caminho + '.parcial'
+
+    linhas = 0
+    with db.engine.connect() as conexao, open(temporario, 'w', encoding='utf-8-sig', newline='') as arquivo:
+        escritor = csv.writer(arquivo, delimiter=';')
+        escritor.writerow(tabela.columns.keys())
+        resultado = conexao.execution_options(yield_per=TAMANHO_LOTE).execute(
+            db.select(tabela).order_by(tabela.c.id)
+        )
+        for lote in resultado.partitions():
+            escritor.writerows([_formatar(valor) for valor in linha] for linha in lote)
+            linhas += len(lote)
+    os.replace(temporario, caminho)
+
+    return {
+        'arquivo': nome,
+        'nome_download': f"{entidade}-{datetime.now().strftime('%Y%m%d-%H%M')}.csv",
+        'linhas': linhas
+    }
@@ -0,0 +1,106 @@
+from flask import g
+from src.models.cliente import Cliente
+from src.models.pedido import Pedido
+from src.models.demanda_social import DemandaSocialMedia
+from src.models.financeiro import TransacaoFinanceira
+from src.services.kpis import (
+    periodo_mes_atual, kpis_clientes, kpis_pedidos, kpis_financeiro, kpis_demandas
+)
+from src.services.ranking import contar_clientes_por_qtd_pedidos
+from src.services.resumo_mensal import ultimos_meses, serie_pedidos
+from src.utils.cache import TTL_PADRAO, obter_backend
+from dataclasses import dataclass
+from datetime import datetime
+import threading
+import time
+
+# Fatos da empresa lidos pelas análises do AssistenteIA.
+#
+# Em vez de cada análise consultar o banco (e recontar os mesmos pedidos
+# atrasados, totais e margens), os fatos são coletados uma vez, com um número
+# fixo de consultas agregadas, em um FatosEmpresa imutável. O mesmo retrato é
+# reaproveitado na requisição (flask.g) e, no processo, enquanto as versões
+# das tabelas não mudarem e a janela de CACHE_TTL segundos não virar (os
+# fatos dependem do relógio: atrasos e mês atual).
+
+TABELAS = [modelo.__table__.name for modelo in (Cliente, Pedido, TransacaoFinanceira, DemandaSocialMedia)]
+
+_ultimo = None
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class FatosEmpresa:
+    gerado_em: datetime
+
+    total_clientes: int
+    clientes_ativos: int
+    prospects: int
+    clientes_sem_contato: int
+    clientes_um_pedido: int
+
+    total_pedidos: int
+    pedidos_atrasados: int
+    pedidos_mes: int
+    pedidos_mes_anterior: int
+    margem_media: float | None
+
+    receitas_mes: float
+    despesas_mes: float
+
+    demandas_urgentes: int
+
+    faturamento_meses: tuple
+
+
+def coletar_fatos():
+    """Coleta os fatos com seis consultas agregadas, qualquer que seja o volume"""
+    inicio_mes, fim_mes = periodo_mes_atual()
+    clientes = kpis_clientes(inicio_mes)
+    pedidos = kpis_pedidos(inicio_mes)
+    financeiro = kpis_financeiro(inicio_mes, fim_mes)
+    demandas = kpis_demandas()
+
+    return FatosEmpresa(
+        gerado_em=datetime.now(),
+        total_clientes=clientes['total_clientes'],
+        clientes_ativos=clientes['clientes_ativos'],
+        prospects=clientes['prospects'],
+        clientes_sem_contato=clientes['clientes_sem_contato'],
+        clientes_um_pedido=contar_clientes_por_qtd_pedidos(1, status='Ativo'),
+        total_pedidos=pedidos['total_pedidos'],
+        pedidos_atrasados=pedidos['pedidos_atrasados'],
+        pedidos_mes=pedidos['pedidos_mes'],
+        pedidos_mes_anterior=pedidos['pedidos_mes_anterior'],
+        margem_media=pedidos['margem_media'] if pedidos['pedidos_com_margem'] else None,
+        receitas_mes=financeiro['receitas_mes'],
+        despesas_mes=financeiro['despesas_mes'],
+        demandas_urgentes=demandas['demandas_urgentes'],
+        faturamento_meses=tuple(serie_pedidos(ultimos_meses(6), status='Concluído')['valor'])
+    )
+
+
+def obter_fatos():
+    """Retrato dos fatos da requisição atual, reaproveitado enquanto válido"""
+    global _ultimo
+
+    if 'fatos_empresa' in g:
+        return g.fatos_empresa
+
+    backend = obter_backend()
+    if backend is None:
+        g.fatos_empresa = coletar_fatos()
+        return g.fatos_empresa
+
+    chave = (tuple(backend.versoes(TABELAS)), int(time.time() // TTL_PADRAO))
+    with _lock:
+        ultimo = _ultimo
+    if ultimo is not None and ultimo[0] == chave:
+        fatos = ultimo[1]
+    else:
+        fatos = coletar_fatos()
+        with _lock:
+            _ultimo = (chave, fatos)
+
+    g.fatos_empresa = fatos
+    return fatos
@@ -0,0 +1,187 @@
+from concurrent.futures import ProcessPoolExecutor
+from src.utils.cache import obter_backend
+from collections import OrderedDict
+import json
+import logging
+import os
+import shutil
+import threading
+
+# Derivados das imagens enviadas (miniaturas e versões WebP/AVIF sem EXIF),
+# gerados em um pool de processos fora da requisição.
+#
+# Para uploads/<nome>.<ext> os derivados ficam em uploads/derivados/<nome>/ e
+# o manifest.json dessa pasta, gravado por último, indica que estão prontos.
+# Enquanto o manifesto não existe, as URLs dos derivados apontam para o
+# original.
+#
+# IMAGENS_TAMANHOS   larguras das miniaturas, separadas por vírgula (padrão: 160,480,1024)
+# IMAGENS_QUALIDADE  qualidade das re-codificações com perda (padrão: 80)
+# IMAGENS_PROCESSOS  processos do pool por worker do gunicorn (padrão: 1)
+
+STATIC_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), '..', 'static'))
+
+TAMANHOS = tuple(int(t) for t in os.environ.get('IMAGENS_TAMANHOS', '160,480,1024').split(',') if t.strip())
+QUALIDADE = int(os.environ.get('IMAGENS_QUALIDADE', 80))
+PROCESSOS = int(os.environ.get('IMAGENS_PROCESSOS', 1))
+
+EXTENSOES_PROCESSADAS = {'png', 'jpg', 'jpeg', 'webp'}
+
+# Manifestos lidos mantidos em memória (os menos usados saem primeiro)
+LIMITE_MANIFESTOS = 2000
+
+# Versão usada no cache/ETag das respostas que trazem URLs de derivados
+VERSAO_DERIVADOS = 'derivados_imagem'
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_manifestos = OrderedDict()
+_manifestos_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def _formatos_disponiveis():
+    from PIL import Image
+    try:
+        import pillow_avif  # noqa: F401 (registra o AVIF no Pillow, se instalado)
+    except ImportError:
+        pass
+    # Carrega os plugins de formato; sem isso Image.SAVE só tem os já usados
+    Image.init()
+    return [formato for formato in ('WEBP', 'AVIF') if formato in Image.SAVE]
+
+
+def _pasta_derivados(caminho_relativo):
+    diretorio, arquivo = os.path.split(caminho_relativo)
+    return os.path.join(diretorio, 'derivados', os.path.splitext(arquivo)[0])
+
+
+def gerar_derivados(caminho_relativo, tamanhos=TAMANHOS, qualidade=QUALIDADE):
+    """Gera os derivados de uma imagem (executado no pool de processos).
+
+    Retorna o manifesto: {'largura': {'formato': caminho relativo}}, com a
+    chave 'original' para a re-codificação no tamanho original.
+    """
+    from PIL import Image, ImageOps
+
+    origem = os.path.join(STATIC_DIR, caminho_relativo)
+    pasta_relativa = _pasta_derivados(caminho_relativo)
+    pasta = os.path.join(STATIC_DIR, pasta_relativa)
+    os.makedirs(pasta, exist_ok=True)
+    formatos = _formatos_disponiveis()
+
+    with Image.open(origem) as imagem:
+        # Aplica a rotação do EXIF antes de descartá-lo
+        imagem = ImageOps.exif_transpose(imagem)
+        if imagem.mode not in ('RGB', 'RGBA'):
+            imagem = imagem.convert('RGBA' if 'transparency' in imagem.info or imagem.mode in ('LA', 'P') else 'RGB')
+
+        manifesto = {}
+        larguras = [t for t in sorted(set(tamanhos)) if t < imagem.width] + ['original']
+        for largura in larguras:
+            if largura == 'original':
+                variante = imagem
+            else:
+                altura = max(1, round(imagem.height * largura / imagem.width))
+                variante = imagem.resize((largura, altura), Image.LANCZOS)
+
+            manifesto[str(largura)] = {}
+            for formato in formatos:
+                nome = f'{largura}.{formato.lower()}'
+                # Sem exif=..., o Pillow não copia os metadados para o arquivo novo
+                variante.save(os.path.join(pasta, nome), formato, quality=qualidade)
+                manifesto[str(largura)][formato.lower()] = f'{pasta_relativa}/{nome}'.replace(os.sep, '/')
+
+    temporario = os.path.join(pasta, 'manifest.json.tmp')
+    with open(temporario, 'w') as arquivo:
+        json.dump(manifesto, arquivo)
+    os.replace(temporario, os.path.join(pasta, 'manifest.json'))
+    return manifesto
+
+
+def _obter_pool():
+    global _pool, _pool_pid
+    # Um pool por processo: o pool herdado de um fork não é utilizável
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=PROCESSOS)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def imagem_processavel(caminho_relativo):
+    extensao = caminho_relativo.rsplit('.', 1)[-1].lower() if '.' in caminho_relativo else ''
+    return extensao in EXTENSOES_PROCESSADAS
+
+
+def agendar_derivados(caminho_relativo):
+    """Enfileira a geração dos derivados de uma imagem salva em static/"""
+    if not imagem_processavel(caminho_relativo):
+        return None
+
+    # O backend é obtido aqui, dentro da requisição, porque o callback roda
+    # em uma thread do pool sem contexto da aplicação
+    backend = obter_backend()
+    futuro = _obter_pool().submit(gerar_derivados, caminho_relativo)
+
+    def _concluido(futuro):
+        erro = futuro.exception()
+        if erro is not None:
+            # A imagem continua servida pelo original
+            logger.error('Falha ao gerar os derivados de %s', caminho_relativo, exc_info=erro)
+        elif backend is not None:
+            backend.incrementar_versoes([VERSAO_DERIVADOS])
+
+    futuro.add_done_callback(_concluido)
+    return futuro
+
+
+def manifesto_derivados(caminho_relativo):
+    """Manifesto dos derivados prontos de uma imagem, ou None se ainda não existem"""
+    with _manifestos_lock:
+        if caminho_relativo in _manifestos:
+            _manifestos.move_to_end(caminho_relativo)
+            return _manifestos[caminho_relativo]
+
+    caminho = os.path.join(STATIC_DIR, _pasta_derivados(caminho_relativo), 'manifest.json')
+    try:
+        with open(caminho) as arquivo:
+            manifesto = json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+    # Derivados prontos não mudam mais (um novo upload tem outro nome)
+    with _manifestos_lock:
+        _manifestos[caminho_relativo] = manifesto
+        if len(_manifestos) > LIMITE_MANIFESTOS:
+            _manifestos.popitem(last=False)
+    return manifesto
+
+
+def remover_derivados(caminho_relativo):
+    """Apaga os derivados de uma imagem removida ou substituída"""
+    with _manifestos_lock:
+        _manifestos.pop(caminho_relativo, None)
+    shutil.rmtree(os.path.join(STATIC_DIR, _pasta_derivados(caminho_relativo)), ignore_errors=True)
+
+
+def urls_imagem(caminho_relativo):
+    """URLs da imagem e de seus derivados; usa o original até os derivados ficarem prontos"""
+    if not caminho_relativo:
+        return None
+
+    original = f'/static/{caminho_relativo}'
+    manifesto = manifesto_derivados(caminho_relativo) if imagem_processavel(caminho_relativo) else None
+
+    derivados = {}
+    for largura in [str(t) for t in TAMANHOS] + ['original']:
+        formatos = (manifesto or {}).get(largura) or (manifesto or {}).get('original') or {}
+        derivados[largura] = {formato: f'/static/{caminho}' for formato, caminho in formatos.items()} or original
+
+    return {
+        'original': original,
+        'pronto': manifesto is not None,
+        'derivados': derivados
+    }
@@ -0,0 +1,174 @@
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db
+from src.models.cliente import Cliente
+from src.models.pedido import Pedido
+from src.models.financeiro import TransacaoFinanceira
+from src.services.validacao import ErroValidacao, valores_cliente, valores_pedido, valores_transacao
+from src.services.busca import colunas_indexadas, indexar_busca
+from src.services.colunar import registrar_alterados
+from src.services.resumo_mensal import registrar_linhas
+from src.utils.cache import marcar_tabelas_alteradas
+from src.utils.planilhas import FormatoInvalido
+from datetime import datetime
+
+# Importação em lote de clientes, pedidos e transações financeiras.
+#
+# Os registros são validados com as mesmas regras das rotas de criação e
+# gravados em lotes de TAMANHO_LOTE: as referências (cliente, pedido) de cada
+# lote são resolvidas em uma consulta, as linhas válidas são inseridas com um
+# único INSERT executemany e o lote é confirmado em sua própria transação.
+# Linhas inválidas não interrompem a importação; cada uma entra no relatório
+# de erros com o número da linha de origem. Se o arquivo estiver malformado
+# a leitura para, os lotes já confirmados permanecem e o relatório traz o erro.
+
+TAMANHO_LOTE = 1000
+
+
+class _Importacao:
+    modelo = None
+    validar = None
+
+    def __init__(self):
+        self.importados = 0
+        self.erros = []
+
+    def erro(self, linha, mensagem):
+        self.erros.append({'linha': linha, 'error': mensagem})
+
+    def resolver(self, lote):
+        """Completa/verifica as referências do lote; retorna as linhas aceitas"""
+        return lote
+
+    def gravar(self, lote):
+        valores = [registro for _, registro in lote]
+        tabela = self.modelo.__table__
+        indexar = bool(colunas_indexadas(self.modelo))
+        if indexar:
+            ultimo_id = db.session.execute(db.select(db.func.max(tabela.c.id))).scalar() or 0
+        db.session.execute(tabela.insert(), valores)
+        # Os ids inseridos não são conhecidos: o retrato colunar relê a tabela
+        # e a busca indexa as linhas após o maior id anterior ao INSERT
+        registrar_alterados(db.session.connection(), self.modelo)
+        if indexar:
+            indexar_busca(db.session.connection(), self.modelo, tabela.c.id > ultimo_id)
+        marcar_tabelas_alteradas(db.session, self.modelo)
+
+    def processar(self, lote):
+        lote = self.resolver(lote)
+        if not lote:
+            return
+        try:
+            self.gravar(lote)
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            for linha, _ in lote:
+                self.erro(linha, f'Erro ao gravar o lote: {e.orig}')
+            return
+        self.importados += len(lote)
+
+    def executar(self, registros):
+        total = 0
+        lote = []
+        relatorio = {}
+        try:
+            for linha, dados in registros:
+                total += 1
+                try:
+                    lote.append((linha, self.validar(dados)))
+                except ErroValidacao as e:
+                    self.erro(linha, str(e))
+                    continue
+                if len(lote) >= TAMANHO_LOTE:
+                    self.processar(lote)
+                    lote = []
+            if lote:
+                self.processar(lote)
+        except FormatoInvalido as e:
+            relatorio['error'] = str(e)
+
+        self.erros.sort(key=lambda erro: erro['linha'])
+        relatorio.update({
+            'total_linhas': total,
+            'importados': self.importados,
+            'total_erros': len(self.erros),
+            'erros': self.erros
+        })
+        return relatorio
+
+
+class _ImportacaoClientes(_Importacao):
+    modelo = Cliente
+    validar = staticmethod(valores_cliente)
+
+
+class _ImportacaoPedidos(_Importacao):
+    modelo = Pedido
+    validar = staticmethod(valores_pedido)
+
+    def __init__(self):
+        super().__init__()
+        self.ids_pedido = set()
+
+    def resolver(self, lote):
+        clientes = {registro['cliente_id'] for _, registro in lote}
+        existentes = set(db.session.scalars(db.select(Cliente.id).where(Cliente.id.in_(clientes))))
+        duplicados = set(db.session.scalars(
+            db.select(Pedido.id_pedido).where(Pedido.id_pedido.in_([r['id_pedido'] for _, r in lote]))
+        ))
+
+        aceitos = []
+        agora = datetime.utcnow()
+        for linha, registro in lote:
+            if registro['cliente_id'] not in existentes:
+                self.erro(linha, 'Cliente não encontrado')
+            elif registro['id_pedido'] in duplicados or registro['id_pedido'] in self.ids_pedido:
+                self.erro(linha, f"Pedido {registro['id_pedido']} já existe")
+            else:
+                # Preenchido aqui para o resumo mensal receber o mesmo valor gravado
+                registro.setdefault('data_pedido', agora)
+                self.ids_pedido.add(registro['id_pedido'])
+                aceitos.append((linha, registro))
+        return aceitos
+
+    def gravar(self, lote):
+        super().gravar(lote)
+        registrar_linhas(db.session.connection(), Pedido, [registro for _, registro in lote])
+
+
+class _ImportacaoTransacoes(_Importacao):
+    modelo = TransacaoFinanceira
+    validar = staticmethod(valores_transacao)
+
+    def resolver(self, lote):
+        pedidos = {registro['pedido_id'] for _, registro in lote if registro['pedido_id']}
+        existentes = set(db.session.scalars(db.select(Pedido.id).where(Pedido.id.in_(pedidos)))) if pedidos else set()
+
+        aceitos = []
+        agora = datetime.utcnow()
+        for linha, registro in lote:
+            if registro['pedido_id'] and registro['pedido_id'] not in existentes:
+                self.erro(linha, 'Pedido não encontrado')
+            else:
+                registro.setdefault('data', agora)
+                aceitos.append((linha, registro))
+        return aceitos
+
+    def gravar(self, lote):
+        super().gravar(lote)
+        registrar_linhas(db.session.connection(), TransacaoFinanceira, [registro for _, registro in lote])
+
+
+def importar_clientes(registros):
+    """Importa clientes a partir de (linha, dados); retorna o relatório da importação"""
+    return _ImportacaoClientes().executar(registros)
+
+
+def importar_pedidos(registros):
+    """Importa pedidos a partir de (linha, dados); retorna o relatório da importação"""
+    return _ImportacaoPedidos().executar(registros)
+
+
+def importar_transacoes(registros):
+    """Importa transações financeiras a partir de (linha, dados); retorna o relatório da importação"""
+    return _ImportacaoTransacoes().executar(registros)
@@ -0,0 +1,115 @@
+from src.models.user import db
+from src.models.cliente import Cliente
+from src.models.pedido import Pedido
+from src.models.demanda_social import DemandaSocialMedia
+from src.models.financeiro import TransacaoFinanceira
+from src.models.tabela_preco import TabelaPreco
+from datetime import datetime, timedelta
+
+# Migração dos índices declarados nos modelos e verificação dos planos de
+# execução das consultas mais frequentes.
+#
+# db.create_all() só cria índices junto com tabelas novas; em bancos que já
+# existiam os índices precisam ser criados por criar_indices_ausentes().
+
+
+def criar_indices_ausentes():
+    """Cria no banco os índices declarados nos modelos que ainda não existem.
+
+    Retorna os nomes dos índices criados. Funciona em SQLite e PostgreSQL; em
+    tabelas muito grandes no PostgreSQL prefira rodar fora do horário de pico,
+    pois o CREATE INDEX bloqueia escritas na tabela enquanto executa.
+    """
+    inspetor = db.inspect(db.engine)
+    tabelas_existentes = set(inspetor.get_table_names())
+    criados = []
+
+    for tabela in db.metadata.sorted_tables:
+        if tabela.name not in tabelas_existentes:
+            continue
+        existentes = {indice['name'] for indice in inspetor.get_indexes(tabela.name)}
+        for indice in sorted(tabela.indexes, key=lambda i: i.name):
+            if indice.name not in existentes:
+                indice.create(bind=db.engine)
+                criados.append(indice.name)
+
+    return criados
+
+
+def consultas_quentes():
+    """Consultas dos filtros mais usados, que devem sempre usar índice"""
+    agora = datetime.utcnow()
+    inicio_mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    fim_mes = inicio_mes + timedelta(days=31)
+
+    return {
+        'pedido por status e data_pedido': Pedido.query.filter(
+            Pedido.status == 'Concluído', Pedido.data_pedido >= inicio_mes
+        ),
+        'pedidos atrasados (data_entrega, status)': Pedido.query.filter(
+            Pedido.data_entrega < agora, Pedido.status != 'Concluído'
+        ),
+        'pedido por cliente_id': Pedido.query.filter(Pedido.cliente_id == 1),
+        'transação por tipo e data': TransacaoFinanceira.query.filter(
+            TransacaoFinanceira.tipo == 'Receita',
+            TransacaoFinanceira.data >= inicio_mes,
+            TransacaoFinanceira.data <= fim_mes
+        ),
+        'transação por status': TransacaoFinanceira.query.filter(TransacaoFinanceira.status == 'Pendente'),
+        'transação por pedido_id': TransacaoFinanceira.query.filter(TransacaoFinanceira.pedido_id == 1),
+        'demanda por status': DemandaSocialMedia.query.filter(DemandaSocialMedia.status == 'Criação'),
+        'demanda por prioridade': DemandaSocialMedia.query.filter(DemandaSocialMedia.prioridade == 'Urgente'),
+        'demanda por cliente_id': DemandaSocialMedia.query.filter(DemandaSocialMedia.cliente_id == 1),
+        'demanda por pedido_id': DemandaSocialMedia.query.filter(DemandaSocialMedia.pedido_id == 1),
+        'demandas atrasadas (data_entrega, status)': DemandaSocialMedia.query.filter(
+            DemandaSocialMedia.filtro_status_prazo('Atrasado')
+        ),
+        'quadro de prazos de pedidos': Pedido.query.filter(
+            Pedido.filtro_vence_ate(agora + timedelta(days=7))
+        ).order_by(Pedido.data_entrega).limit(50),
+        'cliente por status': Cliente.query.filter(Cliente.status == 'Ativo'),
+        'tabela de preços por fornecedor_id': TabelaPreco.query.filter(TabelaPreco.fornecedor_id == 1),
+        'tabela de preços por fornecedor e produto': TabelaPreco.query.filter(
+            TabelaPreco.fornecedor_id == 1, TabelaPreco.produto_servico.in_(['Item 1', 'Item 2'])
+        )
+    }
+
+
+def _plano(query):
+    dialeto = db.engine.dialect.name
+    sql = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+
+    if dialeto == 'sqlite':
+        linhas = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')).all()
+        detalhes = [linha[-1] for linha in linhas]
+        varredura = any(
+            detalhe.startswith('SCAN') and 'INDEX' not in detalhe
+            for detalhe in detalhes
+        )
+        return detalhes, varredura
+
+    if dialeto == 'postgresql':
+        # Em tabelas pequenas o planejador prefere Seq Scan mesmo com índice;
+        # desabilitar seqscan mostra se existe um índice utilizável
+        db.session.execute(db.text('SET LOCAL enable_seqscan = off'))
+        linhas = db.session.execute(db.text(f'EXPLAIN {sql}')).all()
+        detalhes = [linha[0] for linha in linhas]
+        varredura = any('Seq Scan' in detalhe for detalhe in detalhes)
+        return detalhes, varredura
+
+    raise NotImplementedError(f'Verificação de plano não suportada para {dialeto}')
+
+
+def verificar_planos():
+    """Executa EXPLAIN em cada consulta quente.
+
+    Retorna uma lista de (nome, detalhes do plano, usa_varredura_completa).
+    """
+    resultados = []
+    try:
+        for nome, query in consultas_quentes().items():
+            detalhes, varredura = _plano(query)
+            resultados.append((nome, detalhes, varredura))
+    finally:
+        db.session.rollback()
+    return resultados
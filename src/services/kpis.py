@@ -0,0 +1,123 @@
+from src.models.user import db
+from src.models.cliente import Cliente
+from src.models.pedido import Pedido
+from src.models.demanda_social import DemandaSocialMedia
+from src.models.financeiro import TransacaoFinanceira
+from datetime import datetime, timedelta
+
+# Motor de KPIs: cada entidade é agregada em uma única consulta com
+# agregações condicionais (COUNT/SUM sobre CASE) em vez de uma consulta por KPI.
+
+
+def _contar(condicao):
+    return db.func.count(db.case((condicao, 1)))
+
+
+def _somar(condicao, valor):
+    return db.func.sum(db.case((condicao, valor)))
+
+
+def periodo_mes_atual():
+    """Retorna (inicio_mes, fim_mes) do mês corrente"""
+    inicio_mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    fim_mes = (inicio_mes + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return inicio_mes, fim_mes
+
+
+def kpis_clientes(inicio_mes):
+    """KPIs de clientes em uma única consulta"""
+    um_mes_atras = datetime.now() - timedelta(days=30)
+
+    total, ativos, prospects, novos_mes, sem_contato = db.session.query(
+        db.func.count(Cliente.id),
+        _contar(Cliente.status == 'Ativo'),
+        _contar(Cliente.status == 'Prospect'),
+        _contar(Cliente.data_cadastro >= inicio_mes),
+        _contar(db.and_(Cliente.status == 'Ativo', Cliente.ultimo_contato < um_mes_atras))
+    ).one()
+
+    return {
+        'total_clientes': total,
+        'clientes_ativos': ativos,
+        'prospects': prospects,
+        'novos_clientes_mes': novos_mes,
+        'clientes_sem_contato': sem_contato
+    }
+
+
+def kpis_pedidos(inicio_mes):
+    """KPIs de pedidos em uma única consulta"""
+    concluido = Pedido.status == 'Concluído'
+    margem = (Pedido.valor - db.func.coalesce(Pedido.custo, 0)) / Pedido.valor * 100
+    inicio_mes_anterior = (inicio_mes - timedelta(days=1)).replace(day=1)
+
+    (total, em_andamento, concluidos, atrasados, faturamento_mes, margem_media, com_margem,
+     pedidos_mes, pedidos_mes_anterior) = db.session.query(
+        db.func.count(Pedido.id),
+        _contar(Pedido.status.in_(['Aprovado', 'Produção'])),
+        _contar(concluido),
+        _contar(db.and_(Pedido.data_entrega < datetime.utcnow(), Pedido.status != 'Concluído')),
+        _somar(db.and_(Pedido.data_pedido >= inicio_mes, concluido), Pedido.valor),
+        db.func.avg(db.case((db.and_(concluido, Pedido.valor > 0), margem))),
+        _contar(db.and_(concluido, Pedido.valor > 0)),
+        _contar(Pedido.data_pedido >= inicio_mes),
+        _contar(db.and_(Pedido.data_pedido >= inicio_mes_anterior, Pedido.data_pedido < inicio_mes))
+    ).one()
+
+    return {
+        'total_pedidos': total,
+        'pedidos_em_andamento': em_andamento,
+        'pedidos_concluidos': concluidos,
+        'pedidos_atrasados': atrasados,
+        'faturamento_mes': faturamento_mes or 0,
+        'margem_media': margem_media or 0,
+        'pedidos_com_margem': com_margem,
+        'pedidos_mes': pedidos_mes,
+        'pedidos_mes_anterior': pedidos_mes_anterior
+    }
+
+
+def pedidos_por_status():
+    """Quantidade de pedidos agrupada por status"""
+    linhas = db.session.query(
+        Pedido.status,
+        db.func.count(Pedido.id)
+    ).group_by(Pedido.status).all()
+    return {status: count for status, count in linhas}
+
+
+def kpis_financeiro(inicio_mes, fim_mes):
+    """KPIs financeiros do período em uma única consulta"""
+    no_periodo = db.and_(TransacaoFinanceira.data >= inicio_mes, TransacaoFinanceira.data <= fim_mes)
+
+    receitas, despesas, pendentes = db.session.query(
+        _somar(db.and_(TransacaoFinanceira.tipo == 'Receita', no_periodo), TransacaoFinanceira.valor),
+        _somar(db.and_(TransacaoFinanceira.tipo == 'Despesa', no_periodo), TransacaoFinanceira.valor),
+        _contar(TransacaoFinanceira.status == 'Pendente')
+    ).one()
+    receitas = receitas or 0
+    despesas = despesas or 0
+
+    return {
+        'receitas_mes': receitas,
+        'despesas_mes': despesas,
+        'saldo_mes': receitas - despesas,
+        'pendentes': pendentes
+    }
+
+
+def kpis_demandas():
+    """KPIs de demandas de social media em uma única consulta"""
+    total, em_criacao, aguardando, urgentes = db.session.query(
+        db.func.count(DemandaSocialMedia.id),
+        _contar(DemandaSocialMedia.status == 'Criação'),
+        _contar(DemandaSocialMedia.status == 'Aguardando Aprovação'),
+        _contar(DemandaSocialMedia.prioridade == 'Urgente')
+    ).one()
+
+    return {
+        'total_demandas': total,
+        'demandas_em_criacao': em_criacao,
+        'demandas_aguardando': aguardando,
+        'demandas_urgentes': urgentes
+    }
@@ -0,0 +1,113 @@
+from src.models.user import db
+from src.services.validacao import ErroValidacao
+from src.services.busca import colunas_indexadas, indexar_busca
+from src.services.colunar import registrar_alterados
+from src.services.resumo_mensal import campos_resumidos, registrar_alteracoes
+from src.utils.cache import marcar_tabelas_alteradas
+
+# Alterações em lote: um único UPDATE, em uma transação, para uma lista de ids
+# ou para os registros que atendem a um filtro.
+#
+# Os valores anteriores dos campos resumidos são lidos antes do UPDATE para
+# manter os resumos mensais, e as tabelas alteradas são marcadas para
+# invalidar cache e ETags no commit.
+
+LIMITE_IDS = 10000
+
+
+def _condicao(modelo, data, filtros):
+    ids = data.get('ids')
+    filtro = data.get('filtro')
+
+    if ids is not None and filtro is not None:
+        raise ErroValidacao('Informe ids ou filtro, não ambos')
+
+    if ids is not None:
+        if not isinstance(ids, list) or not ids:
+            raise ErroValidacao('ids deve ser uma lista não vazia')
+        if len(ids) > LIMITE_IDS:
+            raise ErroValidacao(f'No máximo {LIMITE_IDS} ids por lote')
+        try:
+            ids = [int(i) for i in ids]
+        except (TypeError, ValueError):
+            raise ErroValidacao('ids deve conter apenas números')
+        return [modelo.id.in_(ids)]
+
+    if not isinstance(filtro, dict) or not filtro:
+        raise ErroValidacao('Informe ids ou um filtro')
+
+    desconhecidos = set(filtro) - set(filtros)
+    if desconhecidos:
+        raise ErroValidacao(f"Filtro inválido: {', '.join(sorted(desconhecidos))}")
+
+    condicoes = filtros_para_condicoes(filtros, filtro)
+    if not condicoes:
+        raise ErroValidacao('Informe ids ou um filtro')
+    return condicoes
+
+
+def filtros_para_condicoes(filtros, valores):
+    """Condições SQL para os filtros informados, ignorando os vazios.
+
+    `filtros` mapeia o nome do filtro para a coluna comparada ou para uma
+    função que monta a condição a partir do valor (ex.: status_prazo).
+    """
+    condicoes = []
+    for nome, valor in valores.items():
+        if nome not in filtros or not valor:
+            continue
+        filtro = filtros[nome]
+        if not callable(filtro):
+            condicoes.append(filtro == valor)
+            continue
+        try:
+            condicoes.append(filtro(valor))
+        except ValueError as e:
+            raise ErroValidacao(str(e))
+    return condicoes
+
+
+def atualizar_em_lote(modelo, data, campos, filtros):
+    """Aplica `data['alteracoes']` aos registros selecionados por `data['ids']`
+    ou `data['filtro']`; retorna os ids afetados.
+
+    `campos` mapeia cada campo que pode ser alterado para a função que valida
+    o valor (ver validacao.CAMPOS_LOTE_PEDIDO) e `filtros` mapeia o nome de
+    cada filtro aceito para a coluna correspondente.
+    """
+    alteracoes = data.get('alteracoes')
+    if not isinstance(alteracoes, dict) or not alteracoes:
+        raise ErroValidacao('Informe as alterações')
+
+    invalidos = set(alteracoes) - set(campos)
+    if invalidos:
+        raise ErroValidacao(f"Campos não alteráveis em lote: {', '.join(sorted(invalidos))}")
+    alteracoes = {campo: campos[campo](valor) for campo, valor in alteracoes.items()}
+
+    condicoes = _condicao(modelo, data, filtros)
+
+    resumidos = campos_resumidos(modelo)
+    colunas = [modelo.id] + [getattr(modelo, campo) for campo in resumidos]
+    linhas = db.session.execute(
+        db.select(*colunas).where(*condicoes).order_by(modelo.id).with_for_update()
+    ).all()
+    ids = [linha.id for linha in linhas]
+
+    if ids:
+        db.session.execute(
+            db.update(modelo).where(modelo.id.in_(ids)).values(**alteracoes),
+            execution_options={'synchronize_session': False}
+        )
+
+        if resumidos:
+            anteriores = [linha._asdict() for linha in linhas]
+            atuais = [{**anterior, **alteracoes} for anterior in anteriores]
+            registrar_alteracoes(db.session.connection(), modelo, anteriores, atuais)
+
+        registrar_alterados(db.session.connection(), modelo, ids)
+        if set(alteracoes) & colunas_indexadas(modelo):
+            indexar_busca(db.session.connection(), modelo, modelo.id.in_(ids))
+        marcar_tabelas_alteradas(db.session, modelo)
+
+    db.session.commit()
+    return ids
@@ -0,0 +1,564 @@
+from src.models.user import db
+from src.models.cliente import Cliente
+from src.models.pedido import Pedido
+from src.models.financeiro import TransacaoFinanceira
+from src.services.resumo_mensal import serie_financeira, serie_pedidos
+from src.utils.cache import TTL_PADRAO, obter_backend
+from collections import namedtuple
+from datetime import datetime, timedelta
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+
+# Motor de perguntas do AssistenteIA.
+#
+# A pergunta é normalizada (minúsculas, sem acentos) e quebrada em palavras.
+# Um índice montado na importação liga cada termo (ou expressão) às intenções
+# que ele sinaliza, então reconhecer a intenção custa uma consulta ao índice
+# por palavra, qualquer que seja o número de intenções. Da mesma forma, nomes
+# de clientes e tipos de serviço são procurados em um índice pela primeira
+# palavra, montado a partir do banco e refeito quando as tabelas mudam.
+#
+# Períodos ("mês passado", "últimos 90 dias", "em março") viram um intervalo
+# [inicio, fim). Só a consulta agregada da intenção reconhecida é executada;
+# períodos de meses inteiros sem filtro de cliente/serviço são lidos dos
+# resumos mensais. As respostas ficam no cache compartilhado por
+# PERGUNTAS_TTL segundos (padrão: 30), com as versões das tabelas na chave.
+
+TTL_RESPOSTAS = int(os.environ.get('PERGUNTAS_TTL', 30))
+
+STATUS_EM_ANDAMENTO = ('Aprovado', 'Produção')
+STATUS_EM_ABERTO = ('Pendente', 'Atrasado')
+
+# Tipos de serviço reconhecidos mesmo antes do primeiro pedido
+SERVICOS_PADRAO = ('Social Media', 'Gráfica', 'Encarte', 'Branding', 'Consultoria')
+
+# Palavras que sozinhas não identificam um cliente ou serviço
+PALAVRAS_VAZIAS = frozenset((
+    'a', 'o', 'as', 'os', 'e', 'de', 'do', 'da', 'dos', 'das', 'em', 'no', 'na', 'nos', 'nas',
+    'um', 'uma', 'para', 'por', 'com', 'que', 'qual', 'quanto', 'quantos', 'mes', 'ano', 'hoje'
+))
+
+MESES = {
+    'janeiro': 1, 'fevereiro': 2, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6,
+    'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12
+}
+
+_NOMES_MESES = [None, 'janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho',
+                'julho', 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro']
+
+Periodo = namedtuple('Periodo', 'inicio fim descricao')
+
+Consulta = namedtuple('Consulta', 'intencao periodo cliente servico')
+
+Intencao = namedtuple('Intencao', 'nome termos tabelas responder periodo_padrao')
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos: 'Mês Passado' -> 'mes passado'"""
+    decomposto = unicodedata.normalize('NFKD', (texto or '').lower())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def palavras(texto):
+    return re.findall(r'\w+', normalizar(texto))
+
+
+# Períodos
+
+def _inicio_dia(data):
+    return data.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _somar_meses(data, meses):
+    total = data.year * 12 + data.month - 1 + meses
+    return data.replace(year=total // 12, month=total % 12 + 1, day=1)
+
+
+def _mes(ano, mes):
+    inicio = datetime(ano, mes, 1)
+    return Periodo(inicio, _somar_meses(inicio, 1), f'em {_NOMES_MESES[mes]} de {ano}')
+
+
+def _ultimos(match, agora):
+    quantidade, unidade = int(match.group(1)), match.group(2)
+    dias = {'d': 1, 's': 7, 'm': 30, 'a': 365}[unidade[0]] * quantidade
+    fim = _inicio_dia(agora) + timedelta(days=1)
+    return Periodo(fim - timedelta(days=dias), fim, f'nos últimos {quantidade} {unidade}')
+
+
+def _dia(deslocamento, descricao):
+    def periodo(match, agora):
+        inicio = _inicio_dia(agora) + timedelta(days=deslocamento)
+        return Periodo(inicio, inicio + timedelta(days=1), descricao)
+    return periodo
+
+
+def _semana(deslocamento, descricao):
+    def periodo(match, agora):
+        inicio = _inicio_dia(agora) - timedelta(days=agora.weekday() - 7 * deslocamento)
+        return Periodo(inicio, inicio + timedelta(days=7), descricao)
+    return periodo
+
+
+def _mes_relativo(deslocamento, descricao):
+    def periodo(match, agora):
+        inicio = _somar_meses(_inicio_dia(agora), deslocamento)
+        return Periodo(inicio, _somar_meses(inicio, 1), descricao)
+    return periodo
+
+
+def _ano_relativo(deslocamento, descricao):
+    def periodo(match, agora):
+        inicio = datetime(agora.year + deslocamento, 1, 1)
+        return Periodo(inicio, inicio.replace(year=inicio.year + 1), descricao)
+    return periodo
+
+
+def _mes_nomeado(match, agora):
+    mes = MESES[match.group(1)]
+    if match.group(2):
+        ano = int(match.group(2))
+    else:
+        # Sem ano: a ocorrência mais recente do mês
+        ano = agora.year if mes <= agora.month else agora.year - 1
+    return _mes(ano, mes)
+
+
+def _ano(match, agora):
+    ano = int(match.group(1))
+    return Periodo(datetime(ano, 1, 1), datetime(ano + 1, 1, 1), f'em {ano}')
+
+
+_PADROES_PERIODO = [(re.compile(padrao), periodo) for padrao, periodo in (
+    (r'\bultim[oa]s\s+(\d+)\s+(dias?|semanas?|mes(?:es)?|anos?)\b', _ultimos),
+    (r'\bhoje\b', _dia(0, 'hoje')),
+    (r'\bontem\b', _dia(-1, 'ontem')),
+    (r'\b(?:semana\s+(?:passada|anterior)|ultima\s+semana)\b', _semana(-1, 'na semana passada')),
+    (r'\b(?:[nd]?(?:esta|essa)\s+semana|semana\s+atual)\b', _semana(0, 'nesta semana')),
+    (r'\b(?:mes\s+(?:passado|anterior)|ultimo\s+mes)\b', _mes_relativo(-1, 'no mês passado')),
+    (r'\b(?:[nd]?(?:este|esse)\s+mes|mes\s+atual)\b', _mes_relativo(0, 'neste mês')),
+    (r'\b(?:ano\s+(?:passado|anterior)|ultimo\s+ano)\b', _ano_relativo(-1, 'no ano passado')),
+    (r'\b(?:[nd]?(?:este|esse)\s+ano|ano\s+atual)\b', _ano_relativo(0, 'neste ano')),
+    (r'\b(' + '|'.join(MESES) + r')\b(?:\s+(?:de\s+)?(\d{4}))?', _mes_nomeado),
+    (r'\b(?:em|de|no\s+ano\s+de)\s+((?:19|20)\d\d)\b', _ano)
+)]
+
+
+def interpretar_periodo(texto_normalizado, agora=None):
+    """Primeiro período reconhecido no texto (já normalizado), ou None"""
+    agora = agora or datetime.now()
+    for padrao, periodo in _PADROES_PERIODO:
+        match = padrao.search(texto_normalizado)
+        if match:
+            return periodo(match, agora)
+    return None
+
+
+def meses_inteiros(periodo):
+    """Meses (AAAA-MM) cobertos pelo período, se ele for formado por meses inteiros"""
+    if periodo is None:
+        return None
+    inicio, fim = periodo.inicio, periodo.fim
+    if inicio != datetime(inicio.year, inicio.month, 1) or fim != datetime(fim.year, fim.month, 1):
+        return None
+    meses = []
+    while inicio < fim:
+        meses.append(inicio.strftime('%Y-%m'))
+        inicio = _somar_meses(inicio, 1)
+    return meses
+
+
+# Índice de termos
+
+class IndiceTermos:
+    """Expressões (sequências de palavras) indexadas pela primeira palavra"""
+
+    def __init__(self):
+        self._por_palavra = {}
+
+    def adicionar(self, expressao, valor, ignorar=frozenset()):
+        chave = tuple(palavras(expressao))
+        if not chave or (len(chave) == 1 and chave[0] in ignorar):
+            return
+        candidatos = self._por_palavra.setdefault(chave[0], [])
+        candidatos.append((chave, valor))
+        # Expressões mais longas primeiro: "margem de lucro" antes de "margem"
+        candidatos.sort(key=lambda candidato: -len(candidato[0]))
+
+    def encontrar(self, tokens):
+        """Lista de (posição, tamanho, valor) das expressões encontradas, sem sobreposição"""
+        encontrados = []
+        posicao = 0
+        while posicao < len(tokens):
+            for chave, valor in self._por_palavra.get(tokens[posicao], ()):
+                if tuple(tokens[posicao:posicao + len(chave)]) == chave:
+                    encontrados.append((posicao, len(chave), valor))
+                    posicao += len(chave)
+                    break
+            else:
+                posicao += 1
+        return encontrados
+
+
+# Respostas
+
+def _moeda(valor):
+    return f'R$ {valor or 0:.2f}'
+
+
+def _contexto(consulta):
+    partes = []
+    if consulta.cliente:
+        partes.append(f'do cliente {consulta.cliente[1]}')
+    if consulta.servico:
+        partes.append(f'de {consulta.servico}')
+    if consulta.periodo:
+        partes.append(consulta.periodo.descricao)
+    return (' ' + ' '.join(partes)) if partes else ''
+
+
+def _filtrar_pedidos(query, consulta, coluna_data=Pedido.data_pedido):
+    if consulta.cliente:
+        query = query.filter(Pedido.cliente_id == consulta.cliente[0])
+    if consulta.servico:
+        query = query.filter(Pedido.tipo_servico == consulta.servico)
+    if consulta.periodo:
+        query = query.filter(coluna_data >= consulta.periodo.inicio, coluna_data < consulta.periodo.fim)
+    return query
+
+
+def _filtrar_transacoes(query, consulta):
+    if consulta.cliente or consulta.servico:
+        query = query.join(Pedido, TransacaoFinanceira.pedido_id == Pedido.id)
+        query = _filtrar_pedidos(query, consulta._replace(periodo=None))
+    if consulta.periodo:
+        query = query.filter(
+            TransacaoFinanceira.data >= consulta.periodo.inicio,
+            TransacaoFinanceira.data < consulta.periodo.fim
+        )
+    return query
+
+
+def _usa_resumo(consulta):
+    """Meses do período quando o total pode vir dos resumos mensais"""
+    if consulta.cliente or consulta.servico:
+        return None
+    return meses_inteiros(consulta.periodo)
+
+
+def _total_transacoes(consulta, tipo):
+    meses = _usa_resumo(consulta)
+    if meses:
+        return sum(serie_financeira(meses)[tipo])
+    return _filtrar_transacoes(
+        db.session.query(db.func.sum(TransacaoFinanceira.valor)).filter(TransacaoFinanceira.tipo == tipo),
+        consulta
+    ).scalar() or 0
+
+
+def responder_faturamento(consulta):
+    meses = _usa_resumo(consulta)
+    if meses:
+        faturamento = sum(serie_pedidos(meses, status='Concluído')['valor'])
+    else:
+        faturamento = _filtrar_pedidos(
+            db.session.query(db.func.sum(Pedido.valor)).filter(Pedido.status == 'Concluído'), consulta
+        ).scalar() or 0
+    return f'O faturamento{_contexto(consulta)} é de {_moeda(faturamento)}.'
+
+
+def responder_despesas(consulta):
+    despesas = _total_transacoes(consulta, 'Despesa')
+    return f'As despesas{_contexto(consulta)} somam {_moeda(despesas)}.'
+
+
+def responder_lucro(consulta):
+    receitas = _total_transacoes(consulta, 'Receita')
+    despesas = _total_transacoes(consulta, 'Despesa')
+    return (f'O saldo{_contexto(consulta)} é de {_moeda(receitas - despesas)} '
+            f'({_moeda(receitas)} em receitas e {_moeda(despesas)} em despesas).')
+
+
+def responder_a_receber(consulta):
+    return _responder_em_aberto(consulta, 'Receita', 'a receber')
+
+
+def responder_a_pagar(consulta):
+    return _responder_em_aberto(consulta, 'Despesa', 'a pagar')
+
+
+def _responder_em_aberto(consulta, tipo, rotulo):
+    quantidade, total = _filtrar_transacoes(
+        db.session.query(db.func.count(TransacaoFinanceira.id), db.func.sum(TransacaoFinanceira.valor)).filter(
+            TransacaoFinanceira.tipo == tipo,
+            TransacaoFinanceira.status.in_(STATUS_EM_ABERTO)
+        ),
+        consulta
+    ).one()
+    return f'Há {quantidade} lançamentos {rotulo}{_contexto(consulta)}, somando {_moeda(total)}.'
+
+
+def responder_clientes(consulta):
+    if consulta.cliente:
+        return responder_resumo_cliente(consulta)
+
+    if consulta.servico:
+        quantidade = _filtrar_pedidos(
+            db.session.query(db.func.count(db.distinct(Pedido.cliente_id))), consulta
+        ).scalar()
+        return f'{quantidade} clientes fizeram pedidos{_contexto(consulta)}.'
+
+    if consulta.periodo:
+        novos = Cliente.query.filter(
+            Cliente.data_cadastro >= consulta.periodo.inicio,
+            Cliente.data_cadastro < consulta.periodo.fim
+        ).count()
+        return f'{novos} clientes foram cadastrados {consulta.periodo.descricao}.'
+
+    total, ativos = db.session.query(
+        db.func.count(Cliente.id),
+        db.func.count(db.case((Cliente.status == 'Ativo', 1)))
+    ).one()
+    return f'Você tem {total} clientes cadastrados, sendo {ativos} ativos.'
+
+
+def responder_pedidos(consulta):
+    total, andamento, valor = _filtrar_pedidos(
+        db.session.query(
+            db.func.count(Pedido.id),
+            db.func.count(db.case((Pedido.status.in_(STATUS_EM_ANDAMENTO), 1))),
+            db.func.sum(Pedido.valor)
+        ),
+        consulta
+    ).one()
+    return (f'Existem {total} pedidos{_contexto(consulta)}, com {andamento} em andamento, '
+            f'somando {_moeda(valor)}.')
+
+
+def responder_atrasos(consulta):
+    atrasados, valor = _filtrar_pedidos(
+        db.session.query(db.func.count(Pedido.id), db.func.sum(Pedido.valor)).filter(
+            Pedido.data_entrega < datetime.utcnow(),
+            Pedido.status != 'Concluído'
+        ),
+        consulta,
+        coluna_data=Pedido.data_entrega
+    ).one()
+    if not atrasados:
+        return f'Não há pedidos atrasados{_contexto(consulta)} no momento.'
+    return f'Há {atrasados} pedidos atrasados{_contexto(consulta)} no momento, somando {_moeda(valor)}.'
+
+
+def responder_ticket_medio(consulta):
+    quantidade, media = _filtrar_pedidos(
+        db.session.query(db.func.count(Pedido.id), db.func.avg(Pedido.valor)).filter(
+            Pedido.valor > 0,
+            Pedido.status != 'Cancelado'
+        ),
+        consulta
+    ).one()
+    if not quantidade:
+        return f'Não há pedidos com valor{_contexto(consulta)} para calcular o ticket médio.'
+    return f'O ticket médio{_contexto(consulta)} é de {_moeda(media)} em {quantidade} pedidos.'
+
+
+def responder_margem(consulta):
+    margem = (Pedido.valor - db.func.coalesce(Pedido.custo, 0)) / Pedido.valor * 100
+    quantidade, media = _filtrar_pedidos(
+        db.session.query(db.func.count(Pedido.id), db.func.avg(margem)).filter(
+            Pedido.status == 'Concluído',
+            Pedido.valor > 0
+        ),
+        consulta
+    ).one()
+    if not quantidade:
+        return f'Não há pedidos concluídos{_contexto(consulta)} para calcular a margem.'
+    return f'A margem média{_contexto(consulta)} é de {media:.1f}% em {quantidade} pedidos concluídos.'
+
+
+def responder_resumo_cliente(consulta):
+    total, concluido, valor = _filtrar_pedidos(
+        db.session.query(
+            db.func.count(Pedido.id),
+            db.func.sum(db.case((Pedido.status == 'Concluído', Pedido.valor))),
+            db.func.sum(Pedido.valor)
+        ),
+        consulta
+    ).one()
+    return (f'Foram {total} pedidos{_contexto(consulta)}, somando {_moeda(valor)}, '
+            f'dos quais {_moeda(concluido)} já concluídos.')
+
+
+_TABELAS_PEDIDOS = ('pedido', 'cliente', 'resumo_mensal_pedido')
+_TABELAS_FINANCEIRO = ('transacao_financeira', 'pedido', 'cliente', 'resumo_mensal_financeiro')
+
+_MES_ATUAL = _mes_relativo(0, 'neste mês')
+
+# Em caso de empate entre intenções, vale a que vem primeiro na lista
+INTENCOES = [
+    Intencao('ticket_medio', ('ticket medio', 'ticket', 'valor medio', 'media por pedido'),
+             _TABELAS_PEDIDOS, responder_ticket_medio, None),
+    Intencao('margem', ('margem', 'margens', 'margem de lucro', 'lucratividade', 'rentabilidade'),
+             _TABELAS_PEDIDOS, responder_margem, None),
+    Intencao('a_receber', ('a receber', 'receber', 'contas a receber', 'inadimplencia', 'inadimplentes',
+                           'em aberto'),
+             _TABELAS_FINANCEIRO, responder_a_receber, None),
+    Intencao('a_pagar', ('a pagar', 'pagar', 'contas a pagar', 'boletos'),
+             _TABELAS_FINANCEIRO, responder_a_pagar, None),
+    Intencao('atrasos', ('atraso', 'atrasos', 'atrasado', 'atrasados', 'atrasada', 'atrasadas',
+                         'vencido', 'vencidos', 'prazo', 'prazos'),
+             _TABELAS_PEDIDOS, responder_atrasos, None),
+    Intencao('lucro', ('lucro', 'lucros', 'lucrei', 'lucramos', 'saldo', 'resultado', 'sobrou'),
+             _TABELAS_FINANCEIRO, responder_lucro, _MES_ATUAL),
+    Intencao('despesas', ('despesa', 'despesas', 'gasto', 'gastos', 'gastei', 'gastamos', 'custo', 'custos',
+                          'paguei', 'pagamos'),
+             _TABELAS_FINANCEIRO, responder_despesas, _MES_ATUAL),
+    Intencao('faturamento', ('faturamento', 'faturei', 'faturamos', 'faturou', 'faturado', 'receita',
+                             'receitas', 'vendas', 'vendi', 'vendemos', 'ganhei', 'ganhamos'),
+             _TABELAS_PEDIDOS, responder_faturamento, _MES_ATUAL),
+    Intencao('clientes', ('cliente', 'clientes', 'carteira'),
+             _TABELAS_PEDIDOS, responder_clientes, None),
+    Intencao('pedidos', ('pedido', 'pedidos', 'projeto', 'projetos', 'trabalho', 'trabalhos', 'job', 'jobs',
+                         'servico', 'servicos'),
+             _TABELAS_PEDIDOS, responder_pedidos, None),
+]
+
+_RESUMO_CLIENTE = Intencao('resumo_cliente', (), _TABELAS_PEDIDOS, responder_resumo_cliente, None)
+
+_ORDEM = {intencao.nome: posicao for posicao, intencao in enumerate(INTENCOES)}
+
+_INDICE = IndiceTermos()
+for _intencao in INTENCOES:
+    for _termo in _intencao.termos:
+        _INDICE.adicionar(_termo, _intencao)
+
+MENSAGEM_NAO_ENTENDIDA = (
+    'Desculpe, não entendi sua pergunta. Tente perguntar sobre faturamento, despesas, saldo, '
+    'contas a receber ou a pagar, clientes, pedidos, atrasos, ticket médio ou margem '
+    '(por exemplo: "faturamento do mês passado" ou "pedidos de Social Media nos últimos 90 dias").'
+)
+
+
+# Clientes e serviços
+
+_catalogo = None
+_lock = threading.Lock()
+
+
+def _montar_catalogo():
+    clientes = IndiceTermos()
+    for cliente_id, nome in db.session.query(Cliente.id, Cliente.nome):
+        clientes.adicionar(nome, (cliente_id, nome), PALAVRAS_VAZIAS)
+
+    servicos = IndiceTermos()
+    nomes = set(SERVICOS_PADRAO)
+    nomes.update(tipo for (tipo,) in db.session.query(Pedido.tipo_servico).distinct() if tipo)
+    for nome in nomes:
+        servicos.adicionar(nome, nome, PALAVRAS_VAZIAS)
+        # "social" também identifica "Social Media"
+        termos = palavras(nome)
+        if len(termos) > 1:
+            servicos.adicionar(termos[0], nome, PALAVRAS_VAZIAS)
+    return clientes, servicos
+
+
+def obter_catalogo():
+    """(índice de clientes, índice de serviços), refeito quando clientes ou pedidos mudam"""
+    global _catalogo
+
+    backend = obter_backend()
+    versoes = backend.versoes(['cliente', 'pedido']) if backend is not None else None
+    chave = (versoes, int(time.time() // TTL_PADRAO))
+
+    with _lock:
+        catalogo = _catalogo
+    if catalogo is not None and catalogo[0] == chave:
+        return catalogo[1]
+
+    indices = _montar_catalogo()
+    with _lock:
+        _catalogo = (chave, indices)
+    return indices
+
+
+# Interpretação
+
+def interpretar(pergunta, agora=None):
+    """Reconhece intenção, período, cliente e serviço; retorna uma Consulta ou None"""
+    texto = normalizar(pergunta)
+    tokens = re.findall(r'\w+', texto)
+    indice_clientes, indice_servicos = obter_catalogo()
+
+    # Cliente e serviço primeiro: as palavras do nome (e um "cliente" logo
+    # antes dele) não contam como termos de intenção
+    consumidas = set()
+    cliente = servico = None
+    for posicao, tamanho, valor in indice_clientes.encontrar(tokens):
+        if cliente is None:
+            cliente = valor
+            inicio = posicao - 1 if posicao and tokens[posicao - 1] in ('cliente', 'clientes') else posicao
+            consumidas.update(range(inicio, posicao + tamanho))
+    restantes = [token if i not in consumidas else '' for i, token in enumerate(tokens)]
+    for posicao, tamanho, valor in indice_servicos.encontrar(restantes):
+        if servico is None:
+            servico = valor
+            consumidas.update(range(posicao, posicao + tamanho))
+    restantes = [token if i not in consumidas else '' for i, token in enumerate(tokens)]
+
+    pontuacao = {}
+    for _, tamanho, intencao in _INDICE.encontrar(restantes):
+        pontuacao[intencao] = pontuacao.get(intencao, 0) + tamanho
+
+    if pontuacao:
+        intencao = max(pontuacao, key=lambda i: (pontuacao[i], -_ORDEM[i.nome]))
+    elif cliente:
+        intencao = _RESUMO_CLIENTE
+    elif servico:
+        intencao = INTENCOES[_ORDEM['pedidos']]
+    else:
+        return None
+
+    # Sem os nomes reconhecidos: "Padaria Maio" não é o mês de maio
+    agora = agora or datetime.now()
+    periodo = interpretar_periodo(' '.join(restantes), agora)
+    if periodo is None and intencao.periodo_padrao:
+        periodo = intencao.periodo_padrao(None, agora)
+
+    return Consulta(intencao, periodo, cliente, servico)
+
+
+def _chave_cache(consulta, backend):
+    periodo = consulta.periodo
+    return 'pergunta:' + hashlib.sha1(json.dumps([
+        consulta.intencao.nome,
+        [periodo.inicio, periodo.fim, periodo.descricao] if periodo else None,
+        consulta.cliente,
+        consulta.servico,
+        backend.epoca(),
+        backend.versoes(list(consulta.intencao.tabelas))
+    ], default=str).encode()).hexdigest()
+
+
+def processar_pergunta(pergunta):
+    """Responde uma pergunta em linguagem natural com uma consulta agregada"""
+    consulta = interpretar(pergunta)
+    if consulta is None:
+        return MENSAGEM_NAO_ENTENDIDA
+
+    backend = obter_backend()
+    if backend is None:
+        return consulta.intencao.responder(consulta)
+
+    chave = _chave_cache(consulta, backend)
+    dados = backend.obter(chave)
+    if dados is not None:
+        return dados.decode()
+
+    resposta = consulta.intencao.responder(consulta)
+    backend.gravar(chave, resposta.encode(), TTL_RESPOSTAS)
+    return resposta
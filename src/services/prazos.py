@@ -0,0 +1,80 @@
+from src.models.user import db
+from src.models.cliente import Cliente
+from src.models.pedido import Pedido
+from src.models.demanda_social import DemandaSocialMedia
+from src.models.prazo import STATUS_PRAZO
+from datetime import datetime, timedelta
+import heapq
+
+# Quadro de prazos: pedidos e demandas pendentes que vencem nos próximos dias
+# (e os já atrasados), em ordem de data de entrega.
+#
+# Cada tabela é lida pelo índice (data_entrega, status) com ORDER BY e LIMIT
+# no banco; as duas listas, já ordenadas, são intercaladas aqui.
+
+# tipo -> (nome do item, modelo, título exibido)
+FONTES = {
+    'pedidos': ('pedido', Pedido, Pedido.id_pedido + ' - ' + Pedido.tipo_servico),
+    'demandas': ('demanda', DemandaSocialMedia, DemandaSocialMedia.demanda)
+}
+
+
+def _itens(tipo, vence_ate, limite):
+    item, modelo, titulo = FONTES[tipo]
+    linhas = db.session.query(
+        modelo.id,
+        titulo.label('titulo'),
+        modelo.data_entrega,
+        modelo.status,
+        modelo.prioridade,
+        modelo.status_prazo.label('status_prazo'),
+        Cliente.nome.label('cliente_nome')
+    ).outerjoin(Cliente, modelo.cliente_id == Cliente.id).filter(
+        modelo.filtro_vence_ate(vence_ate)
+    ).order_by(modelo.data_entrega, modelo.id).limit(limite)
+
+    agora = datetime.utcnow()
+    return [
+        {
+            'tipo': item,
+            'id': linha.id,
+            'titulo': linha.titulo,
+            'cliente_nome': linha.cliente_nome,
+            'data_entrega': linha.data_entrega,
+            'dias_para_entrega': (linha.data_entrega - agora).days,
+            'status': linha.status,
+            'prioridade': linha.prioridade,
+            'status_prazo': linha.status_prazo
+        }
+        for linha in linhas
+    ]
+
+
+def _totais(tipo, vence_ate):
+    _, modelo, _ = FONTES[tipo]
+    # A mesma expressão no SELECT e no GROUP BY (cada acesso gera um novo "agora")
+    status_prazo = modelo.status_prazo
+    return db.session.query(status_prazo, db.func.count(modelo.id)).filter(
+        modelo.filtro_vence_ate(vence_ate)
+    ).group_by(status_prazo).all()
+
+
+def quadro_prazos(dias=7, limite=50, tipos=tuple(FONTES)):
+    """Itens pendentes com entrega em até `dias` dias (e atrasados), por data de entrega"""
+    vence_ate = datetime.utcnow() + timedelta(days=dias)
+
+    listas = [_itens(tipo, vence_ate, limite) for tipo in tipos]
+    itens = list(heapq.merge(*listas, key=lambda item: item['data_entrega']))[:limite]
+    for item in itens:
+        item['data_entrega'] = item['data_entrega'].isoformat()
+
+    totais = dict.fromkeys(STATUS_PRAZO, 0)
+    for tipo in tipos:
+        for status_prazo, quantidade in _totais(tipo, vence_ate):
+            totais[status_prazo] += quantidade
+
+    return {
+        'dias': dias,
+        'itens': itens,
+        'totais': totais
+    }
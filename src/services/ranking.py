@@ -0,0 +1,63 @@
+from src.models.user import db
+from src.models.cliente import Cliente
+from src.models.pedido import Pedido
+
+# Ranking de clientes calculado no banco (GROUP BY / ORDER BY / LIMIT),
+# sem carregar os pedidos de cada cliente em memória.
+
+CRITERIOS_RANKING = ('valor_total', 'qtd_pedidos', 'ticket_medio')
+
+
+def _agregados_pedidos():
+    valor_total = db.func.coalesce(db.func.sum(Pedido.valor), 0)
+    qtd_pedidos = db.func.count(Pedido.id)
+    ticket_medio = db.case((qtd_pedidos > 0, valor_total * 1.0 / qtd_pedidos), else_=0)
+    return {
+        'valor_total': valor_total.label('valor_total'),
+        'qtd_pedidos': qtd_pedidos.label('qtd_pedidos'),
+        'ticket_medio': ticket_medio.label('ticket_medio')
+    }
+
+
+def ranking_clientes(criterio='valor_total', limite=5, status=None):
+    """Retorna os clientes ordenados pelo critério, como tuplas
+    (cliente, valor_total, qtd_pedidos, ticket_medio)"""
+    if criterio not in CRITERIOS_RANKING:
+        raise ValueError(f'Critério de ranking inválido: {criterio}')
+
+    agregados = _agregados_pedidos()
+    query = db.session.query(
+        Cliente,
+        agregados['valor_total'],
+        agregados['qtd_pedidos'],
+        agregados['ticket_medio']
+    ).outerjoin(Pedido, Pedido.cliente_id == Cliente.id)
+
+    if status:
+        query = query.filter(Cliente.status == status)
+
+    query = query.group_by(Cliente.id).order_by(agregados[criterio].desc(), Cliente.id)
+
+    if limite:
+        query = query.limit(limite)
+
+    ranking = query.all()
+    for cliente, valor_total, qtd_pedidos, _ in ranking:
+        cliente.definir_agregados(valor_total, qtd_pedidos)
+    return ranking
+
+
+def contar_clientes_por_qtd_pedidos(qtd_pedidos, status=None):
+    """Conta os clientes que têm exatamente qtd_pedidos pedidos"""
+    if qtd_pedidos == 0:
+        query = Cliente.query.filter(~Cliente.pedidos.any())
+    else:
+        com_qtd = db.session.query(Pedido.cliente_id).group_by(Pedido.cliente_id).having(
+            db.func.count(Pedido.id) == qtd_pedidos
+        )
+        query = Cliente.query.filter(Cliente.id.in_(com_qtd))
+
+    if status:
+        query = query.filter(Cliente.status == status)
+
+    return query.count()
@@ -0,0 +1,289 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.pedido import Pedido
+from src.models.financeiro import TransacaoFinanceira
+from src.models.resumo_mensal import ResumoMensalFinanceiro, ResumoMensalPedido
+from datetime import datetime
+
+# Resumos mensais mantidos incrementalmente: cada insert/update/delete de
+# TransacaoFinanceira ou Pedido feito pela sessão aplica o delta correspondente
+# nas tabelas de resumo, dentro da mesma transação.
+
+# modelo -> (resumo, campos do modelo que alimentam o resumo)
+_FONTES = {
+    TransacaoFinanceira: (ResumoMensalFinanceiro, ('data', 'tipo', 'categoria', 'valor')),
+    Pedido: (ResumoMensalPedido, ('data_pedido', 'status', 'valor', 'custo'))
+}
+
+# resumo -> colunas que identificam a linha do resumo
+_CHAVES = {
+    ResumoMensalFinanceiro: ('mes', 'tipo', 'categoria'),
+    ResumoMensalPedido: ('mes', 'status')
+}
+
+_CHAVE_SESSAO = 'resumo_mensal_deltas'
+
+
+def mes_referencia(data):
+    """Retorna o mês (AAAA-MM) de uma data"""
+    return data.strftime('%Y-%m') if data else None
+
+
+def ultimos_meses(qtd_meses, referencia=None):
+    """Retorna os últimos meses de calendário (AAAA-MM), do mais antigo ao atual"""
+    referencia = referencia or datetime.now()
+    ano, mes = referencia.year, referencia.month
+    meses = []
+    for _ in range(qtd_meses):
+        meses.insert(0, f'{ano:04d}-{mes:02d}')
+        ano, mes = (ano - 1, 12) if mes == 1 else (ano, mes - 1)
+    return meses
+
+
+def _contribuicao(modelo, valores):
+    """Converte os campos de um registro em (resumo, chave, medidas)"""
+    mes = mes_referencia(valores['data'] if modelo is TransacaoFinanceira else valores['data_pedido'])
+    if mes is None:
+        return None
+
+    if modelo is TransacaoFinanceira:
+        if not valores['tipo'] or not valores['categoria']:
+            return None
+        chave = (mes, valores['tipo'], valores['categoria'])
+        medidas = {'total': valores['valor'] or 0, 'quantidade': 1}
+    else:
+        if not valores['status']:
+            return None
+        chave = (mes, valores['status'])
+        medidas = {'total_valor': valores['valor'] or 0, 'total_custo': valores['custo'] or 0, 'quantidade': 1}
+
+    return _FONTES[modelo][0], chave, medidas
+
+
+def _acumular(deltas, modelo, valores, sinal):
+    contribuicao = _contribuicao(modelo, valores)
+    if contribuicao is None:
+        return
+    resumo, chave, medidas = contribuicao
+    acumulado = deltas.setdefault((resumo, chave), dict.fromkeys(medidas, 0))
+    for medida, valor in medidas.items():
+        acumulado[medida] += sinal * valor
+
+
+def _valores_anteriores(obj, campos):
+    estado = inspect(obj)
+    valores = {}
+    for campo in campos:
+        historico = estado.attrs[campo].history
+        if historico.deleted:
+            valores[campo] = historico.deleted[0]
+        elif historico.unchanged:
+            valores[campo] = historico.unchanged[0]
+        else:
+            valores[campo] = None
+    return valores
+
+
+def _valores_atuais(obj, campos):
+    return {campo: getattr(obj, campo) for campo in campos}
+
+
+_INSERT_UPSERT = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def aplicar_deltas(conexao, deltas):
+    """Aplica deltas {(resumo, chave): {medida: delta}} nas tabelas de resumo"""
+    for (resumo, chave), medidas in deltas.items():
+        if not any(abs(valor) > 1e-9 for valor in medidas.values()):
+            continue
+
+        tabela = resumo.__table__
+        colunas_chave = _CHAVES[resumo]
+        valores_chave = dict(zip(colunas_chave, chave))
+
+        construtor_insert = _INSERT_UPSERT.get(conexao.dialect.name)
+
+        if construtor_insert is not None:
+            stmt = construtor_insert(tabela).values(**valores_chave, **medidas)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(colunas_chave),
+                set_={medida: tabela.c[medida] + stmt.excluded[medida] for medida in medidas}
+            )
+            conexao.execute(stmt)
+        else:
+            filtro = db.and_(*[tabela.c[coluna] == valor for coluna, valor in valores_chave.items()])
+            resultado = conexao.execute(
+                tabela.update().where(filtro).values({m: tabela.c[m] + v for m, v in medidas.items()})
+            )
+            if resultado.rowcount == 0:
+                conexao.execute(tabela.insert().values(**valores_chave, **medidas))
+
+
+def registrar_linhas(conexao, modelo, linhas, sinal=1):
+    """Atualiza os resumos para linhas gravadas fora da sessão (inserts/updates em lote).
+
+    `linhas` são dicionários com os campos de origem do modelo; use sinal=-1
+    para retirar a contribuição de linhas removidas ou com valores antigos.
+    """
+    campos = _FONTES[modelo][1]
+    deltas = {}
+    for linha in linhas:
+        _acumular(deltas, modelo, {campo: linha.get(campo) for campo in campos}, sinal)
+    aplicar_deltas(conexao, deltas)
+
+
+def registrar_alteracoes(conexao, modelo, anteriores, atuais):
+    """Atualiza os resumos para linhas alteradas fora da sessão (updates em lote).
+
+    `anteriores` e `atuais` são os campos de origem de cada linha antes e
+    depois da alteração; contribuições que não mudaram se anulam.
+    """
+    campos = _FONTES[modelo][1]
+    deltas = {}
+    for linha in anteriores:
+        _acumular(deltas, modelo, {campo: linha.get(campo) for campo in campos}, -1)
+    for linha in atuais:
+        _acumular(deltas, modelo, {campo: linha.get(campo) for campo in campos}, 1)
+    aplicar_deltas(conexao, deltas)
+
+
+def campos_resumidos(modelo):
+    """Campos do modelo que alimentam os resumos mensais (vazio se não há resumo)"""
+    return _FONTES[modelo][1] if modelo in _FONTES else ()
+
+
+@event.listens_for(Session, 'before_flush')
+def _capturar_valores_anteriores(session, flush_context, instances):
+    deltas = session.info.setdefault(_CHAVE_SESSAO, {})
+    for obj in list(session.dirty) + list(session.deleted):
+        modelo = type(obj)
+        if modelo not in _FONTES:
+            continue
+        if obj in session.deleted or session.is_modified(obj):
+            _acumular(deltas, modelo, _valores_anteriores(obj, _FONTES[modelo][1]), -1)
+
+
+@event.listens_for(Session, 'after_flush')
+def _aplicar_valores_novos(session, flush_context):
+    deltas = session.info.pop(_CHAVE_SESSAO, {})
+    for obj in list(session.new) + list(session.dirty):
+        modelo = type(obj)
+        if modelo not in _FONTES:
+            continue
+        if obj in session.new or session.is_modified(obj):
+            _acumular(deltas, modelo, _valores_atuais(obj, _FONTES[modelo][1]), 1)
+
+    if deltas:
+        aplicar_deltas(session.connection(), deltas)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_deltas(session):
+    session.info.pop(_CHAVE_SESSAO, None)
+
+
+def _historico_ativo(*args):
+    pass
+
+
+# Garante que o valor anterior seja carregado ao alterar um campo expirado,
+# para que o delta negativo do update seja sempre conhecido
+for _modelo, (_, _campos) in _FONTES.items():
+    for _campo in _campos:
+        event.listen(getattr(_modelo, _campo), 'set', _historico_ativo, active_history=True)
+
+
+def _expressao_mes(coluna):
+    dialeto = db.engine.dialect.name
+    if dialeto == 'postgresql':
+        return db.func.to_char(coluna, 'YYYY-MM')
+    if dialeto == 'mysql':
+        return db.func.date_format(coluna, '%Y-%m')
+    return db.func.strftime('%Y-%m', coluna)
+
+
+def reconstruir_resumos():
+    """Recalcula do zero todos os resumos mensais a partir das tabelas de origem"""
+    db.session.query(ResumoMensalFinanceiro).delete()
+    db.session.query(ResumoMensalPedido).delete()
+
+    mes = _expressao_mes(TransacaoFinanceira.data)
+    db.session.execute(
+        ResumoMensalFinanceiro.__table__.insert().from_select(
+            ['mes', 'tipo', 'categoria', 'total', 'quantidade'],
+            db.select(
+                mes,
+                TransacaoFinanceira.tipo,
+                TransacaoFinanceira.categoria,
+                db.func.coalesce(db.func.sum(TransacaoFinanceira.valor), 0),
+                db.func.count(TransacaoFinanceira.id)
+            ).where(TransacaoFinanceira.data.isnot(None)).group_by(
+                mes, TransacaoFinanceira.tipo, TransacaoFinanceira.categoria
+            )
+        )
+    )
+
+    mes = _expressao_mes(Pedido.data_pedido)
+    db.session.execute(
+        ResumoMensalPedido.__table__.insert().from_select(
+            ['mes', 'status', 'total_valor', 'total_custo', 'quantidade'],
+            db.select(
+                mes,
+                Pedido.status,
+                db.func.coalesce(db.func.sum(Pedido.valor), 0),
+                db.func.coalesce(db.func.sum(Pedido.custo), 0),
+                db.func.count(Pedido.id)
+            ).where(Pedido.data_pedido.isnot(None)).group_by(mes, Pedido.status)
+        )
+    )
+    db.session.commit()
+
+
+def resumos_vazios():
+    """Indica se os resumos ainda não foram gerados para uma base com dados"""
+    if ResumoMensalFinanceiro.query.first() or ResumoMensalPedido.query.first():
+        return False
+    return bool(TransacaoFinanceira.query.first() or Pedido.query.first())
+
+
+def serie_financeira(meses):
+    """Totais de receitas e despesas por mês, em uma leitura do resumo"""
+    linhas = db.session.query(
+        ResumoMensalFinanceiro.mes,
+        ResumoMensalFinanceiro.tipo,
+        db.func.sum(ResumoMensalFinanceiro.total)
+    ).filter(
+        ResumoMensalFinanceiro.mes >= meses[0],
+        ResumoMensalFinanceiro.mes <= meses[-1]
+    ).group_by(ResumoMensalFinanceiro.mes, ResumoMensalFinanceiro.tipo).all()
+
+    totais = {(mes, tipo): total for mes, tipo, total in linhas}
+    return {
+        tipo: [totais.get((mes, tipo)) or 0 for mes in meses]
+        for tipo in ('Receita', 'Despesa')
+    }
+
+
+def serie_pedidos(meses, status=None):
+    """Valor, custo e quantidade de pedidos por mês, em uma leitura do resumo"""
+    query = db.session.query(
+        ResumoMensalPedido.mes,
+        db.func.sum(ResumoMensalPedido.total_valor),
+        db.func.sum(ResumoMensalPedido.total_custo),
+        db.func.sum(ResumoMensalPedido.quantidade)
+    ).filter(
+        ResumoMensalPedido.mes >= meses[0],
+        ResumoMensalPedido.mes <= meses[-1]
+    )
+    if status:
+        query = query.filter(ResumoMensalPedido.status == status)
+
+    por_mes = {mes: (valor, custo, qtd) for mes, valor, custo, qtd in query.group_by(ResumoMensalPedido.mes)}
+    vazio = (0, 0, 0)
+    return {
+        'valor': [por_mes.get(mes, vazio)[0] or 0 for mes in meses],
+        'custo': [por_mes.get(mes, vazio)[1] or 0 for mes in meses],
+        'quantidade': [por_mes.get(mes, vazio)[2] or 0 for mes in meses]
+    }
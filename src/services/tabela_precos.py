@@ -0,0 +1,173 @@
+from src.models.user import db
+from src.models.tabela_preco import TabelaPreco
+from src.services.busca import indexar_busca
+from src.services.validacao import ErroValidacao, valores_tabela_preco
+from src.utils.cache import marcar_tabelas_alteradas
+from src.utils.planilhas import FormatoInvalido
+from datetime import datetime
+import re
+import unicodedata
+
+# Importação das planilhas de preços enviadas pelos fornecedores.
+#
+# As colunas da planilha são reconhecidas pelos nomes usuais (ver
+# _ALIASES_COLUNAS) e cada linha vira um item da TabelaPreco identificado por
+# (fornecedor_id, produto_servico). A planilha é lida em lotes: cada lote
+# consulta os itens existentes de uma vez, insere os novos e atualiza só os
+# que mudaram (com executemany), então o uso de memória depende do tamanho do
+# lote e não do tamanho da planilha. Toda a planilha é gravada em uma única
+# transação: se a leitura falhar no meio, nada é alterado.
+
+TAMANHO_LOTE = 1000
+
+_ALIASES_COLUNAS = {
+    'produto_servico': (
+        'produto_servico', 'produto', 'servico', 'produto_ou_servico', 'item', 'nome', 'material'
+    ),
+    'categoria': ('categoria', 'grupo', 'linha'),
+    'descricao': ('descricao', 'detalhes', 'especificacao', 'observacao'),
+    'unidade': ('unidade', 'un', 'und', 'unid', 'medida'),
+    'preco_custo': (
+        'preco_custo', 'preco', 'custo', 'valor', 'preco_unitario', 'valor_unitario', 'preco_de_custo'
+    ),
+    'markup': ('markup',)
+}
+
+# Campos comparados para decidir se um item existente mudou
+_CAMPOS_COMPARADOS = ('categoria', 'descricao', 'unidade', 'preco_custo', 'markup')
+
+
+def _normalizar(nome):
+    sem_acento = unicodedata.normalize('NFKD', nome).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', '_', sem_acento.lower()).strip('_')
+
+
+def mapear_colunas(cabecalho):
+    """Associa as colunas da planilha aos campos da TabelaPreco ({coluna: campo})"""
+    aliases = {alias: campo for campo, nomes in _ALIASES_COLUNAS.items() for alias in nomes}
+    mapeamento = {}
+    for coluna in cabecalho:
+        campo = aliases.get(_normalizar(coluna))
+        if campo and campo not in mapeamento.values():
+            mapeamento[coluna] = campo
+    return mapeamento
+
+
+class _ImportacaoTabelaPrecos:
+
+    def __init__(self, fornecedor_id, padroes):
+        self.fornecedor_id = fornecedor_id
+        self.padroes = {campo: valor for campo, valor in padroes.items() if valor}
+        self.agora = datetime.utcnow()
+        self.mapeamento = None
+        self.campos = ()
+        self.resumo = {'total_linhas': 0, 'novos': 0, 'alterados': 0, 'inalterados': 0}
+        self.erros = []
+
+    def _preparar(self, cabecalho):
+        self.mapeamento = mapear_colunas(cabecalho)
+        if 'produto_servico' not in self.mapeamento.values():
+            raise FormatoInvalido('A planilha não tem coluna de produto/serviço')
+        if 'preco_custo' not in self.mapeamento.values():
+            raise FormatoInvalido('A planilha não tem coluna de preço')
+        # Só os campos que vieram na planilha são comparados e atualizados; os
+        # valores padrão completam apenas os itens novos e as células vazias
+        presentes = set(self.mapeamento.values())
+        self.campos = tuple(campo for campo in _CAMPOS_COMPARADOS if campo in presentes)
+
+    def _valores(self, registro):
+        dados = dict(self.padroes)
+        for coluna, campo in self.mapeamento.items():
+            if registro.get(coluna) is not None:
+                dados[campo] = str(registro[coluna]) if campo == 'produto_servico' else registro[coluna]
+        dados['fornecedor_id'] = self.fornecedor_id
+        return valores_tabela_preco(dados)
+
+    def _gravar(self, lote):
+        tabela = TabelaPreco.__table__
+        existentes = {}
+        for linha in db.session.execute(
+            db.select(tabela.c.produto_servico, *[tabela.c[campo] for campo in self.campos]).where(
+                tabela.c.fornecedor_id == self.fornecedor_id,
+                tabela.c.produto_servico.in_(list(lote))
+            )
+        ):
+            existentes.setdefault(linha.produto_servico, linha)
+
+        novos, alterados = [], []
+        for produto, valores in lote.items():
+            atual = existentes.get(produto)
+            if atual is None:
+                novos.append({**valores, 'ultima_atualizacao': self.agora})
+            elif any(getattr(atual, campo) != valores[campo] for campo in self.campos):
+                alterados.append({
+                    'chave_produto': produto,
+                    'nova_atualizacao': self.agora,
+                    **{f'novo_{campo}': valores[campo] for campo in self.campos}
+                })
+            else:
+                self.resumo['inalterados'] += 1
+
+        if novos:
+            db.session.execute(tabela.insert(), novos)
+        if alterados:
+            db.session.execute(
+                tabela.update().where(
+                    tabela.c.fornecedor_id == self.fornecedor_id,
+                    tabela.c.produto_servico == db.bindparam('chave_produto')
+                ).values(
+                    ultima_atualizacao=db.bindparam('nova_atualizacao'),
+                    **{campo: db.bindparam(f'novo_{campo}') for campo in self.campos}
+                ),
+                alterados
+            )
+
+        if novos or alterados:
+            produtos = [valores['produto_servico'] for valores in novos] + [item['chave_produto'] for item in alterados]
+            indexar_busca(db.session.connection(), TabelaPreco, db.and_(
+                tabela.c.fornecedor_id == self.fornecedor_id,
+                tabela.c.produto_servico.in_(produtos)
+            ))
+
+        self.resumo['novos'] += len(novos)
+        self.resumo['alterados'] += len(alterados)
+
+    def executar(self, registros):
+        lote = {}
+        try:
+            for linha, registro in registros:
+                if self.mapeamento is None:
+                    self._preparar(registro.keys())
+                self.resumo['total_linhas'] += 1
+                try:
+                    valores = self._valores(registro)
+                except ErroValidacao as e:
+                    self.erros.append({'linha': linha, 'error': str(e)})
+                    continue
+
+                # Produto repetido na planilha: vale a última linha
+                lote[valores['produto_servico']] = valores
+                if len(lote) >= TAMANHO_LOTE:
+                    self._gravar(lote)
+                    lote = {}
+            if lote:
+                self._gravar(lote)
+        except FormatoInvalido as e:
+            db.session.rollback()
+            return {'error': str(e), 'total_linhas': self.resumo['total_linhas'], 'erros': self.erros}
+
+        if self.resumo['novos'] or self.resumo['alterados']:
+            marcar_tabelas_alteradas(db.session, TabelaPreco)
+        db.session.commit()
+
+        return {**self.resumo, 'total_erros': len(self.erros), 'erros': self.erros}
+
+
+def importar_tabela_precos(fornecedor_id, registros, padroes=None):
+    """Importa a planilha de preços de um fornecedor a partir de (linha, registro).
+
+    `padroes` traz valores usados quando a planilha não tem a coluna ou a
+    célula está vazia (por exemplo categoria e unidade). Retorna o resumo das
+    diferenças: itens novos, alterados, inalterados e linhas com erro.
+    """
+    return _ImportacaoTabelaPrecos(fornecedor_id, padroes or {}).executar(registros)
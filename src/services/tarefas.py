@@ -0,0 +1,367 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db
+from src.models.tarefa import Tarefa
+import fcntl
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+
+# Tarefas pesadas (relatório completo do assistente, exportações) executadas
+# fora da requisição, para não prender um worker síncrono do gunicorn.
+#
+# Enviar uma tarefa grava uma linha em `tarefa` e devolve o id para consulta
+# (GET /api/tarefas/<id>). Uma tarefa idêntica (mesmo tipo e parâmetros) ainda
+# em andamento é reaproveitada: o índice único de chave_ativa resolve a
+# disputa entre workers. Os resultados ficam gravados por TAREFAS_TTL segundos.
+#
+# Cada worker inicia uma thread de agendamento na primeira requisição, mas só
+# a que obtém o lock exclusivo do arquivo TAREFAS_DIR/agendador.lock executa
+# as tarefas; as demais ficam bloqueadas no lock e assumem se o processo dono
+# morrer (o sistema libera o flock). O agendador distribui as tarefas para um
+# pool de TAREFAS_PROCESSOS processos.
+#
+# Os processos do pool vêm do forkserver, não de um fork do worker: o worker
+# tem outras threads (esta, a do pool de imagens, as do servidor em modo
+# debug) e um fork copiaria travado qualquer lock que uma delas detivesse
+# naquele instante. O forkserver é um processo novo, de uma thread só, que
+# importa a aplicação (src.main) uma vez; cada processo do pool é um fork
+# dele.
+#
+# TAREFAS_PROCESSOS  processos que executam tarefas, no total (padrão: 2)
+# TAREFAS_TTL        segundos que o resultado fica disponível (padrão: 3600)
+# TAREFAS_INTERVALO  segundos entre buscas por tarefas novas (padrão: 1)
+# TAREFAS_DIR        diretório do lock e dos arquivos gerados (padrão: diretório temporário)
+
+PROCESSOS = int(os.environ.get('TAREFAS_PROCESSOS', 2))
+TTL_RESULTADO = int(os.environ.get('TAREFAS_TTL', 3600))
+INTERVALO = float(os.environ.get('TAREFAS_INTERVALO', 1))
+DIRETORIO = os.environ.get('TAREFAS_DIR') or os.path.join(tempfile.gettempdir(), 'erp-agencia-tarefas')
+DIRETORIO_ARQUIVOS = os.path.join(DIRETORIO, 'arquivos')
+
+STATUS_EM_ANDAMENTO = ('Pendente', 'Executando')
+
+# Limpeza das tarefas expiradas a cada tantos segundos
+INTERVALO_LIMPEZA = 60
+
+# Frequência com que os processos do pool verificam se o agendador ainda existe
+INTERVALO_VIGIA = 5
+
+TIPOS = {}
+
+_app = None
+_agendador = None
+_agendador_pid = None
+_agendador_lock = threading.Lock()
+_acordar = threading.Event()
+
+
+class ErroTarefa(ValueError):
+    pass
+
+
+def tipo_tarefa(nome, validar=None, recursos=()):
+    """Registra a função como tipo de tarefa.
+
+    A função recebe os parâmetros da tarefa como argumentos nomeados e
+    retorna um valor serializável em JSON. `validar(parametros)` pode
+    rejeitar o envio com ErroTarefa antes de a tarefa ser criada.
+    `recursos` são os recursos (blueprints) cujos dados a tarefa lê: uma
+    tupla ou uma função dos parâmetros que a retorna.
+    """
+    def decorator(funcao):
+        TIPOS[nome] = (funcao, validar, recursos)
+        return funcao
+    return decorator
+
+
+def recursos_tarefa(tipo, parametros):
+    """Recursos que o usuário precisa poder ler para enviar ou consultar a tarefa"""
+    if tipo not in TIPOS:
+        return ()
+    recursos = TIPOS[tipo][2]
+    return tuple(recursos(parametros or {}) if callable(recursos) else recursos)
+
+
+def caminho_arquivo(nome):
+    """Caminho de um arquivo gerado por uma tarefa (o nome vem do resultado)"""
+    return os.path.join(DIRETORIO_ARQUIVOS, os.path.basename(nome))
+
+
+def _chave(tipo, parametros):
+    return hashlib.sha1(json.dumps([tipo, parametros], sort_keys=True, default=str).encode()).hexdigest()
+
+
+def enviar_tarefa(tipo, parametros=None, usuario_id=None):
+    """Cria a tarefa (ou reaproveita uma idêntica em andamento); retorna (tarefa, criada)"""
+    if tipo not in TIPOS:
+        raise ErroTarefa(f'Tipo de tarefa desconhecido: {tipo}')
+    parametros = parametros or {}
+    if not isinstance(parametros, dict):
+        raise ErroTarefa('Os parâmetros devem ser um objeto')
+
+    funcao, validar, _ = TIPOS[tipo]
+    try:
+        inspect.signature(funcao).bind(**parametros)
+    except TypeError as e:
+        raise ErroTarefa(f'Parâmetros inválidos: {e}')
+    if validar:
+        validar(parametros)
+
+    chave = _chave(tipo, parametros)
+    # Duas tentativas: a tarefa em andamento pode terminar entre o conflito e a busca
+    for _ in range(2):
+        existente = Tarefa.query.filter_by(chave_ativa=chave).first()
+        if existente:
+            return existente, False
+
+        tarefa = Tarefa(
+            id=uuid.uuid4().hex,
+            tipo=tipo,
+            parametros=json.dumps(parametros, default=str),
+            chave_ativa=chave,
+            usuario_id=usuario_id
+        )
+        db.session.add(tarefa)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            continue
+
+        _acordar.set()
+        return tarefa, True
+
+    raise ErroTarefa('Não foi possível enviar a tarefa, tente novamente')
+
+
+def obter_tarefa(tarefa_id):
+    """Tarefa pelo id, ou None se não existe ou já expirou"""
+    tarefa = db.session.get(Tarefa, tarefa_id)
+    if tarefa is None or (tarefa.expira_em and tarefa.expira_em < datetime.utcnow()):
+        return None
+    return tarefa
+
+
+# Execução (no processo do pool)
+
+def _contexto_pool():
+    contexto = multiprocessing.get_context('forkserver')
+    # A aplicação é importada uma vez no forkserver, e não em cada processo
+    contexto.set_forkserver_preload(['src.main'])
+    return contexto
+
+
+def _inicializar_processo(pid_agendador):
+    global _app
+    # Já importada no forkserver (os tipos de tarefa são registrados pelas rotas)
+    from src.main import app
+    _app = app
+    threading.Thread(target=_vigiar_agendador, args=(pid_agendador,), daemon=True).start()
+
+    # As conexões abertas na importação pertencem ao forkserver
+    with _app.app_context():
+        db.engine.dispose(close=False)
+
+
+def _vigiar_agendador(pid_agendador):
+    """Encerra o processo do pool quando o agendador que o criou morre"""
+    # O pai do processo é o forkserver, então o agendador é vigiado pelo pid
+    while True:
+        try:
+            os.kill(pid_agendador, 0)
+        except ProcessLookupError:
+            os._exit(1)
+        except PermissionError:
+            pass
+        time.sleep(INTERVALO_VIGIA)
+
+
+def _executar_tarefa(tipo, parametros):
+    funcao = TIPOS[tipo][0]
+    with _app.app_context():
+        try:
+            return json.dumps(funcao(**json.loads(parametros)), default=str)
+        finally:
+            db.session.remove()
+
+
+# Agendador
+
+class Agendador(threading.Thread):
+    """Executa as tarefas pendentes enquanto detém o lock do arquivo"""
+
+    def __init__(self, app):
+        super().__init__(name='agendador-tarefas', daemon=True)
+        self.app = app
+        self.pool = None
+        self.em_execucao = {}
+        self._lock = threading.Lock()
+        self._ultima_limpeza = None
+
+    def run(self):
+        os.makedirs(DIRETORIO_ARQUIVOS, exist_ok=True)
+        with open(os.path.join(DIRETORIO, 'agendador.lock'), 'a') as arquivo_lock:
+            # Bloqueia até o agendador atual (de outro worker) terminar
+            fcntl.flock(arquivo_lock, fcntl.LOCK_EX)
+            with self.app.app_context():
+                self._retomar_interrompidas()
+                while True:
+                    try:
+                        self._ciclo()
+                    except Exception:
+                        traceback.print_exc()
+                    finally:
+                        db.session.remove()
+                    _acordar.wait(INTERVALO)
+                    _acordar.clear()
+
+    def _retomar_interrompidas(self):
+        # Só o dono do lock executa tarefas: as que estavam em execução eram
+        # do agendador anterior, que morreu
+        with db.engine.begin() as conexao:
+            conexao.execute(
+                Tarefa.__table__.update().where(Tarefa.status == 'Executando').values(status='Pendente')
+            )
+
+    def _ciclo(self):
+        agora = datetime.utcnow()
+        if self._ultima_limpeza is None or (agora - self._ultima_limpeza).total_seconds() >= INTERVALO_LIMPEZA:
+            self._limpar_expiradas(agora)
+            self._ultima_limpeza = agora
+
+        with self._lock:
+            livres = PROCESSOS - len(self.em_execucao)
+        if livres <= 0:
+            return
+
+        for tarefa_id, tipo, parametros in self._reservar(livres):
+            if tipo not in TIPOS:
+                self._finalizar(tarefa_id, erro=f'Tipo de tarefa desconhecido: {tipo}')
+                continue
+            pool = self._obter_pool()
+            try:
+                futuro = pool.submit(_executar_tarefa, tipo, parametros)
+            except BrokenProcessPool:
+                self._descartar_pool(pool)
+                pool = self._obter_pool()
+                futuro = pool.submit(_executar_tarefa, tipo, parametros)
+            with self._lock:
+                self.em_execucao[tarefa_id] = futuro
+            futuro.add_done_callback(
+                lambda futuro, tarefa_id=tarefa_id, pool=pool: self._concluida(tarefa_id, pool, futuro)
+            )
+
+    def _obter_pool(self):
+        with self._lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(
+                    max_workers=PROCESSOS,
+                    mp_context=_contexto_pool(),
+                    initializer=_inicializar_processo,
+                    initargs=(os.getpid(),)
+                )
+            return self.pool
+
+    def _descartar_pool(self, pool):
+        """Encerra um pool quebrado (um processo morreu); o próximo envio cria outro"""
+        with self._lock:
+            if self.pool is not pool:
+                # Já substituído por outra tarefa do mesmo pool
+                return
+            self.pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _reservar(self, quantidade):
+        tabela = Tarefa.__table__
+        reservadas = []
+        with db.engine.begin() as conexao:
+            pendentes = conexao.execute(
+                db.select(tabela.c.id, tabela.c.tipo, tabela.c.parametros)
+                .where(tabela.c.status == 'Pendente')
+                .order_by(tabela.c.criada_em)
+                .limit(quantidade)
+            ).all()
+            for tarefa_id, tipo, parametros in pendentes:
+                atualizadas = conexao.execute(
+                    tabela.update()
+                    .where(tabela.c.id == tarefa_id, tabela.c.status == 'Pendente')
+                    .values(status='Executando', iniciada_em=datetime.utcnow())
+                ).rowcount
+                if atualizadas:
+                    reservadas.append((tarefa_id, tipo, parametros))
+        return reservadas
+
+    def _concluida(self, tarefa_id, pool, futuro):
+        # Chamado na thread do pool, sem contexto da aplicação
+        with self._lock:
+            self.em_execucao.pop(tarefa_id, None)
+        with self.app.app_context():
+            erro = futuro.exception()
+            if erro is None:
+                self._finalizar(tarefa_id, resultado=futuro.result())
+            else:
+                if isinstance(erro, BrokenProcessPool):
+                    self._descartar_pool(pool)
+                self._finalizar(tarefa_id, erro=str(erro) or erro.__class__.__name__)
+        _acordar.set()
+
+    def _finalizar(self, tarefa_id, resultado=None, erro=None):
+        agora = datetime.utcnow()
+        with db.engine.begin() as conexao:
+            conexao.execute(
+                Tarefa.__table__.update().where(Tarefa.id == tarefa_id).values(
+                    status='Erro' if erro else 'Concluída',
+                    resultado=resultado,
+                    erro=erro,
+                    chave_ativa=None,
+                    concluida_em=agora,
+                    expira_em=agora + timedelta(seconds=TTL_RESULTADO)
+                )
+            )
+
+    def _limpar_expiradas(self, agora):
+        tabela = Tarefa.__table__
+        with db.engine.begin() as conexao:
+            expiradas = conexao.execute(
+                db.select(tabela.c.id, tabela.c.resultado).where(tabela.c.expira_em < agora)
+            ).all()
+            for _, resultado in expiradas:
+                arquivo = (json.loads(resultado) or {}).get('arquivo') if resultado else None
+                if isinstance(arquivo, str):
+                    try:
+                        os.remove(caminho_arquivo(arquivo))
+                    except OSError:
+                        pass
+            if expiradas:
+                conexao.execute(tabela.delete().where(tabela.c.id.in_([linha.id for linha in expiradas])))
+
+
+def iniciar_agendador(app):
+    """Inicia a thread do agendador neste processo (uma por processo)"""
+    global _app, _agendador, _agendador_pid
+    with _agendador_lock:
+        # Com preload_app a aplicação é importada antes do fork dos workers:
+        # a thread do processo mestre não existe nos filhos
+        if _agendador is not None and _agendador_pid == os.getpid():
+            return
+        _app = app
+        _agendador = Agendador(app)
+        _agendador_pid = os.getpid()
+        _agendador.start()
+
+
+def configurar_tarefas(app):
+    @app.before_request
+    def _garantir_agendador():
+        if _agendador_pid != os.getpid():
+            iniciar_agendador(app)
@@ -0,0 +1,206 @@
+from datetime import datetime
+import uuid
+
+# Regras de validação dos cadastros, compartilhadas pelas rotas de criação e
+# pela importação em lote. Cada função recebe os dados de entrada e retorna os
+# valores das colunas do modelo, ou levanta ErroValidacao com a mensagem.
+#
+# A existência de registros relacionados (cliente, pedido, fornecedor) não é verificada
+# aqui: as rotas consultam um registro e a importação consulta o lote inteiro.
+
+
+class ErroValidacao(ValueError):
+    pass
+
+
+STATUS_PEDIDO = ('Orçamento', 'Aprovado', 'Produção', 'Concluído', 'Cancelado')
+PRIORIDADES_PEDIDO = ('Urgente', 'Alta', 'Normal', 'Baixa')
+STATUS_DEMANDA = ('Briefing', 'Criação', 'Aguardando Aprovação', 'Aprovado', 'Publicado')
+PRIORIDADES_DEMANDA = ('Urgente', 'Alta', 'Normal')
+
+
+def _data(valor, mensagem):
+    if not valor:
+        return None
+    if isinstance(valor, datetime):
+        return valor
+    try:
+        return datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+    except ValueError:
+        raise ErroValidacao(mensagem)
+
+
+def _numero(valor, mensagem, tipo=float):
+    # Planilhas trazem números como texto, às vezes com R$, separador de
+    # milhar e vírgula decimal (R$ 1.234,56)
+    if isinstance(valor, str):
+        valor = valor.replace('R$', '').strip()
+        if ',' in valor:
+            valor = valor.replace('.', '').replace(',', '.')
+        if not valor:
+            return None
+    if valor is None:
+        return None
+    try:
+        return tipo(valor)
+    except (TypeError, ValueError):
+        raise ErroValidacao(mensagem)
+
+
+def valores_cliente(data):
+    """Valores de um novo Cliente"""
+    if not data.get('nome'):
+        raise ErroValidacao('Nome é obrigatório')
+
+    if not data.get('tipo'):
+        raise ErroValidacao('Tipo é obrigatório')
+
+    return {
+        'nome': data['nome'],
+        'tipo': data['tipo'],
+        'cidade': data.get('cidade'),
+        'populacao': _numero(data.get('populacao'), 'População inválida', int),
+        'contato_principal': data.get('contato_principal'),
+        'whatsapp': data.get('whatsapp'),
+        'email': data.get('email'),
+        'status': data.get('status') or 'Prospect',
+        'segmento': data.get('segmento'),
+        'observacoes': data.get('observacoes')
+    }
+
+
+def valores_pedido(data):
+    """Valores de um novo Pedido (cliente_id deve ser verificado por quem chama)"""
+    if not data.get('cliente_id'):
+        raise ErroValidacao('Cliente é obrigatório')
+
+    if not data.get('tipo_servico'):
+        raise ErroValidacao('Tipo de serviço é obrigatório')
+
+    # Gerar ID único do pedido
+    id_pedido = data.get('id_pedido') or f"PED-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+
+    valores = {
+        'id_pedido': id_pedido,
+        'cliente_id': _numero(data['cliente_id'], 'Cliente inválido', int),
+        'tipo_servico': data['tipo_servico'],
+        'descricao': data.get('descricao'),
+        'status': data.get('status') or 'Orçamento',
+        'prioridade': data.get('prioridade') or 'Normal',
+        'responsavel': data.get('responsavel'),
+        'valor': _numero(data.get('valor', 0.0), 'Valor inválido') or 0.0,
+        'custo': _numero(data.get('custo', 0.0), 'Custo inválido') or 0.0,
+        'forma_pagamento': data.get('forma_pagamento'),
+        'status_pagamento': data.get('status_pagamento') or 'Pendente',
+        'observacoes': data.get('observacoes'),
+        'data_entrega': _data(data.get('data_entrega'), 'Data de entrega inválida')
+    }
+
+    data_pedido = _data(data.get('data_pedido'), 'Data do pedido inválida')
+    if data_pedido:
+        valores['data_pedido'] = data_pedido
+
+    return valores
+
+
+def valores_transacao(data):
+    """Valores de uma nova TransacaoFinanceira (pedido_id deve ser verificado por quem chama)"""
+    if not data.get('descricao'):
+        raise ErroValidacao('Descrição é obrigatória')
+
+    if not data.get('tipo'):
+        raise ErroValidacao('Tipo é obrigatório')
+
+    if not data.get('categoria'):
+        raise ErroValidacao('Categoria é obrigatória')
+
+    valor = _numero(data.get('valor'), 'Valor inválido')
+    if not valor:
+        raise ErroValidacao('Valor é obrigatório')
+
+    valores = {
+        'descricao': data['descricao'],
+        'tipo': data['tipo'],
+        'categoria': data['categoria'],
+        'valor': valor,
+        'status': data.get('status') or 'Pendente',
+        'cliente_fornecedor': data.get('cliente_fornecedor'),
+        'forma_pagamento': data.get('forma_pagamento'),
+        'pedido_id': _numero(data.get('pedido_id'), 'Pedido inválido', int) or None,
+        'observacoes': data.get('observacoes'),
+        'comprovante': data.get('comprovante')
+    }
+
+    data_transacao = _data(data.get('data'), 'Data inválida')
+    if data_transacao:
+        valores['data'] = data_transacao
+
+    return valores
+
+
+def valores_tabela_preco(data):
+    """Valores de um novo item da TabelaPreco (fornecedor_id deve ser verificado por quem chama)"""
+    if not data.get('produto_servico'):
+        raise ErroValidacao('Produto/Serviço é obrigatório')
+
+    if not data.get('categoria'):
+        raise ErroValidacao('Categoria é obrigatória')
+
+    if not data.get('unidade'):
+        raise ErroValidacao('Unidade é obrigatória')
+
+    return {
+        'produto_servico': data['produto_servico'],
+        'categoria': data['categoria'],
+        'descricao': data.get('descricao'),
+        'preco_custo': _numero(data.get('preco_custo', 0.0), 'Preço de custo inválido') or 0.0,
+        'markup': _numero(data.get('markup', 0.0), 'Markup inválido') or 0.0,
+        'unidade': data['unidade'],
+        'fornecedor_id': _numero(data.get('fornecedor_id'), 'Fornecedor inválido', int) or None,
+        'ativo': data.get('ativo', True)
+    }
+
+
+# Alterações em lote: cada campo alterável tem uma função que valida o valor
+# recebido e retorna o valor da coluna (o UPDATE em lote não passa pelo ORM,
+# então nada além disso impede um null ou uma lista de chegar ao banco)
+
+def opcao(campo, opcoes):
+    def validar(valor):
+        if not isinstance(valor, str) or valor not in opcoes:
+            raise ErroValidacao(f"{campo} inválido. Use um destes: {', '.join(opcoes)}")
+        return valor
+    return validar
+
+
+def texto(campo, tamanho, obrigatorio=True):
+    def validar(valor):
+        if valor is None and not obrigatorio:
+            return None
+        if not isinstance(valor, str) or not valor.strip():
+            raise ErroValidacao(f'{campo} deve ser um texto')
+        if len(valor) > tamanho:
+            raise ErroValidacao(f'{campo} deve ter no máximo {tamanho} caracteres')
+        return valor
+    return validar
+
+
+def booleano(campo):
+    def validar(valor):
+        if not isinstance(valor, bool):
+            raise ErroValidacao(f'{campo} deve ser true ou false')
+        return valor
+    return validar
+
+
+CAMPOS_LOTE_PEDIDO = {
+    'status': opcao('status', STATUS_PEDIDO),
+    'prioridade': opcao('prioridade', PRIORIDADES_PEDIDO),
+    'responsavel': texto('responsavel', 50, obrigatorio=False)
+}
+
+CAMPOS_LOTE_DEMANDA = {
+    'status': opcao('status', STATUS_DEMANDA),
+    'prioridade': opcao('prioridade', PRIORIDADES_DEMANDA),
+    'aprovado': booleano('aprovado')
+}
@@ -86,6 +86,20 @@ const api = {
         return this.request(endpoint, {
             method: 'DELETE'
         });
+    },
+
+    // Envia uma tarefa em segundo plano e consulta até ela terminar
+    async tarefa(endpoint, data) {
+        let tarefa = await this.post(endpoint, data);
+        while (tarefa.status === 'Pendente' || tarefa.status === 'Executando') {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            tarefa = await this.get(`/tarefas/${tarefa.id}`);
+        }
+        if (tarefa.status === 'Erro') {
+            showToast(tarefa.erro || 'Erro ao executar a tarefa', 'error');
+            throw new Error(tarefa.erro);
+        }
+        return tarefa.resultado;
     }
 };
 
@@ -137,7 +151,9 @@ const auth = {
             
             if (config.logo_path) {
                 const logo = document.getElementById('companyLogo');
-                logo.src = `/static/${config.logo_path}`;
+                // Miniatura WebP quando pronta; senão o arquivo original
+                const miniatura = config.logo_derivados && config.logo_derivados.derivados['160'];
+                logo.src = (miniatura && miniatura.webp) || `/static/${config.logo_path}`;
                 logo.style.display = 'block';
             }
             
@@ -460,7 +476,7 @@ const navigation = {
     },
 
     async renderAssistenteIA(content) {
-        const relatorio = await api.get('/assistente-ia/relatorio-completo');
+        const relatorio = await api.tarefa('/assistente-ia/relatorio-completo');
         
         content.innerHTML = `
             <div class="fade-in">
@@ -0,0 +1,266 @@
+from flask import g, jsonify, request, session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from src.models.user import User, db
+from src.utils.cache import obter_backend
+from collections import namedtuple
+from functools import wraps
+import json
+import os
+import threading
+import time
+
+# Autenticação e autorização das rotas da API.
+#
+# A sessão guarda só o user_id; o usuário é resolvido para um Principal
+# (papel, situação e permissões já compiladas) mantido em memória por
+# AUTH_TTL segundos. A alteração de papel, situação, permissões ou a exclusão
+# de um usuário incrementa a versão "usuario:<id>" no backend de cache, o que
+# descarta o Principal em todos os workers já na requisição seguinte.
+#
+# Permissões são pares (recurso, ação): o recurso é o nome do blueprint
+# (cliente, pedido, financeiro...) e a ação é 'ler' (GET) ou 'escrever'
+# (demais métodos). Papéis:
+#
+#   admin   tudo, inclusive o gerenciamento de usuários
+#   user    ler e escrever em todos os recursos
+#   viewer  apenas leitura
+#
+# O campo User.permissions (JSON), quando preenchido, substitui as permissões
+# do papel (exceto para admin). Formatos aceitos:
+#
+#   {"cliente": ["ler", "escrever"], "financeiro": "ler", "pedido": true}
+#   ["cliente:ler", "pedido", "*:ler"]
+#
+# Rotas que devolvem dados de outros recursos (assistente, exportações e
+# demais tarefas) exigem leitura em todos eles, não só no próprio blueprint.
+#
+# AUTH_TTL   segundos que o Principal fica em memória (padrão: 30)
+
+TTL_PRINCIPAL = int(os.environ.get('AUTH_TTL', 30))
+
+ACOES = ('ler', 'escrever')
+PAPEIS = ('admin', 'user', 'viewer')
+
+# Recurso curinga: vale para todos os blueprints
+TODOS = '*'
+
+PERMISSOES_PAPEL = {
+    'admin': frozenset((TODOS, acao) for acao in ACOES),
+    'user': frozenset((TODOS, acao) for acao in ACOES),
+    'viewer': frozenset({(TODOS, 'ler')})
+}
+
+METODOS_LEITURA = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+# Campos que mudam o Principal (last_login, por exemplo, não invalida)
+CAMPOS_PRINCIPAL = ('username', 'role', 'is_active', 'permissions')
+
+_CHAVE_SESSAO = 'auth_usuarios_alterados'
+
+Principal = namedtuple('Principal', 'id username role ativo permissoes')
+
+_principais = {}
+_principais_lock = threading.Lock()
+
+
+def _lista_acoes(valor):
+    if valor is True:
+        return ACOES
+    if valor is False or valor is None:
+        return ()
+    if isinstance(valor, str):
+        return (valor,)
+    if isinstance(valor, list):
+        return valor
+    raise ValueError('Ações devem ser true, uma ação ou uma lista de ações')
+
+
+def compilar_permissoes(permissoes):
+    """Converte o JSON de User.permissions em um frozenset de (recurso, ação).
+
+    Levanta ValueError para um formato inválido.
+    """
+    if isinstance(permissoes, str):
+        try:
+            permissoes = json.loads(permissoes)
+        except ValueError:
+            raise ValueError('Permissões devem ser um JSON válido')
+
+    if isinstance(permissoes, dict):
+        pares = [(recurso, acao) for recurso, valor in permissoes.items() for acao in _lista_acoes(valor)]
+    elif isinstance(permissoes, list):
+        pares = []
+        for item in permissoes:
+            if not isinstance(item, str):
+                raise ValueError('Cada permissão da lista deve ser "recurso" ou "recurso:ação"')
+            recurso, _, acao = item.partition(':')
+            pares.extend((recurso, a) for a in ((acao,) if acao else ACOES))
+    else:
+        raise ValueError('Permissões devem ser um objeto ou uma lista')
+
+    for recurso, acao in pares:
+        if acao not in ACOES:
+            raise ValueError(f"Ação inválida: {acao}. Use {' ou '.join(ACOES)}")
+        if not recurso:
+            raise ValueError('Recurso não informado')
+    return frozenset(pares)
+
+
+def _criar_principal(user):
+    permissoes = PERMISSOES_PAPEL.get(user.role, frozenset())
+    if user.permissions and user.role != 'admin':
+        try:
+            permissoes = compilar_permissoes(user.permissions)
+        except ValueError:
+            # Permissões gravadas antes da validação: fica com as do papel
+            pass
+    return Principal(user.id, user.username, user.role, bool(user.is_active), permissoes)
+
+
+def _versao(backend, user_id):
+    return backend.versoes([f'usuario:{user_id}'])[0] if backend is not None else None
+
+
+def obter_principal():
+    """Principal do usuário da sessão (None sem login ou se o usuário não existe)"""
+    if 'principal' in g:
+        return g.principal
+
+    user_id = session.get('user_id')
+    principal = None
+    if user_id is not None:
+        backend = obter_backend()
+        versao = _versao(backend, user_id)
+        agora = time.monotonic()
+        with _principais_lock:
+            entrada = _principais.get(user_id)
+        if entrada is not None and entrada[1] == versao and entrada[2] > agora:
+            principal = entrada[0]
+        else:
+            user = db.session.get(User, user_id)
+            if user is not None:
+                principal = _criar_principal(user)
+                with _principais_lock:
+                    _principais[user_id] = (principal, versao, agora + TTL_PRINCIPAL)
+
+    g.principal = principal
+    return principal
+
+
+def pode(principal, recurso, acao):
+    """True se o principal tem a permissão (recurso, ação)"""
+    permissoes = principal.permissoes
+    return (recurso, acao) in permissoes or (TODOS, acao) in permissoes
+
+
+def _autenticar():
+    """Principal ativo da sessão, ou a resposta de erro 401"""
+    principal = obter_principal()
+    if principal is None or not principal.ativo:
+        if principal is not None:
+            session.clear()
+        return None, (jsonify({'error': 'Acesso negado. Faça login primeiro.'}), 401)
+    return principal, None
+
+
+def _negado():
+    return jsonify({'error': 'Acesso negado. Permissão insuficiente.'}), 403
+
+
+def require_login(f):
+    """Exige apenas um usuário ativo (rotas da própria conta: logout, senha)"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        _, erro = _autenticar()
+        if erro:
+            return erro
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def require_auth(f):
+    """Exige login e a permissão do blueprint da rota para a ação do método HTTP"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        principal, erro = _autenticar()
+        if erro:
+            return erro
+        acao = 'ler' if request.method in METODOS_LEITURA else 'escrever'
+        if not pode(principal, request.blueprint, acao):
+            return _negado()
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def require_permissao(acao, *recursos):
+    """Como require_auth, com a ação fixa e, opcionalmente, os recursos exigidos.
+
+    Para rotas POST que só consultam dados (perguntas ao assistente,
+    exportações), que um viewer também pode usar, e para rotas que leem dados
+    de outros recursos: a permissão é exigida em todos eles.
+    """
+    if acao not in ACOES:
+        raise ValueError(f'Ação inválida: {acao}')
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            principal, erro = _autenticar()
+            if erro:
+                return erro
+            if not all(pode(principal, recurso, acao) for recurso in recursos or (request.blueprint,)):
+                return _negado()
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def require_admin(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        principal, erro = _autenticar()
+        if erro:
+            return erro
+        if principal.role != 'admin':
+            return jsonify({'error': 'Acesso negado. Apenas administradores.'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+# Invalidação
+
+def _registrar_usuario_alterado(target):
+    sessao = object_session(target)
+    if sessao is not None:
+        sessao.info.setdefault(_CHAVE_SESSAO, set()).add(target.id)
+
+
+@event.listens_for(User, 'after_update')
+def _usuario_atualizado(mapper, connection, target):
+    estado = db.inspect(target)
+    if any(estado.attrs[campo].history.has_changes() for campo in CAMPOS_PRINCIPAL):
+        _registrar_usuario_alterado(target)
+
+
+@event.listens_for(User, 'after_delete')
+def _usuario_excluido(mapper, connection, target):
+    _registrar_usuario_alterado(target)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_principais(session):
+    alterados = session.info.pop(_CHAVE_SESSAO, None)
+    if not alterados:
+        return
+    with _principais_lock:
+        for user_id in alterados:
+            _principais.pop(user_id, None)
+    backend = obter_backend()
+    if backend is not None:
+        backend.incrementar_versoes(sorted(f'usuario:{user_id}' for user_id in alterados))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_usuarios_alterados(session):
+    session.info.pop(_CHAVE_SESSAO, None)
@@ -0,0 +1,369 @@
+from flask import current_app, make_response, request, session
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from functools import wraps
+import atexit
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Cache de respostas compartilhado entre os workers do gunicorn.
+#
+# Cada tabela tem um número de versão, incrementado no commit de qualquer
+# transação que a alterou. A chave de uma resposta em cache inclui as versões
+# das tabelas de que ela depende, então uma escrita invalida imediatamente
+# todas as respostas que leem a tabela, em todos os workers. O TTL cobre o que
+# muda só com o tempo (pedidos que passam a estar atrasados, virada do mês).
+#
+# CACHE_BACKEND   sqlite (padrão, arquivo compartilhado entre processos),
+#                 memoria (apenas o processo atual) ou nenhum (desliga o cache)
+# CACHE_DIR       diretório do arquivo SQLite do cache (padrão: diretório temporário)
+# CACHE_TTL       segundos de validade de uma resposta (padrão: 60)
+# CACHE_ESTATISTICAS_INTERVALO
+#                 segundos entre as gravações dos totais de acertos e falhas
+#                 no arquivo do cache (padrão: 10)
+#
+# As mesmas versões geram o ETag das rotas de leitura (etag_versoes): um
+# If-None-Match que confere é respondido com 304 sem consultar as tabelas.
+#
+# As versões recomeçam do zero quando o arquivo do cache é apagado (o
+# diretório temporário é limpo a cada reinício do contêiner) ou quando
+# CACHE_DIR muda. Por isso cada armazenamento tem uma época, sorteada quando
+# ele é criado, que entra no ETag junto com as versões: um ETag emitido antes
+# nunca confere com os mesmos números de versão de outro armazenamento. A
+# época também entra na chave das respostas em cache (cache_resposta).
+#
+# Os acertos e falhas de cada endpoint são somados na memória do processo e
+# gravados no arquivo a cada CACHE_ESTATISTICAS_INTERVALO segundos: uma
+# escrita (e o lock do SQLite) por acesso custaria mais que o próprio acerto.
+
+TTL_PADRAO = int(os.environ.get('CACHE_TTL', 60))
+INTERVALO_ESTATISTICAS = float(os.environ.get('CACHE_ESTATISTICAS_INTERVALO', 10))
+
+_CHAVE_SESSAO = 'cache_tabelas_alteradas'
+
+
+class BackendMemoria:
+    """Cache restrito ao processo atual (desenvolvimento e servidor com um só worker)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas = {}
+        self._versoes = {}
+        self._estatisticas = {}
+        self._epoca = secrets.token_hex(8)
+
+    def epoca(self):
+        return self._epoca
+
+    def obter(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None or entrada[1] < time.time():
+                return None
+            return entrada[0]
+
+    def gravar(self, chave, valor, ttl):
+        agora = time.time()
+        with self._lock:
+            self._entradas = {c: e for c, e in self._entradas.items() if e[1] >= agora}
+            self._entradas[chave] = (valor, agora + ttl)
+
+    def versoes(self, tabelas):
+        with self._lock:
+            return [self._versoes.get(tabela, 0) for tabela in tabelas]
+
+    def incrementar_versoes(self, tabelas):
+        with self._lock:
+            for tabela in tabelas:
+                self._versoes[tabela] = self._versoes.get(tabela, 0) + 1
+
+    def registrar_acesso(self, endpoint, acerto):
+        with self._lock:
+            acertos, falhas = self._estatisticas.get(endpoint, (0, 0))
+            self._estatisticas[endpoint] = (acertos + 1, falhas) if acerto else (acertos, falhas + 1)
+            return self._estatisticas[endpoint]
+
+
+class BackendSQLite:
+    """Cache em um arquivo SQLite local, compartilhado pelos processos da máquina"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+        # Acessos ainda não gravados e os totais lidos na última gravação
+        self._estatisticas_lock = threading.Lock()
+        self._estatisticas_pid = os.getpid()
+        self._pendentes = {}
+        self._totais = {}
+        self._gravado_em = time.monotonic()
+        atexit.register(self.gravar_estatisticas)
+
+    def _conexao(self):
+        # Conexões SQLite não podem ser compartilhadas entre threads nem
+        # sobreviver a um fork, então cada thread de cada processo abre a sua
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is not None and self._local.pid == os.getpid():
+            return conexao
+
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        conexao = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+        conexao.execute('PRAGMA journal_mode=WAL')
+        conexao.execute('PRAGMA synchronous=NORMAL')
+        conexao.execute('CREATE TABLE IF NOT EXISTS entrada (chave TEXT PRIMARY KEY, valor BLOB, expira REAL)')
+        conexao.execute('CREATE TABLE IF NOT EXISTS versao (tabela TEXT PRIMARY KEY, versao INTEGER NOT NULL)')
+        conexao.execute('CREATE TABLE IF NOT EXISTS epoca (valor TEXT NOT NULL)')
+        conexao.execute(
+            'INSERT INTO epoca (valor) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM epoca)', (secrets.token_hex(8),)
+        )
+        conexao.execute(
+            'CREATE TABLE IF NOT EXISTS estatistica '
+            '(endpoint TEXT PRIMARY KEY, acertos INTEGER NOT NULL, falhas INTEGER NOT NULL)'
+        )
+        self._local.conexao = conexao
+        self._local.pid = os.getpid()
+        self._local.epoca = conexao.execute('SELECT valor FROM epoca').fetchone()[0]
+        return conexao
+
+    def epoca(self):
+        """Identificador sorteado na criação do arquivo (muda se ele for recriado)"""
+        self._conexao()
+        return self._local.epoca
+
+    def obter(self, chave):
+        linha = self._conexao().execute(
+            'SELECT valor FROM entrada WHERE chave = ? AND expira >= ?', (chave, time.time())
+        ).fetchone()
+        return linha[0] if linha else None
+
+    def gravar(self, chave, valor, ttl):
+        agora = time.time()
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute('BEGIN IMMEDIATE')
+            conexao.execute('DELETE FROM entrada WHERE expira < ?', (agora,))
+            conexao.execute(
+                'INSERT OR REPLACE INTO entrada (chave, valor, expira) VALUES (?, ?, ?)',
+                (chave, valor, agora + ttl)
+            )
+
+    def versoes(self, tabelas):
+        marcadores = ', '.join('?' * len(tabelas))
+        encontradas = dict(self._conexao().execute(
+            f'SELECT tabela, versao FROM versao WHERE tabela IN ({marcadores})', list(tabelas)
+        ).fetchall())
+        return [encontradas.get(tabela, 0) for tabela in tabelas]
+
+    def incrementar_versoes(self, tabelas):
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute('BEGIN IMMEDIATE')
+            conexao.executemany(
+                'INSERT INTO versao (tabela, versao) VALUES (?, 1) '
+                'ON CONFLICT (tabela) DO UPDATE SET versao = versao + 1',
+                [(tabela,) for tabela in tabelas]
+            )
+
+    def _gravar_pendentes(self):
+        # Chamado com _estatisticas_lock; se a gravação falhar, os acessos
+        # continuam pendentes para a próxima
+        self._gravado_em = time.monotonic()
+        conexao = self._conexao()
+        try:
+            with conexao:
+                conexao.execute('BEGIN IMMEDIATE')
+                conexao.executemany(
+                    'INSERT INTO estatistica (endpoint, acertos, falhas) VALUES (?, ?, ?) '
+                    'ON CONFLICT (endpoint) DO UPDATE SET '
+                    'acertos = acertos + excluded.acertos, falhas = falhas + excluded.falhas',
+                    [(endpoint, acertos, falhas) for endpoint, (acertos, falhas) in self._pendentes.items()]
+                )
+                linhas = conexao.execute('SELECT endpoint, acertos, falhas FROM estatistica').fetchall()
+        except sqlite3.Error:
+            return
+        self._pendentes = {}
+        self._totais = {endpoint: (acertos, falhas) for endpoint, acertos, falhas in linhas}
+
+    def gravar_estatisticas(self):
+        """Grava os acessos pendentes deste processo (também na saída do processo)"""
+        with self._estatisticas_lock:
+            if self._pendentes and self._estatisticas_pid == os.getpid():
+                self._gravar_pendentes()
+
+    def registrar_acesso(self, endpoint, acerto):
+        """Soma o acesso e retorna os totais do endpoint (os gravados por todos
+        os processos até a última gravação, mais os pendentes deste)"""
+        with self._estatisticas_lock:
+            if self._estatisticas_pid != os.getpid():
+                # Processo filho: os pendentes herdados são do pai
+                self._estatisticas_pid = os.getpid()
+                self._pendentes, self._totais = {}, {}
+            acertos, falhas = self._pendentes.get(endpoint, (0, 0))
+            self._pendentes[endpoint] = (acertos + 1, falhas) if acerto else (acertos, falhas + 1)
+            if time.monotonic() - self._gravado_em >= INTERVALO_ESTATISTICAS:
+                self._gravar_pendentes()
+            pendentes = self._pendentes.get(endpoint, (0, 0))
+            gravados = self._totais.get(endpoint, (0, 0))
+        return gravados[0] + pendentes[0], gravados[1] + pendentes[1]
+
+
+_NAO_INICIALIZADO = object()
+_backend = _NAO_INICIALIZADO
+_backend_lock = threading.Lock()
+
+
+def _criar_backend():
+    tipo = os.environ.get('CACHE_BACKEND', 'sqlite').lower()
+    if tipo == 'nenhum':
+        return None
+    if tipo == 'memoria':
+        return BackendMemoria()
+    if tipo != 'sqlite':
+        raise ValueError(f'CACHE_BACKEND inválido: {tipo}')
+
+    # Um arquivo por banco de dados, para instâncias diferentes na mesma
+    # máquina não compartilharem versões
+    url = current_app.config['SQLALCHEMY_DATABASE_URI']
+    identificador = hashlib.sha1(url.encode()).hexdigest()[:12]
+    diretorio = os.environ.get('CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'erp-agencia-cache')
+    return BackendSQLite(os.path.join(diretorio, f'cache-{identificador}.db'))
+
+
+def obter_backend():
+    """Backend de cache em uso (None quando o cache está desligado)"""
+    global _backend
+    if _backend is _NAO_INICIALIZADO:
+        with _backend_lock:
+            if _backend is _NAO_INICIALIZADO:
+                _backend = _criar_backend()
+    return _backend
+
+
+def _nome_tabela(tabela):
+    return getattr(tabela, '__tablename__', None) or getattr(tabela, 'name', tabela)
+
+
+def marcar_tabelas_alteradas(session, *tabelas):
+    """Registra tabelas alteradas fora do ORM (insert/update em massa), para que
+    suas versões sejam incrementadas no commit da sessão"""
+    session.info.setdefault(_CHAVE_SESSAO, set()).update(_nome_tabela(tabela) for tabela in tabelas)
+
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_tabelas_alteradas(session, flush_context):
+    alteradas = session.info.setdefault(_CHAVE_SESSAO, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tabela = getattr(obj, '__table__', None)
+        if tabela is not None:
+            alteradas.add(tabela.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _incrementar_versoes(session):
+    alteradas = session.info.pop(_CHAVE_SESSAO, None)
+    if not alteradas:
+        return
+    backend = obter_backend()
+    if backend is not None:
+        backend.incrementar_versoes(sorted(alteradas))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_tabelas_alteradas(session):
+    session.info.pop(_CHAVE_SESSAO, None)
+
+
+def cache_resposta(*modelos, ttl=None):
+    """Guarda a resposta JSON da view no cache compartilhado.
+
+    A chave inclui o endpoint, os argumentos da requisição, a época do
+    armazenamento e as versões das tabelas dos modelos informados. A resposta
+    traz X-Cache (HIT/MISS) e os totais de acertos e falhas do endpoint em
+    X-Cache-Hits e X-Cache-Misses (no backend SQLite, os dos outros workers
+    aparecem a cada CACHE_ESTATISTICAS_INTERVALO segundos).
+    """
+    tabelas = [_nome_tabela(modelo) for modelo in modelos]
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            backend = obter_backend()
+            if backend is None:
+                return f(*args, **kwargs)
+
+            endpoint = request.endpoint
+            chave = hashlib.sha1(json.dumps([
+                endpoint,
+                kwargs,
+                sorted(request.args.items(multi=True)),
+                backend.epoca(),
+                backend.versoes(tabelas)
+            ], default=str).encode()).hexdigest()
+
+            dados = backend.obter(chave)
+            if dados is not None:
+                resposta = current_app.response_class(dados, mimetype='application/json')
+                situacao = 'HIT'
+            else:
+                resposta = make_response(f(*args, **kwargs))
+                if resposta.status_code != 200 or resposta.is_streamed:
+                    return resposta
+                backend.gravar(chave, resposta.get_data(), TTL_PADRAO if ttl is None else ttl)
+                situacao = 'MISS'
+
+            acertos, falhas = backend.registrar_acesso(endpoint, situacao == 'HIT')
+            resposta.headers['X-Cache'] = situacao
+            resposta.headers['X-Cache-Hits'] = str(acertos)
+            resposta.headers['X-Cache-Misses'] = str(falhas)
+            return resposta
+        return decorated_function
+    return decorator
+
+
+def etag_versoes(*modelos, depende_do_tempo=False):
+    """GET condicional com ETag derivado das versões das tabelas dos modelos.
+
+    O ETag combina endpoint, argumentos, usuário da sessão, época do
+    armazenamento e versões das tabelas; quando o If-None-Match confere, responde 304 sem executar a view.
+    Views cujo resultado muda com o relógio (prazos, mês atual) usam
+    depende_do_tempo=True, que troca o ETag a cada CACHE_TTL segundos.
+    """
+    tabelas = [_nome_tabela(modelo) for modelo in modelos]
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            backend = obter_backend()
+            if backend is None:
+                return f(*args, **kwargs)
+
+            partes = [
+                request.endpoint,
+                kwargs,
+                sorted(request.args.items(multi=True)),
+                session.get('user_id'),
+                backend.epoca(),
+                backend.versoes(tabelas)
+            ]
+            if depende_do_tempo:
+                partes.append(int(time.time() // TTL_PADRAO))
+            etag = hashlib.sha1(json.dumps(partes, default=str).encode()).hexdigest()
+
+            # Comparação fraca: respostas comprimidas levam o ETag como W/"..."
+            if request.if_none_match.contains_weak(etag):
+                resposta = current_app.response_class(status=304)
+            else:
+                resposta = make_response(f(*args, **kwargs))
+                if resposta.status_code != 200:
+                    return resposta
+
+            resposta.set_etag(etag)
+            resposta.headers['Cache-Control'] = 'private, no-cache'
+            return resposta
+        return decorated_function
+    return decorator
@@ -0,0 +1,165 @@
+from flask import request
+import gzip
+import os
+import zlib
+
+# Codificações de conteúdo (Content-Encoding) suportadas pelo servidor.
+#
+# gzip vem da biblioteca padrão; br e zstd dependem dos pacotes brotli e
+# zstandard e só são oferecidos quando eles estão instalados. A escolha
+# respeita os pesos (q) do Accept-Encoding e, em empate, a ordem de
+# preferência de quem chama.
+#
+# Além dos arquivos estáticos (pré-comprimidos no nível máximo, ver
+# src/utils/estaticos.py), as respostas da API são comprimidas na saída por
+# comprimir_resposta, com níveis mais baixos: o custo é pago a cada requisição.
+# As listas enviadas em stream (src/utils/streaming.py) são comprimidas bloco a
+# bloco, sem juntar a resposta inteira em memória.
+#
+# COMPRESSAO_MINIMO      tamanho mínimo da resposta em bytes (padrão: 1024)
+# COMPRESSAO_NIVEL_GZIP  nível do gzip nas respostas da API, 1-9 (padrão: 6)
+# COMPRESSAO_NIVEL_BR    nível do brotli nas respostas da API, 0-11 (padrão: 4)
+# COMPRESSAO_NIVEL_ZSTD  nível do zstd nas respostas da API, 1-22 (padrão: 3)
+
+PREFERENCIA = ('br', 'zstd', 'gzip')
+
+# Nas respostas dinâmicas o zstd comprime quase como o brotli gastando menos CPU
+PREFERENCIA_DINAMICA = ('zstd', 'br', 'gzip')
+
+NIVEIS_MAXIMOS = {'gzip': 9, 'br': 11, 'zstd': 19}
+
+NIVEIS_DINAMICOS = {
+    'gzip': int(os.environ.get('COMPRESSAO_NIVEL_GZIP', 6)),
+    'br': int(os.environ.get('COMPRESSAO_NIVEL_BR', 4)),
+    'zstd': int(os.environ.get('COMPRESSAO_NIVEL_ZSTD', 3))
+}
+
+TAMANHO_MINIMO = int(os.environ.get('COMPRESSAO_MINIMO', 1024))
+
+# Tipos que valem a pena comprimir (imagens, vídeos e PDFs já vêm comprimidos)
+TIPOS_COMPRIMIVEIS = (
+    'text/', 'application/javascript', 'application/json', 'application/xml',
+    'image/svg+xml', 'image/x-icon', 'image/vnd.microsoft.icon'
+)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def codificacoes_disponiveis():
+    disponiveis = {'gzip': True, 'br': brotli is not None, 'zstd': zstandard is not None}
+    return tuple(codificacao for codificacao in PREFERENCIA if disponiveis[codificacao])
+
+
+def comprimivel(mimetype):
+    return bool(mimetype) and mimetype.startswith(TIPOS_COMPRIMIVEIS)
+
+
+def comprimir(dados, codificacao, nivel=None):
+    """Comprime `dados` com a codificação informada; `nivel` None usa o máximo"""
+    if nivel is None:
+        nivel = NIVEIS_MAXIMOS[codificacao]
+    if codificacao == 'gzip':
+        # mtime=0 deixa o resultado determinístico (mesmo ETag entre workers)
+        return gzip.compress(dados, compresslevel=nivel, mtime=0)
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=nivel)
+    if codificacao == 'zstd':
+        return zstandard.ZstdCompressor(level=nivel).compress(dados)
+    raise ValueError(f'Codificação não suportada: {codificacao}')
+
+
+def _compressor(codificacao, nivel):
+    """(comprimir_bloco, finalizar) de um compressor incremental"""
+    if codificacao == 'gzip':
+        compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+        return (lambda bloco: compressor.compress(bloco) + compressor.flush(zlib.Z_SYNC_FLUSH)), compressor.flush
+    if codificacao == 'br':
+        compressor = brotli.Compressor(quality=nivel)
+        return (lambda bloco: compressor.process(bloco) + compressor.flush()), compressor.finish
+    if codificacao == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=nivel).compressobj()
+        return (
+            lambda bloco: compressor.compress(bloco) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        ), compressor.flush
+    raise ValueError(f'Codificação não suportada: {codificacao}')
+
+
+def comprimir_fluxo(blocos, codificacao, nivel):
+    """Comprime um iterável de bytes, produzindo cada bloco assim que ele chega"""
+    comprimir_bloco, finalizar = _compressor(codificacao, nivel)
+    for bloco in blocos:
+        if bloco:
+            yield comprimir_bloco(bloco)
+    yield finalizar()
+
+
+def escolher_codificacao(accept_encodings, oferecidas, preferencia=PREFERENCIA):
+    """Melhor codificação de `oferecidas` aceita pelo cliente, ou None (identity)
+
+    `accept_encodings` é o request.accept_encodings do Werkzeug.
+    """
+    melhor, melhor_q = None, 0
+    for codificacao in preferencia:
+        if codificacao not in oferecidas:
+            continue
+        q = accept_encodings.quality(codificacao)
+        if q > melhor_q:
+            melhor, melhor_q = codificacao, q
+    return melhor
+
+
+def comprimir_resposta(resposta):
+    """after_request: comprime as respostas da API conforme o Accept-Encoding"""
+    if not request.path.startswith('/api/'):
+        return resposta
+
+    # send_file (uploads) passa direto; 304/204 não têm corpo
+    if (resposta.direct_passthrough
+            or resposta.status_code < 200 or resposta.status_code in (204, 206, 304)
+            or 'Content-Encoding' in resposta.headers
+            or not comprimivel(resposta.mimetype)):
+        return resposta
+
+    resposta.vary.add('Accept-Encoding')
+
+    if not resposta.is_streamed and resposta.content_length is not None and resposta.content_length < TAMANHO_MINIMO:
+        return resposta
+
+    codificacao = escolher_codificacao(
+        request.accept_encodings, codificacoes_disponiveis(), PREFERENCIA_DINAMICA
+    )
+    if codificacao is None:
+        return resposta
+    nivel = NIVEIS_DINAMICOS[codificacao]
+
+    if resposta.is_streamed:
+        # O tamanho não é conhecido de antemão; listas em stream são grandes
+        resposta.response = comprimir_fluxo(resposta.iter_encoded(), codificacao, nivel)
+    else:
+        dados = resposta.get_data()
+        comprimido = comprimir(dados, codificacao, nivel)
+        if len(comprimido) >= len(dados):
+            return resposta
+        resposta.set_data(comprimido)
+
+    resposta.headers['Content-Encoding'] = codificacao
+
+    # A representação comprimida não é idêntica byte a byte: o ETag vira fraco
+    # (os GETs condicionais comparam ETags de forma fraca)
+    etag, fraco = resposta.get_etag()
+    if etag and not fraco:
+        resposta.set_etag(etag, weak=True)
+
+    return resposta
+
+
+def configurar_compressao(app):
+    app.after_request(comprimir_resposta)
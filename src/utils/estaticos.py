@@ -0,0 +1,114 @@
+from flask import Response, request
+from src.utils.compressao import codificacoes_disponiveis, comprimivel, comprimir, escolher_codificacao
+import hashlib
+import mimetypes
+import os
+import re
+
+# Arquivos estáticos da SPA servidos da memória.
+#
+# Na inicialização, os arquivos de static/ (menos uploads/, que muda em tempo
+# de execução) são lidos uma vez, com o hash do conteúdo e as versões gzip e
+# brotli já comprimidas. Cada arquivo também fica acessível por um nome com o
+# hash (app.3f2a9c1b0d.js), e o index.html é reescrito para referenciar esses
+# nomes: assim JS e CSS podem ser cacheados como imutáveis e um deploy novo
+# muda a URL. O próprio index.html é revalidado a cada acesso pelo ETag.
+#
+# Em modo debug o manifesto é refeito quando algum arquivo muda.
+
+PASTAS_IGNORADAS = {'uploads'}
+TAMANHO_MINIMO_COMPRESSAO = 512
+
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'no-cache'
+
+_REFERENCIAS = re.compile(r'''((?:src|href)=["'])(?!https?:|//|/|#|data:)([^"'?#]+)(["'])''')
+
+
+class _Arquivo:
+
+    def __init__(self, nome, conteudo, mimetype, imutavel=False):
+        self.nome = nome
+        self.conteudo = conteudo
+        self.mimetype = mimetype
+        self.hash = hashlib.sha256(conteudo).hexdigest()
+        self.imutavel = imutavel
+        self.variantes = {}
+
+        if comprimivel(mimetype) and len(conteudo) >= TAMANHO_MINIMO_COMPRESSAO:
+            for codificacao in codificacoes_disponiveis():
+                comprimido = comprimir(conteudo, codificacao)
+                # Só guarda a variante se ela economiza de fato
+                if len(comprimido) < len(conteudo) * 0.9:
+                    self.variantes[codificacao] = comprimido
+
+    def nome_com_hash(self):
+        base, extensao = os.path.splitext(self.nome)
+        return f'{base}.{self.hash[:10]}{extensao}'
+
+    def resposta(self):
+        codificacao = escolher_codificacao(request.accept_encodings, self.variantes)
+        conteudo = self.variantes[codificacao] if codificacao else self.conteudo
+
+        resposta = Response(conteudo, mimetype=self.mimetype)
+        if codificacao:
+            resposta.headers['Content-Encoding'] = codificacao
+        if self.variantes:
+            resposta.vary.add('Accept-Encoding')
+        # Um ETag por representação: gzip e brotli não são intercambiáveis
+        resposta.set_etag(f"{self.hash[:16]}-{codificacao}" if codificacao else self.hash[:16])
+        resposta.headers['Cache-Control'] = CACHE_IMUTAVEL if self.imutavel else CACHE_REVALIDAR
+        return resposta.make_conditional(request)
+
+
+class ManifestoEstaticos:
+    """Arquivos de uma pasta estática em memória, por caminho relativo"""
+
+    def __init__(self, pasta, recarregar=False):
+        self.pasta = pasta
+        self.recarregar = recarregar
+        self.arquivos = {}
+        self.assinatura = None
+        self.construir()
+
+    def _percorrer(self):
+        for raiz, pastas, nomes in os.walk(self.pasta):
+            if raiz == self.pasta:
+                pastas[:] = [p for p in pastas if p not in PASTAS_IGNORADAS]
+            for nome in nomes:
+                caminho = os.path.join(raiz, nome)
+                yield os.path.relpath(caminho, self.pasta).replace(os.sep, '/'), caminho
+
+    def _assinatura(self):
+        return tuple(sorted(
+            (relativo, os.stat(caminho).st_mtime_ns) for relativo, caminho in self._percorrer()
+        ))
+
+    def construir(self):
+        arquivos = {}
+        for relativo, caminho in self._percorrer():
+            with open(caminho, 'rb') as arquivo:
+                conteudo = arquivo.read()
+            mimetype = mimetypes.guess_type(relativo)[0] or 'application/octet-stream'
+            arquivos[relativo] = _Arquivo(relativo, conteudo, mimetype)
+
+        for arquivo in list(arquivos.values()):
+            com_hash = _Arquivo(arquivo.nome_com_hash(), arquivo.conteudo, arquivo.mimetype, imutavel=True)
+            com_hash.variantes = arquivo.variantes
+            arquivos[com_hash.nome] = com_hash
+
+        index = arquivos.get('index.html')
+        if index is not None:
+            html = _REFERENCIAS.sub(
+                lambda m: m.group(1) + (arquivos[m.group(2)].nome_com_hash() if m.group(2) in arquivos else m.group(2)) + m.group(3),
+                index.conteudo.decode('utf-8')
+            )
+            arquivos['index.html'] = _Arquivo('index.html', html.encode('utf-8'), index.mimetype)
+
+        self.arquivos = arquivos
+        self.assinatura = self._assinatura() if self.recarregar else None
+
+    def obter(self, caminho):
+        if self.recarregar and self._assinatura() != self.assinatura:
+            self.construir()
+        return self.arquivos.get(caminho)
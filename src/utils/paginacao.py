@@ -0,0 +1,124 @@
+from flask import jsonify, request
+from sqlalchemy.engine import Row
+from src.models.user import db
+from datetime import datetime
+import base64
+import json
+
+# Paginação por cursor (keyset): o cursor guarda os valores das colunas de
+# ordenação do último item entregue, e a próxima página começa logo depois
+# dele. Inserções concorrentes não deslocam as páginas seguintes, ao contrário
+# de OFFSET.
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def paginacao_solicitada():
+    """Indica se a requisição pediu a resposta paginada (limit ou cursor)"""
+    return 'limit' in request.args or 'cursor' in request.args
+
+
+def _codificar_cursor(valores):
+    bruto = json.dumps([
+        valor.isoformat() if isinstance(valor, datetime) else valor
+        for valor in valores
+    ])
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip('=')
+
+
+def _decodificar_cursor(cursor, ordem):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valores = json.loads(bruto)
+    except (ValueError, TypeError):
+        raise CursorInvalido('Cursor inválido')
+
+    if not isinstance(valores, list) or len(valores) != len(ordem):
+        raise CursorInvalido('Cursor inválido')
+
+    convertidos = []
+    for (coluna, _), valor in zip(ordem, valores):
+        if valor is not None and isinstance(coluna.type, db.DateTime):
+            try:
+                valor = datetime.fromisoformat(valor)
+            except (ValueError, TypeError):
+                raise CursorInvalido('Cursor inválido')
+        convertidos.append(valor)
+    return convertidos
+
+
+def _apos(coluna, decrescente, valor):
+    # NULLs ficam sempre no fim da ordenação (NULLS LAST)
+    if valor is None:
+        return db.false()
+    posterior = coluna < valor if decrescente else coluna > valor
+    return db.or_(posterior, coluna.is_(None))
+
+
+def _igual(coluna, valor):
+    return coluna.is_(None) if valor is None else coluna == valor
+
+
+def _filtro_cursor(ordem, valores):
+    alternativas = []
+    for i, (coluna, decrescente) in enumerate(ordem):
+        prefixo = [_igual(c, v) for (c, _), v in zip(ordem[:i], valores[:i])]
+        alternativas.append(db.and_(*prefixo, _apos(coluna, decrescente, valores[i])))
+    return db.or_(*alternativas)
+
+
+def _ordenacao(ordem):
+    return [
+        (coluna.desc() if decrescente else coluna.asc()).nulls_last()
+        for coluna, decrescente in ordem
+    ]
+
+
+def paginar_query(query, ordem, limite, cursor=None):
+    """Retorna (linhas, proximo_cursor) de uma página da query.
+
+    `ordem` é uma lista de (coluna, decrescente); a última coluna deve ser
+    única (normalmente o id) para desempatar.
+    """
+    if cursor:
+        query = query.filter(_filtro_cursor(ordem, _decodificar_cursor(cursor, ordem)))
+
+    linhas = query.order_by(None).order_by(*_ordenacao(ordem)).limit(limite + 1).all()
+
+    proximo_cursor = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        ultimo = linhas[-1]
+        # Linhas com colunas extras (Row) trazem a entidade na primeira posição
+        entidade = ultimo[0] if isinstance(ultimo, Row) else ultimo
+        proximo_cursor = _codificar_cursor([getattr(entidade, coluna.key) for coluna, _ in ordem])
+
+    return linhas, proximo_cursor
+
+
+def paginar(query, ordem, serializar):
+    """Resposta JSON paginada a partir dos argumentos limit, cursor e total da requisição"""
+    limite = request.args.get('limit', LIMITE_PADRAO, type=int)
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    cursor = request.args.get('cursor')
+
+    try:
+        linhas, proximo_cursor = paginar_query(query, ordem, limite, cursor)
+    except CursorInvalido as e:
+        return jsonify({'error': str(e)}), 400
+
+    resultado = {
+        'items': [serializar(linha) for linha in linhas],
+        'next_cursor': proximo_cursor,
+        'limit': limite
+    }
+
+    if request.args.get('total', '').lower() == 'true':
+        resultado['total'] = query.order_by(None).count()
+
+    return jsonify(resultado)
@@ -0,0 +1,143 @@
+from flask import request
+import codecs
+import csv
+import io
+import itertools
+import json
+import re
+
+# Leitura incremental de planilhas e arrays JSON enviados para importação.
+# Os registros são produzidos um a um a partir do fluxo da requisição (ou do
+# arquivo enviado), sem carregar o conteúdo inteiro em memória.
+
+TAMANHO_BLOCO = 64 * 1024
+
+_ESPACOS = re.compile(r'\s*')
+
+
+class FormatoInvalido(ValueError):
+    pass
+
+
+def _texto(valor):
+    if isinstance(valor, str):
+        valor = valor.strip()
+        return valor or None
+    return valor
+
+
+def ler_csv(fluxo):
+    """Gera (número da linha, registro) de um CSV binário com cabeçalho.
+
+    Aceita vírgula ou ponto e vírgula como separador (o Excel em português
+    exporta com ponto e vírgula). Células vazias viram None.
+    """
+    texto = io.TextIOWrapper(fluxo, encoding='utf-8-sig', newline='')
+    cabecalho = texto.readline()
+    if not cabecalho.strip():
+        return
+    separador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+
+    leitor = csv.reader(itertools.chain([cabecalho], texto), delimiter=separador)
+    campos = [campo.strip() for campo in next(leitor)]
+    for linha in leitor:
+        if not any(celula.strip() for celula in linha):
+            continue
+        yield leitor.line_num, {campo: _texto(valor) for campo, valor in zip(campos, linha)}
+
+
+def ler_json_array(fluxo):
+    """Gera (posição, objeto) de um array JSON binário, decodificando um objeto por vez"""
+    decodificador = json.JSONDecoder()
+    leitor = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer = ''
+    indice = 0
+    fim_arquivo = False
+    posicao = 0
+    inicio = True
+
+    while True:
+        indice = _ESPACOS.match(buffer, indice).end()
+        if indice < len(buffer):
+            caractere = buffer[indice]
+            if inicio:
+                if caractere != '[':
+                    raise FormatoInvalido('O conteúdo deve ser um array JSON')
+                inicio = False
+                indice += 1
+                continue
+            if caractere == ']':
+                return
+            if caractere == ',':
+                indice += 1
+                continue
+            try:
+                objeto, indice = decodificador.raw_decode(buffer, indice)
+            except json.JSONDecodeError:
+                if fim_arquivo:
+                    raise FormatoInvalido(f'JSON inválido no item {posicao + 1}')
+            else:
+                posicao += 1
+                if not isinstance(objeto, dict):
+                    raise FormatoInvalido(f'O item {posicao} deve ser um objeto')
+                yield posicao, {campo: _texto(valor) for campo, valor in objeto.items()}
+                continue
+
+        if fim_arquivo:
+            raise FormatoInvalido('Array JSON incompleto' if not inicio else 'O conteúdo deve ser um array JSON')
+        bloco = fluxo.read(TAMANHO_BLOCO)
+        fim_arquivo = not bloco
+        buffer = buffer[indice:] + leitor.decode(bloco, final=fim_arquivo)
+        indice = 0
+
+
+def ler_xlsx(arquivo):
+    """Gera (número da linha, registro) da primeira aba de um XLSX com cabeçalho.
+
+    Usa o modo somente leitura do openpyxl, que percorre a planilha sem
+    montá-la inteira em memória.
+    """
+    try:
+        import openpyxl
+    except ImportError:
+        raise FormatoInvalido('Leitura de XLSX requer o pacote openpyxl')
+
+    try:
+        pasta = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+    except Exception:
+        raise FormatoInvalido('Arquivo XLSX inválido')
+
+    try:
+        linhas = pasta.worksheets[0].iter_rows(values_only=True)
+        campos = None
+        for numero, linha in enumerate(linhas, start=1):
+            if not any(celula not in (None, '') for celula in linha):
+                continue
+            if campos is None:
+                campos = [str(celula).strip() if celula is not None else '' for celula in linha]
+                continue
+            yield numero, {campo: _texto(valor) for campo, valor in zip(campos, linha) if campo}
+    finally:
+        pasta.close()
+
+
+def ler_planilha(fluxo, nome_arquivo):
+    """Registros de um arquivo CSV ou XLSX, conforme a extensão"""
+    if nome_arquivo.lower().endswith('.xlsx'):
+        return ler_xlsx(fluxo)
+    if nome_arquivo.lower().endswith('.csv'):
+        return ler_csv(fluxo)
+    raise FormatoInvalido('Formato de planilha não suportado (use CSV ou XLSX)')
+
+
+def registros_da_requisicao():
+    """Registros enviados na requisição: arquivo (campo `arquivo`) ou corpo, em CSV ou JSON"""
+    arquivo = request.files.get('arquivo')
+    if arquivo:
+        fluxo = arquivo.stream
+        csv_enviado = arquivo.filename.lower().endswith('.csv') or arquivo.mimetype == 'text/csv'
+    else:
+        fluxo = request.stream
+        csv_enviado = request.mimetype == 'text/csv'
+
+    return ler_csv(fluxo) if csv_enviado else ler_json_array(fluxo)
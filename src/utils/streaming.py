@@ -0,0 +1,31 @@
+from flask import current_app, stream_with_context
+
+# Respostas JSON de listas geradas incrementalmente: as linhas são lidas do
+# banco em lotes (yield_per, que usa cursor do lado do servidor quando o banco
+# suporta) e cada lote é serializado e enviado antes de ler o próximo. O uso
+# de memória por requisição fica limitado ao tamanho do lote, qualquer que
+# seja o tamanho da tabela.
+
+TAMANHO_LOTE = 500
+
+
+def resposta_json_stream(query, serializar, tamanho_lote=TAMANHO_LOTE):
+    """Resposta com o array JSON de `serializar(linha)` para cada linha da query"""
+    # Mesmo formato compacto do jsonify
+    dumps = current_app.json.dumps
+
+    def gerar():
+        yield '['
+        separador = ''
+        lote = []
+        for linha in query.yield_per(tamanho_lote):
+            lote.append(separador + dumps(serializar(linha), separators=(',', ':')))
+            separador = ','
+            if len(lote) >= tamanho_lote:
+                yield ''.join(lote)
+                lote = []
+        if lote:
+            yield ''.join(lote)
+        yield ']'
+
+    return current_app.response_class(stream_with_context(gerar()), mimetype='application/json')
@@ -0,0 +1,108 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Banco SQLite em memória e cache desligado: a aplicação (src/main.py) é
+# configurada na importação, então as variáveis vêm antes dela
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['CACHE_BACKEND'] = 'nenhum'
+os.environ['DB_SQLITE_WAL'] = 'false'
+
+from sqlalchemy import event  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    from src.main import app
+    import src.services.tarefas as tarefas
+
+    # Sem agendador de tarefas: ele abriria outra conexão, que no SQLite em
+    # memória é outro banco
+    tarefas._agendador_pid = os.getpid()
+
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def banco(app):
+    """Contexto da aplicação; os registros criados no teste são apagados no fim"""
+    from src.models.user import db
+
+    with app.app_context():
+        yield db
+        db.session.rollback()
+        for tabela in reversed(db.metadata.sorted_tables):
+            if tabela.name not in ('user', 'configuracao_empresa'):
+                db.session.execute(tabela.delete())
+        db.session.commit()
+
+
+@pytest.fixture
+def cliente_http(app):
+    """Cliente de teste autenticado como o admin padrão"""
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao['user_id'] = 1
+    return cliente
+
+
+@pytest.fixture
+def contador_consultas(banco):
+    """Lista dos comandos SQL executados enquanto o teste roda"""
+    comandos = []
+
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        comandos.append(statement)
+
+    event.listen(banco.engine, 'before_cursor_execute', registrar)
+    yield comandos
+    event.remove(banco.engine, 'before_cursor_execute', registrar)
+
+
+@pytest.fixture
+def criar_usuario(app):
+    """Cria usuários de teste e devolve o id (a tabela user não é limpa pelo fixture banco).
+
+    Cada requisição do teste precisa do próprio contexto da aplicação (o
+    Principal fica em flask.g), então aqui não se usa o fixture banco.
+    """
+    from src.models.user import User, db
+
+    criados = []
+
+    def criar(role='user', permissions=None):
+        with app.app_context():
+            user = User(
+                username=f'teste{len(criados)}', email=f'teste{len(criados)}@exemplo.com', role=role,
+                permissions=json.dumps(permissions) if permissions is not None else None
+            )
+            user.set_password('senha123')
+            db.session.add(user)
+            db.session.commit()
+            criados.append(user.id)
+            return user.id
+
+    yield criar
+    with app.app_context():
+        for user_id in criados:
+            user = db.session.get(User, user_id)
+            if user is not None:
+                db.session.delete(user)
+        db.session.commit()
+
+
+@pytest.fixture
+def cliente_como(app):
+    """Cria clientes de teste autenticados como o usuário do id informado"""
+    def criar(user_id):
+        cliente = app.test_client()
+        with cliente.session_transaction() as sessao:
+            sessao['user_id'] = user_id
+        return cliente
+
+    return criar
@@ -0,0 +1,90 @@
+import pytest
+
+from src.utils.auth import TODOS, compilar_permissoes
+
+# Permissões por recurso: o JSON de User.permissions, a substituição das
+# permissões do papel, a invalidação do Principal e as rotas que leem dados
+# de vários recursos.
+
+RECURSOS_DASHBOARD = ('dashboard', 'cliente', 'pedido', 'financeiro', 'demanda_social')
+
+
+def test_compilar_permissoes_formatos():
+    assert compilar_permissoes({'cliente': ['ler', 'escrever'], 'financeiro': 'ler', 'pedido': True, 'fornecedor': False}) == {
+        ('cliente', 'ler'), ('cliente', 'escrever'), ('financeiro', 'ler'), ('pedido', 'ler'), ('pedido', 'escrever')
+    }
+    assert compilar_permissoes('["cliente:ler", "pedido", "*:ler"]') == {
+        ('cliente', 'ler'), ('pedido', 'ler'), ('pedido', 'escrever'), (TODOS, 'ler')
+    }
+    assert compilar_permissoes([]) == frozenset()
+
+
+@pytest.mark.parametrize('permissoes', [
+    '{invalido', 42, {'cliente': 'apagar'}, ['cliente:apagar'], [1], {'': 'ler'}, {'cliente': 1}
+])
+def test_compilar_permissoes_invalidas(permissoes):
+    with pytest.raises(ValueError):
+        compilar_permissoes(permissoes)
+
+
+def test_permissoes_do_usuario_substituem_as_do_papel(cliente_como, criar_usuario):
+    user_id = criar_usuario('user', {'cliente': 'ler'})
+    cliente = cliente_como(user_id)
+
+    assert cliente.get('/api/clientes').status_code == 200
+    assert cliente.post('/api/clientes', json={'nome': 'Novo'}).status_code == 403
+    assert cliente.get('/api/pedidos').status_code == 403
+
+    # Sem permissões próprias vale o papel: user lê e escreve em tudo
+    assert cliente_como(criar_usuario('user')).get('/api/pedidos').status_code == 200
+
+
+def test_admin_ignora_permissoes_do_usuario(cliente_como, criar_usuario):
+    user_id = criar_usuario('admin', {'cliente': 'ler'})
+    assert cliente_como(user_id).get('/api/pedidos').status_code == 200
+
+
+def test_alteracao_do_usuario_invalida_o_principal(cliente_como, cliente_http, criar_usuario):
+    user_id = criar_usuario('user', {'cliente': 'ler'})
+    cliente = cliente_como(user_id)
+    assert cliente.get('/api/pedidos').status_code == 403
+
+    resposta = cliente_http.put(f'/api/users/{user_id}', json={'permissions': {'pedido': 'ler'}})
+    assert resposta.status_code == 200
+    assert cliente.get('/api/pedidos').status_code == 200
+    assert cliente.get('/api/clientes').status_code == 403
+
+    resposta = cliente_http.put(f'/api/users/{user_id}', json={'is_active': False})
+    assert resposta.status_code == 200
+    assert cliente.get('/api/pedidos').status_code == 401
+
+
+@pytest.mark.parametrize('rota, recursos', [
+    ('/api/dashboard', RECURSOS_DASHBOARD),
+    ('/api/dashboard/prazos', ('dashboard', 'cliente', 'pedido', 'demanda_social'))
+])
+def test_dashboard_exige_leitura_dos_recursos_exibidos(cliente_como, criar_usuario, rota, recursos):
+    assert cliente_como(criar_usuario('user', {'dashboard': 'ler'})).get(rota).status_code == 403
+
+    for faltando in recursos:
+        permissoes = {recurso: 'ler' for recurso in recursos if recurso != faltando}
+        assert cliente_como(criar_usuario('user', permissoes)).get(rota).status_code == 403
+
+    assert cliente_como(criar_usuario('user', {recurso: 'ler' for recurso in recursos})).get(rota).status_code == 200
+
+
+def test_viewer_so_le(cliente_como, criar_usuario):
+    cliente = cliente_como(criar_usuario('viewer'))
+    assert cliente.get('/api/clientes').status_code == 200
+    assert cliente.post('/api/clientes', json={'nome': 'Novo'}).status_code == 403
+
+
+def test_exportacao_exige_leitura_do_recurso_exportado(cliente_como, criar_usuario):
+    cliente = cliente_como(criar_usuario('user', {'tarefa': 'ler', 'pedido': 'ler'}))
+    resposta = cliente.post('/api/tarefas', json={'tipo': 'exportar', 'parametros': {'entidade': 'transacoes'}})
+    assert resposta.status_code == 403
+
+
+def test_rotas_do_assistente_exigem_todos_os_recursos(cliente_como, criar_usuario):
+    cliente = cliente_como(criar_usuario('user', {'assistente_ia': 'ler', 'cliente': 'ler'}))
+    assert cliente.get('/api/assistente-ia/analise-geral').status_code == 403
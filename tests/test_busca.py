@@ -0,0 +1,119 @@
+import pytest
+
+import src.services.busca as busca
+from src.models.cliente import Cliente
+from src.models.pedido import Pedido
+from src.services.busca import ConsultaInvalida, buscar
+
+# Busca textual: o índice acompanha inserções, alterações e exclusões feitas
+# pela sessão, as palavras casam por prefixo e os tipos sem permissão de
+# leitura ficam fora do resultado.
+
+
+def _limpar_indice(db):
+    # O fixture banco apaga as tabelas dos modelos direto no banco, sem passar
+    # pela sessão, então o índice não acompanha
+    db.session.execute(db.text('DELETE FROM busca'))
+    db.session.commit()
+
+
+@pytest.fixture
+def indice(banco):
+    _limpar_indice(banco)
+    yield banco
+    _limpar_indice(banco)
+
+
+def _ids(resultados, tipo='cliente'):
+    return [resultado['id'] for resultado in resultados if resultado['tipo'] == tipo]
+
+
+def test_indexa_inclusao_alteracao_e_exclusao(indice):
+    cliente = Cliente(nome='Zanzibar Comercial', tipo='Varejista', cidade='São Xiqueira')
+    indice.session.add(cliente)
+    indice.session.commit()
+
+    assert _ids(buscar('zanzibar')) == [cliente.id]
+    # Texto além do título, sem acentos
+    assert _ids(buscar('sao xiqueira')) == [cliente.id]
+
+    cliente.nome = 'Quixaba Comercial'
+    indice.session.commit()
+    assert buscar('zanzibar') == []
+    assert _ids(buscar('quixaba')) == [cliente.id]
+
+    indice.session.delete(cliente)
+    indice.session.commit()
+    assert buscar('quixaba') == []
+
+
+def test_palavras_casam_pelo_inicio(indice):
+    cliente = Cliente(nome='Zanzibar Comercial', tipo='Varejista')
+    indice.session.add(cliente)
+    indice.session.commit()
+
+    assert _ids(buscar('zan com')) == [cliente.id]
+    assert _ids(buscar('ZANZ')) == [cliente.id]
+    # Todas as palavras precisam casar, e só pelo início
+    assert buscar('zan varejo') == []
+    assert buscar('zibar') == []
+
+    with pytest.raises(ConsultaInvalida):
+        buscar('z')
+
+
+def test_ordena_todos_os_encontrados_por_relevancia(indice, monkeypatch):
+    monkeypatch.setattr(busca, 'CANDIDATOS', 3)
+    for i in range(10):
+        indice.session.add(Cliente(nome=f'Cliente {i}', tipo='Varejista', observacoes='indicação da mariana'))
+    titulo = Cliente(nome='Mariana Papelaria', tipo='Varejista')
+    indice.session.add(titulo)
+    indice.session.commit()
+
+    # O título pesa mais que as observações, mesmo com o documento inserido por último
+    resultados = buscar('marian', limite=5)
+    assert resultados[0]['id'] == titulo.id
+    assert len(resultados) == 5
+
+
+def test_palavra_inteira_antes_dos_prefixos_curtos(indice, monkeypatch):
+    monkeypatch.setattr(busca, 'CANDIDATOS', 3)
+    for i in range(10):
+        indice.session.add(Cliente(nome=f'Malharia {i}', tipo='Varejista'))
+    exato = Cliente(nome='Ma Comércio', tipo='Varejista')
+    indice.session.add(exato)
+    indice.session.commit()
+
+    resultados = buscar('ma', limite=5)
+    assert resultados[0]['id'] == exato.id
+    assert len(resultados) == 4
+
+
+def test_busca_so_nos_tipos_que_o_usuario_pode_ler(app, criar_usuario, cliente_como):
+    from src.models.user import db
+
+    with app.app_context():
+        _limpar_indice(db)
+        cliente = Cliente(nome='Zanzibar Comercial', tipo='Varejista')
+        db.session.add(cliente)
+        db.session.flush()
+        pedido = Pedido(id_pedido='PED-ZANZ', cliente_id=cliente.id, tipo_servico='Gráfica', descricao='Zanzibar')
+        db.session.add(pedido)
+        db.session.commit()
+        cliente_id = cliente.id
+
+    try:
+        admin = cliente_como(criar_usuario('admin'))
+        assert {r['tipo'] for r in admin.get('/api/search?q=zanz').get_json()['resultados']} == {'cliente', 'pedido'}
+
+        restrito = cliente_como(criar_usuario('user', {'cliente': 'ler'}))
+        resultados = restrito.get('/api/search?q=zanz').get_json()['resultados']
+        assert [(r['tipo'], r['id']) for r in resultados] == [('cliente', cliente_id)]
+        assert restrito.get('/api/search?q=zanz&tipo=pedido').get_json()['resultados'] == []
+        assert restrito.get('/api/search?q=zanz&tipo=nota').status_code == 400
+    finally:
+        with app.app_context():
+            db.session.execute(Pedido.__table__.delete())
+            db.session.execute(Cliente.__table__.delete())
+            db.session.commit()
+            _limpar_indice(db)
@@ -0,0 +1,60 @@
+import os
+
+from src.utils.cache import BackendMemoria, BackendSQLite
+
+# A época do armazenamento distingue versões iguais de armazenamentos
+# diferentes (arquivo apagado e recriado, outro CACHE_DIR).
+
+
+def test_epoca_persiste_no_arquivo(tmp_path):
+    caminho = str(tmp_path / 'cache.db')
+    assert BackendSQLite(caminho).epoca() == BackendSQLite(caminho).epoca()
+
+
+def test_arquivo_recriado_tem_outra_epoca_com_as_mesmas_versoes(tmp_path):
+    caminho = str(tmp_path / 'cache.db')
+    backend = BackendSQLite(caminho)
+    backend.incrementar_versoes(['pedido'])
+    antes = (backend.epoca(), backend.versoes(['pedido']))
+
+    backend._conexao().close()
+    os.remove(caminho)
+
+    recriado = BackendSQLite(caminho)
+    recriado.incrementar_versoes(['pedido'])
+    depois = (recriado.epoca(), recriado.versoes(['pedido']))
+
+    assert antes[1] == depois[1]
+    assert antes[0] != depois[0]
+
+
+def test_backend_memoria_tem_epoca_propria():
+    assert BackendMemoria().epoca() != BackendMemoria().epoca()
+
+
+def _gravados(caminho):
+    import sqlite3
+    with sqlite3.connect(caminho) as conexao:
+        return conexao.execute('SELECT endpoint, acertos, falhas FROM estatistica').fetchall()
+
+
+def test_acessos_somados_em_memoria_e_gravados_por_intervalo(tmp_path, monkeypatch):
+    import src.utils.cache as cache
+
+    caminho = str(tmp_path / 'cache.db')
+    monkeypatch.setattr(cache, 'INTERVALO_ESTATISTICAS', 3600)
+    backend = BackendSQLite(caminho)
+    backend.epoca()
+
+    assert backend.registrar_acesso('pedido.get_pedidos_stats', False) == (0, 1)
+    assert backend.registrar_acesso('pedido.get_pedidos_stats', True) == (1, 1)
+    assert _gravados(caminho) == []
+
+    outro = BackendSQLite(caminho)
+    backend.gravar_estatisticas()
+    assert _gravados(caminho) == [('pedido.get_pedidos_stats', 1, 1)]
+
+    # Outro processo vê os totais gravados na sua próxima gravação
+    monkeypatch.setattr(cache, 'INTERVALO_ESTATISTICAS', 0)
+    assert outro.registrar_acesso('pedido.get_pedidos_stats', True) == (2, 1)
+    assert _gravados(caminho) == [('pedido.get_pedidos_stats', 2, 1)]
@@ -0,0 +1,60 @@
+import pytest
+
+from src.models.cliente import Cliente
+from src.models.demanda_social import DemandaSocialMedia
+from src.models.fornecedor import Fornecedor
+from src.models.pedido import Pedido
+from src.models.tabela_preco import TabelaPreco
+
+# As listagens trazem o nome do cliente/fornecedor na mesma consulta: o
+# número de comandos SQL não pode crescer com a quantidade de linhas.
+
+ROTAS = ('/api/pedidos', '/api/tabela-precos', '/api/demandas-social')
+
+
+def _criar_registros(db, inicio, quantidade):
+    for i in range(inicio, inicio + quantidade):
+        cliente = Cliente(nome=f'Cliente {i}', tipo='Varejista', status='Ativo')
+        fornecedor = Fornecedor(nome=f'Fornecedor {i}', tipo_servico='Gráfica')
+        db.session.add_all([cliente, fornecedor])
+        db.session.flush()
+
+        pedido = Pedido(id_pedido=f'PED-{i:04d}', cliente_id=cliente.id, tipo_servico='Gráfica', valor=100.0)
+        db.session.add(pedido)
+        db.session.flush()
+
+        db.session.add_all([
+            TabelaPreco(
+                fornecedor_id=fornecedor.id, produto_servico=f'Produto {i}', categoria='Gráfica',
+                preco_custo=10.0, markup=50.0, unidade='Unidade'
+            ),
+            DemandaSocialMedia(
+                demanda=f'Demanda {i}', cliente_id=cliente.id, pedido_id=pedido.id, tipo_arte='Post Simples'
+            )
+        ])
+    db.session.commit()
+
+
+def _consultas(cliente_http, contador_consultas, rota):
+    del contador_consultas[:]
+    resposta = cliente_http.get(rota)
+    # Listagens grandes são transmitidas em partes: ler o corpo inteiro
+    dados = resposta.get_json()
+    assert resposta.status_code == 200
+    return len(contador_consultas), dados
+
+
+@pytest.mark.parametrize('rota', ROTAS)
+def test_listagem_com_quantidade_constante_de_consultas(banco, cliente_http, contador_consultas, rota):
+    _criar_registros(banco, 0, 1)
+    # Primeira requisição carrega o usuário da sessão (fica em memória)
+    cliente_http.get(rota).get_data()
+
+    consultas_uma_linha, dados = _consultas(cliente_http, contador_consultas, rota)
+    assert len(dados) == 1
+
+    _criar_registros(banco, 1, 49)
+    consultas_cinquenta_linhas, dados = _consultas(cliente_http, contador_consultas, rota)
+    assert len(dados) == 50
+
+    assert consultas_cinquenta_linhas == consultas_uma_linha
@@ -0,0 +1,31 @@
+import io
+
+import pytest
+
+import src.services.envio_partes as envio_partes
+from src.services.envio_partes import ErroEnvio, cancelar_envio, enviar_parte, iniciar_envio, situacao_envio
+
+# Envio em partes: os parciais ficam fora de static/ e cada sessão só é
+# visível para o usuário que a iniciou.
+
+
+@pytest.fixture(autouse=True)
+def pasta_parciais(tmp_path, monkeypatch):
+    monkeypatch.setattr(envio_partes, 'PASTA_PARCIAIS', str(tmp_path))
+    return tmp_path
+
+
+def test_sessao_de_outro_usuario_nao_existe():
+    sessao_id = iniciar_envio('planilha.csv', 3, 1)['id']
+
+    for operacao in (
+        lambda: situacao_envio(sessao_id, 2),
+        lambda: enviar_parte(sessao_id, 2, 0, io.BytesIO(b'abc'), 3),
+        lambda: cancelar_envio(sessao_id, 2)
+    ):
+        with pytest.raises(ErroEnvio) as erro:
+            operacao()
+        assert erro.value.status == 404
+
+    assert enviar_parte(sessao_id, 1, 0, io.BytesIO(b'abc'), 3)['offset'] == 3
+    assert situacao_envio(sessao_id, 1)['partes'] == 1
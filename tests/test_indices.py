@@ -0,0 +1,20 @@
+from src.services.indices import criar_indices_ausentes, verificar_planos
+
+# Cada consulta quente (src/services/indices.py) deve ser resolvida por
+# índice: o EXPLAIN não pode mostrar varredura completa de tabela.
+
+
+def test_indices_declarados_existem(banco):
+    assert criar_indices_ausentes() == []
+
+
+def test_consultas_quentes_sem_varredura_completa(banco):
+    resultados = verificar_planos()
+    assert resultados
+
+    varreduras = {
+        nome: detalhes
+        for nome, detalhes, varredura in resultados
+        if varredura
+    }
+    assert not varreduras, f'Consultas com varredura completa: {varreduras}'
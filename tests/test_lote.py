@@ -0,0 +1,41 @@
+import pytest
+
+from src.models.cliente import Cliente
+from src.models.pedido import Pedido
+
+# Alterações em lote: o UPDATE não passa pelo ORM, então os valores são
+# validados antes de chegar ao banco.
+
+
+@pytest.fixture
+def pedido(banco):
+    cliente = Cliente(nome='Cliente Lote', tipo='Varejista')
+    banco.session.add(cliente)
+    banco.session.flush()
+    pedido = Pedido(id_pedido='PED-LOTE', cliente_id=cliente.id, tipo_servico='Gráfica')
+    banco.session.add(pedido)
+    banco.session.commit()
+    return pedido.id
+
+
+@pytest.mark.parametrize('alteracoes', [
+    {'status': None}, {'status': 'Qualquer'}, {'prioridade': [1]}, {'prioridade': 1},
+    {'responsavel': {'nome': 'Yuri'}}, {'responsavel': 'x' * 51}, {'valor': 10}
+])
+def test_lote_rejeita_valores_invalidos(banco, cliente_http, pedido, alteracoes):
+    resposta = cliente_http.patch('/api/pedidos/lote', json={'ids': [pedido], 'alteracoes': alteracoes})
+    assert resposta.status_code == 400
+    assert banco.session.get(Pedido, pedido).status == 'Orçamento'
+
+
+def test_lote_aplica_valores_validos(banco, cliente_http, pedido):
+    alteracoes = {'status': 'Produção', 'prioridade': 'Alta', 'responsavel': None}
+    resposta = cliente_http.patch('/api/pedidos/lote', json={'ids': [pedido], 'alteracoes': alteracoes})
+    assert resposta.status_code == 200
+    assert resposta.get_json()['ids'] == [pedido]
+
+    banco.session.expire_all()
+    assert banco.session.get(Pedido, pedido).status == 'Produção'
+
+    resposta = cliente_http.patch('/api/demandas-social/lote', json={'ids': [1], 'alteracoes': {'aprovado': 'sim'}})
+    assert resposta.status_code == 400